@@ -0,0 +1,396 @@
+from mongoengine import (
+    Document,
+    StringField,
+    IntField,
+    FloatField,
+    DateTimeField,
+    DictField,
+    ListField,
+    BooleanField,
+    ReferenceField,
+)
+from datetime import datetime
+from django.conf import settings
+from accounts.models import MongoUser
+
+
+class AnalysisJob(Document):
+    """Background video analysis job (polled by the client)"""
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    # Coalesced: waits for the job computing the same analysis (leader_job_id)
+    # without holding a worker
+    STATUS_WAITING = "waiting"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_RUNNING, STATUS_WAITING]
+    STATUS_CHOICES = [
+        STATUS_QUEUED,
+        STATUS_RUNNING,
+        STATUS_WAITING,
+        STATUS_COMPLETED,
+        STATUS_FAILED,
+    ]
+
+    # standard: first N comments; sampled: stratified sample of a large section;
+    # stream: every comment up to N (large analyses, bounded memory);
+    # incremental: only comments posted since the last run of the video
+    MODE_STANDARD = "standard"
+    MODE_SAMPLED = "sampled"
+    MODE_STREAM = "stream"
+    MODE_INCREMENTAL = "incremental"
+
+    user = ReferenceField(MongoUser, required=True)
+    youtube_url = StringField(required=True, max_length=500)
+    video_id = StringField(max_length=50)
+    comment_limit = IntField(default=150)  # sample size in sampled mode
+    force_refresh = BooleanField(default=False)
+    mode = StringField(
+        default=MODE_STANDARD,
+        choices=[MODE_STANDARD, MODE_SAMPLED, MODE_STREAM, MODE_INCREMENTAL],
+        max_length=20,
+    )
+    scan_limit = IntField()  # sampled mode: max comments streamed
+    batch_id = StringField(max_length=24)  # set for jobs of a multi-video batch
+    # Scheduler: higher first (1 = user purchased credits), see scheduler.py
+    priority = IntField(default=0)
+    # Batch jobs: metadata fetched for the whole batch up front
+    prefetched_metadata = DictField()
+    # Store per-comment labels for export (see CommentLabelChunk)
+    include_labels = BooleanField(default=False)
+    # Waiting jobs: the job whose result they reuse (see coalescing.py)
+    leader_job_id = StringField(max_length=24)
+
+    status = StringField(default=STATUS_QUEUED, choices=STATUS_CHOICES, max_length=20)
+    stage = StringField(max_length=50, default="queued")
+    progress = IntField(default=0)  # 0 - 100
+    error = StringField(max_length=1000)
+
+    # Latest partial data per pipeline stage: { "fetched": {...}, "analyzing": {...} }
+    live = DictField()
+
+    # { "metadata": ..., "analysis": ..., "sample_comments": [...] }
+    result = DictField()
+
+    credits_reserved = IntField(default=0)
+    credits_remaining = IntField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+    started_at = DateTimeField()
+    finished_at = DateTimeField()
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        "collection": "analysis_jobs",
+        "indexes": [
+            "user",
+            "status",
+            "-created_at",
+            "batch_id",
+            # Scheduler queue scan
+            ("status", "-priority", "created_at"),
+            # Latest completed analysis per video (channel rollups)
+            ("video_id", "status", "-finished_at"),
+            # Followers of a finishing leader
+            ("leader_job_id", "status"),
+        ],
+    }
+
+    def __str__(self):
+        return f"AnalysisJob({self.id}: {self.status} {self.progress}%)"
+
+
+class AnalysisBatch(Document):
+    """Multi-video analysis: one AnalysisJob per (deduplicated) video"""
+
+    user = ReferenceField(MongoUser, required=True)
+    video_ids = ListField(StringField(max_length=50))
+    invalid_urls = ListField(StringField(max_length=500))
+    comment_limit = IntField(default=150)
+    # Reserved for the whole set in one operation; each job carries its share
+    credits_reserved = IntField(default=0)
+    credits_remaining = IntField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        "collection": "analysis_batches",
+        "indexes": ["user", "-created_at"],
+    }
+
+    def __str__(self):
+        return f"AnalysisBatch({self.id}: {len(self.video_ids)} videos)"
+
+
+class AnalysisLease(Document):
+    """
+    Single-flight lease: the job currently computing an analysis for a
+    (mode, video, parameters, model) key. Other jobs with the same key wait
+    for that job's result instead of running the pipeline again.
+    """
+
+    key = StringField(primary_key=True, max_length=64)
+    job_id = StringField(required=True, max_length=24)
+    # Renewed by the leader's heartbeat; an expired lease can be taken over
+    expires_at = DateTimeField(required=True)
+
+    meta = {
+        "collection": "analysis_leases",
+        "indexes": [{"fields": ["expires_at"], "expireAfterSeconds": 0}],
+    }
+
+    def __str__(self):
+        return f"AnalysisLease({self.key[:12]}: {self.job_id})"
+
+
+class AnalysisHistory(Document):
+    """
+    A user's completed analysis, kept for revisiting without a new run (only
+    if their save_analysis_history preference is on). The list fields are
+    stored at the top level so history pages are served from a projection;
+    metadata + analysis (aggregate and summary) are loaded by the detail view.
+    """
+
+    user = ReferenceField(MongoUser, required=True)
+    job_id = StringField(required=True, unique=True, max_length=24)
+    video_id = StringField(max_length=20)
+    youtube_url = StringField(max_length=500)
+    mode = StringField(max_length=20)
+    comment_limit = IntField()
+
+    # List view
+    title = StringField(max_length=300)
+    channel = StringField(max_length=200)
+    thumbnail = StringField(max_length=500)
+    total_comments_analyzed = IntField(default=0)
+    sentiment = DictField()  # positive / neutral / negative counts
+
+    # Detail view
+    metadata = DictField()
+    analysis = DictField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        "collection": "analysis_history",
+        "indexes": [
+            # Keyset pagination: newest first, _id breaks created_at ties
+            ("user", "-created_at", "-id"),
+        ],
+    }
+
+    def __str__(self):
+        return f"AnalysisHistory({self.video_id}: {self.title})"
+
+
+class CommentLabelChunk(Document):
+    """
+    Per-comment labels of an analysis job, stored compactly in chunks (one
+    document per ~500 comments) so exports can stream them chunk by chunk.
+    Row layout and codes: services/exports.py.
+    """
+
+    job_id = StringField(required=True, max_length=24)
+    seq = IntField(required=True)
+    rows = ListField()
+    expires_at = DateTimeField(required=True)
+
+    meta = {
+        "collection": "comment_label_chunks",
+        "indexes": [
+            {"fields": ["job_id", "seq"], "unique": True},
+            {"fields": ["expires_at"], "expireAfterSeconds": 0},
+        ],
+    }
+
+    def __str__(self):
+        return f"CommentLabelChunk({self.job_id} #{self.seq})"
+
+
+class LLMRateBucket(Document):
+    """
+    Token bucket for one model's Gemini quota (requests and tokens per
+    minute), shared by every worker process; see services/rate_limiter.py.
+    """
+
+    key = StringField(primary_key=True, max_length=100)  # model name
+    requests = FloatField(default=0)  # available now (after refill)
+    tokens = FloatField(default=0)  # may go negative after settling
+    refilled_at = FloatField(default=0)  # epoch seconds
+    version = IntField(default=0)  # compare-and-set
+
+    meta = {"collection": "llm_rate_buckets"}
+
+    def __str__(self):
+        return f"LLMRateBucket({self.key}: {self.requests:.1f} req)"
+
+
+class LLMCallSlot(Document):
+    """
+    One of the ANALYSIS_LLM_GLOBAL_CONCURRENCY slots for in-flight LLM calls,
+    shared by every worker process; see services/rate_limiter.py.
+    """
+
+    key = StringField(primary_key=True, max_length=10)  # slot number
+    holder = StringField(required=True, max_length=32)
+    # Released after the call; expires if its worker died mid-call
+    expires_at = DateTimeField(required=True)
+
+    meta = {
+        "collection": "llm_call_slots",
+        "indexes": [{"fields": ["expires_at"], "expireAfterSeconds": 0}],
+    }
+
+    def __str__(self):
+        return f"LLMCallSlot({self.key}: {self.holder})"
+
+
+class CachedCommentLabel(Document):
+    """
+    Per-comment LLM labels, content-addressed by
+    sha256(model | prompt version | normalized comment text).
+    """
+
+    key = StringField(primary_key=True, max_length=64)
+    # { "sentiment": "positive", "intent": "praise", "toxic": false, "topics": [...] }
+    label = DictField(required=True)
+    model_name = StringField(max_length=100)
+    prompt_version = StringField(max_length=20)
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        "collection": "comment_label_cache",
+        "indexes": [
+            {
+                "fields": ["created_at"],
+                "expireAfterSeconds": getattr(
+                    settings, "ANALYSIS_COMMENT_CACHE_TTL", 30 * 24 * 3600
+                ),
+            }
+        ],
+    }
+
+    def __str__(self):
+        return f"CachedCommentLabel({self.key[:12]}: {self.label})"
+
+
+class CachedAnalysisResult(Document):
+    """
+    Whole-analysis result, keyed by
+    sha256(video_id | comment_limit | model | prompt version).
+    """
+
+    key = StringField(primary_key=True, max_length=64)
+    video_id = StringField(required=True, max_length=50)
+    comment_limit = IntField(required=True)
+    model_name = StringField(max_length=100)
+    prompt_version = StringField(max_length=20)
+
+    metadata = DictField()
+    analysis = DictField()
+    sample_comments = ListField(DictField())
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        "collection": "analysis_result_cache",
+        "indexes": [
+            "video_id",
+            {
+                "fields": ["created_at"],
+                "expireAfterSeconds": getattr(
+                    settings, "ANALYSIS_RESULT_CACHE_TTL", 6 * 3600
+                ),
+            },
+        ],
+    }
+
+    def __str__(self):
+        return f"CachedAnalysisResult({self.video_id}, {self.comment_limit})"
+
+
+class VideoAnalysisState(Document):
+    """
+    Per-video state for incremental re-analysis (mode=incremental): which
+    comments were already analyzed and the running aggregate they produced.
+    """
+
+    video_id = StringField(required=True, unique=True, max_length=50)
+    model_name = StringField(max_length=100)
+    prompt_version = StringField(max_length=20)
+
+    # Most recent comment ids first, capped at ANALYSIS_INCREMENTAL_MAX_SEEN_IDS
+    seen_comment_ids = ListField(StringField(max_length=100))
+    # Oldest comment analyzed by a run capped at comment_limit: the unseen
+    # comments right after each are picked up by the next runs
+    backlog_cursors = ListField(StringField(max_length=100))
+    # StreamingAggregate.to_state()
+    aggregate = DictField()
+    analyzed_count = IntField(default=0)
+
+    # Last full result (returned as-is when there are no new comments)
+    metadata = DictField()
+    analysis = DictField()
+
+    last_fetched_at = DateTimeField()
+    updated_at = DateTimeField(default=datetime.utcnow)
+    # Optimistic concurrency: writes only succeed against the version read
+    version = IntField(default=0)
+
+    meta = {"collection": "video_analysis_state"}
+
+    def __str__(self):
+        return f"VideoAnalysisState({self.video_id}: {self.analyzed_count} comments)"
+
+
+class ChannelAnalysis(Document):
+    """
+    Channel-level rollup of the stored per-video analyses. Videos without a
+    recent analysis are analyzed first through a batch (status "waiting").
+    """
+
+    STATUS_WAITING = "waiting"
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    ACTIVE_STATUSES = [STATUS_WAITING, STATUS_QUEUED, STATUS_RUNNING]
+
+    user = ReferenceField(MongoUser, required=True)
+    channel_id = StringField(required=True, max_length=50)
+    channel_title = StringField(max_length=200)
+    video_ids = ListField(StringField(max_length=50))
+    comment_limit = IntField(default=150)
+    batch_id = StringField(max_length=24)  # analyses of the missing videos
+
+    status = StringField(
+        default=STATUS_QUEUED,
+        choices=[
+            STATUS_WAITING,
+            STATUS_QUEUED,
+            STATUS_RUNNING,
+            STATUS_COMPLETED,
+            STATUS_FAILED,
+        ],
+        max_length=20,
+    )
+    error = StringField(max_length=1000)
+    result = DictField()
+
+    # Credit for the summary call (the batch pays for its own videos)
+    credits_reserved = IntField(default=0)
+    credits_remaining = IntField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+    finished_at = DateTimeField()
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        "collection": "channel_analyses",
+        "indexes": [("user", "-created_at"), "batch_id"],
+    }
+
+    def __str__(self):
+        return f"ChannelAnalysis({self.channel_id}: {self.status})"
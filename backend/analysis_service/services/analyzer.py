@@ -1,29 +1,130 @@
 import logging
 import json
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from itertools import islice
 from django.conf import settings
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Callable, Tuple
+from .comment_cache import CommentResultCache
+from .batching import BatchPlanner, DEFAULT_BYTES_PER_TOKEN, estimate_text_tokens
+from .llm_backends import (
+    STAGES,
+    LLMBackend,
+    estimate_cost,
+    get_stage_backends,
+    models_signature,
+)
+from .prefilter import LocalSentimentClassifier
+from .rate_limiter import RateLimitTimeout, get_call_slots, get_rate_limiter
+from .prompts import (
+    BATCH_PROMPT_OVERHEAD_TOKENS,
+    BATCH_SYSTEM_INSTRUCTION,
+    PROMPT_VERSION,
+    build_batch_prompt,
+)
+from .reducer import StreamingAggregate, build_summary_digest
+from . import metrics
+from .resilience import (
+    BatchResponseError,
+    CircuitOpenError,
+    call_with_retry,
+    get_circuit_breaker,
+    is_overload_error,
+    is_transient_error,
+)
 
 logger = logging.getLogger(__name__)
 
+# Streaming mode routes (prefilter / cache lookup) this many comments at a time
+STREAM_CHUNK_SIZE = 500
+
+SENTIMENTS = ("positive", "neutral", "negative")
+INTENTS = ("praise", "complaint", "question", "suggestion")
+
 
 class AnalysisService:
-    def __init__(self):
-        # Configure Gemini
-        api_key = getattr(settings, "GOOGLE_API_KEY", None)
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not configured")
-        genai.configure(api_key=api_key)
-        self.model_name = "gemini-2.0-flash"
-        self.model = genai.GenerativeModel(self.model_name)
-
-        # Tracking for debug info
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
-        self.num_api_calls = 0
+    def __init__(
+        self,
+        backend: Optional[LLMBackend] = None,
+        max_concurrency: Optional[int] = None,
+        comment_cache: Optional[CommentResultCache] = None,
+        prefilter: Optional[LocalSentimentClassifier] = None,
+        stage_backends: Optional[Dict[str, List[LLMBackend]]] = None,
+    ):
+        # LLM backends per stage, [primary, *fallbacks] (Gemini by default, see
+        # ANALYSIS_LLM_BACKEND / ANALYSIS_<STAGE>_MODEL); `backend` serves all
+        if stage_backends is None:
+            if backend is not None:
+                stage_backends = {stage: [backend] for stage in STAGES}
+            else:
+                stage_backends = get_stage_backends()
+        self.stage_backends = stage_backends
+        self.backend = stage_backends["map"][0]
+        self.model_name = models_signature(
+            self.backend.model_name, stage_backends["summary"][0].model_name
+        )
+
+        # Number of batches sent to the LLM at the same time (map stage)
+        if max_concurrency is None:
+            max_concurrency = getattr(settings, "ANALYSIS_MAX_CONCURRENCY", 4)
+        self.max_concurrency = max(1, int(max_concurrency))
+
+        # Per-comment label cache (skips comments already labelled by the LLM)
+        if comment_cache is None and getattr(
+            settings, "ANALYSIS_COMMENT_CACHE_ENABLED", True
+        ):
+            # Labels come from the map model
+            comment_cache = CommentResultCache(self.backend.model_name, PROMPT_VERSION)
+        self.comment_cache = comment_cache
+
+        # Optional local fast path for trivially classifiable comments
+        if prefilter is None and getattr(settings, "ANALYSIS_PREFILTER_ENABLED", False):
+            prefilter = LocalSentimentClassifier(
+                threshold=getattr(settings, "ANALYSIS_PREFILTER_THRESHOLD", 0.85)
+            )
+        self.prefilter = prefilter
+
+        # Token-budget batching (replaces the fixed 50-comment batches)
+        self.batch_planner = BatchPlanner(
+            token_budget=getattr(settings, "ANALYSIS_BATCH_TOKEN_BUDGET", 4000),
+            max_comments=getattr(settings, "ANALYSIS_BATCH_MAX_COMMENTS", 100),
+            overhead_tokens=BATCH_PROMPT_OVERHEAD_TOKENS,
+            bytes_per_token=getattr(
+                settings, "ANALYSIS_BATCH_BYTES_PER_TOKEN", DEFAULT_BYTES_PER_TOKEN
+            ),
+        )
+
+        # Retries (429/5xx), batch bisection (bad responses), circuit breaker
+        self.max_retries = getattr(settings, "ANALYSIS_LLM_MAX_RETRIES", 3)
+        self.backoff_base = getattr(settings, "ANALYSIS_LLM_BACKOFF_BASE", 1.0)
+        self.backoff_max = getattr(settings, "ANALYSIS_LLM_BACKOFF_MAX", 20.0)
+        self.max_bisect_depth = getattr(settings, "ANALYSIS_BISECT_MAX_DEPTH", 6)
+        self.min_coverage = getattr(settings, "ANALYSIS_MIN_COVERAGE", 0.5)
+        self.breaker = get_circuit_breaker(self.backend.model_name)
+
+        # Tracking for debug info (shared by map-stage worker threads)
+        self._usage_lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        with self._usage_lock:
+            self.total_input_tokens = 0
+            self.total_output_tokens = 0
+            self.num_api_calls = 0
+            self.num_retries = 0
+            self.num_bisections = 0
+            self.analyzed_comments = 0
+            self.dropped_comments = 0
+            # (stage, model) -> calls / errors / tokens / seconds
+            self.stage_usage: Dict[Tuple[str, str], Dict[str, float]] = {}
 
     def analyze(
-        self, video_data: Dict[str, Any], comments: List[Dict[str, Any]]
+        self,
+        video_data: Dict[str, Any],
+        comments: List[Dict[str, Any]],
+        on_progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+        include_labels: bool = False,
     ) -> Dict[str, Any]:
         """
         Main analysis flow:
@@ -31,25 +132,53 @@ class AnalysisService:
         2. Analyze batches (Map)
         3. Aggregate (Reduce)
         4. Final Insight (Summary)
+
+        on_progress(done_batches, total_batches, running_totals) is called as
+        batches finish; running_totals holds sentiment/intents/toxic_count so far.
+
+        include_labels adds "comment_labels": one label per input comment, in
+        order (None for comments that could not be analyzed).
         """
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
-        self.num_api_calls = 0
+        self._reset_counters()
 
-        BATCH_SIZE = 50
-        batches = [
-            comments[i : i + BATCH_SIZE] for i in range(0, len(comments), BATCH_SIZE)
-        ]
+        # Confident local labels first, then cached labels; the rest go to the LLM
+        local_pairs, remaining = (
+            self.prefilter.classify(comments) if self.prefilter else ([], comments)
+        )
+        cached_pairs, pending = self._lookup_cached_labels(remaining)
+        cached_labels = [label for _, label in cached_pairs]
 
-        batch_results = []
-        print(f"\n--- Starting Analysis ({len(comments)} comments) ---")
-        for i, batch in enumerate(batches):
-            print(f"> Processing batch {i + 1}/{len(batches)}...")
-            try:
-                res = self._analyze_batch(batch)
-                batch_results.append(res)
-            except Exception as e:
-                logger.error(f"Batch {i} failed: {e}")
+        batches, planned_tokens = self.batch_planner.plan(pending)
+        batch_usage: List[Dict[str, int]] = [{} for _ in batches]
+
+        print(
+            f"\n--- Starting Analysis ({len(comments)} comments, "
+            f"{len(local_pairs)} local, {len(cached_labels)} cached, "
+            f"{len(batches)} batches) ---"
+        )
+        # Results that need no LLM call (cached + local labels)
+        pre_results = []
+        if cached_labels:
+            pre_results.append(self._labels_to_result(cached_labels))
+        if local_pairs:
+            pre_results.append(
+                self._labels_to_result([label for _, label in local_pairs])
+            )
+
+        batch_results = self._map_batches(
+            batches, on_progress, batch_usage, base_results=pre_results
+        )
+        self._store_labels(batches, batch_results)
+        batch_results.extend(pre_results)
+
+        # Coverage: too many dropped comments fails the analysis (and the job refunds)
+        covered = len(local_pairs) + len(cached_labels) + self.analyzed_comments
+        coverage = covered / len(comments) if comments else 1.0
+        if comments and coverage < self.min_coverage:
+            raise ValueError(
+                f"Only {covered} of {len(comments)} comments could be analyzed. "
+                "Please try again later."
+            )
 
         # Aggregate
         aggregated = self._aggregate_results(batch_results)
@@ -59,20 +188,9 @@ class AnalysisService:
             aggregated, video_data, comments[:10]
         )
 
-        # Calculate Cost (Gemini 2.0 Flash: $0.10 / 1M input, $0.40 / 1M output)
-        input_cost = (self.total_input_tokens / 1_000_000) * 0.10
-        output_cost = (self.total_output_tokens / 1_000_000) * 0.40
-        total_cost = input_cost + output_cost
-
-        # Debug Logs
-        print("--- Analysis Complete ---")
-        print(f"Model: {self.model_name}")
-        print(f"Total Tokens: {self.total_input_tokens + self.total_output_tokens}")
-        print(f"Input Tokens: {self.total_input_tokens}")
-        print(f"Output Tokens: {self.total_output_tokens}")
-        print(f"API Calls: {self.num_api_calls}")
-        print(f"Est. Cost: ${total_cost:.6f}")
-        print("-------------------------\n")
+        total_cost = self._finish_run(
+            len(comments), len(local_pairs), len(cached_labels), len(pending), covered
+        )
 
         # Add Debug Info
         final_insight["debug_info"] = {
@@ -82,47 +200,733 @@ class AnalysisService:
             "output_tokens": self.total_output_tokens,
             "estimated_cost_usd": round(total_cost, 6),
             "model_used": self.model_name,
+            "stages": self._stage_breakdown(),
             "api_calls": self.num_api_calls,
+            "max_concurrency": self.max_concurrency,
+            "cache_hits": len(cached_labels),
+            "cache_misses": len(pending),
+            "routing": {
+                "local": len(local_pairs),
+                "cache": len(cached_labels),
+                "llm": len(pending),
+                "prefilter_threshold": (
+                    self.prefilter.threshold if self.prefilter else None
+                ),
+            },
+            "batch_stats": self._batch_stats(batches, planned_tokens, batch_usage),
+            "coverage": {
+                "requested": len(comments),
+                "analyzed": covered,
+                "dropped": self.dropped_comments,
+                "ratio": round(coverage, 4),
+            },
+            "resilience": {
+                "retries": self.num_retries,
+                "bisections": self.num_bisections,
+                "circuit_state": self.breaker.state,
+            },
         }
 
+        if include_labels:
+            final_insight["comment_labels"] = self._comment_labels(
+                comments, local_pairs + cached_pairs, batches, batch_results
+            )
+
         return final_insight
 
-    def _analyze_batch(self, comments: List[Dict[str, Any]]) -> Dict[str, Any]:
-        comment_texts = [f"- {c['text']}" for c in comments]
-        text_block = "\n".join(comment_texts)
+    def analyze_stream(
+        self,
+        video_data: Dict[str, Any],
+        comments: Iterable[Dict[str, Any]],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_in_flight: Optional[int] = None,
+        aggregate: Optional[StreamingAggregate] = None,
+        on_labels: Optional[Callable[[List[Tuple[Dict, Dict]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Bounded-memory analyze() for very large comment streams.
 
-        prompt = f"""
-        Analyze these YouTube comments. Return JSON ONLY. No markdown.
-        
-        Comments:
-        {text_block}
-        
-        Output format:
-        {{
-            "sentiment": {{ "positive": int, "neutral": int, "negative": int }},
-            "topics": ["topic1", "topic2"],
-            "intents": {{ "praise": int, "complaint": int, "question": int, "suggestion": int }},
-            "notable_points": ["short phrase 1", "short phrase 2"],
-            "toxic_count": int
-        }}
+        Comments are routed (prefilter / cache), packed into batches and sent
+        to the LLM as they arrive. At most max_in_flight batches (default 2x
+        max_concurrency) are pending at once; the producer blocks until one
+        finishes (backpressure). Results are folded into a StreamingAggregate,
+        so memory stays flat regardless of how many comments are streamed.
+
+        on_progress({batches_done, comments_seen, map_done, sentiment,
+        intents, toxic_count}) is called as batches finish, and once more with
+        map_done=True when the map stage is over (before the summary call).
+
+        aggregate: existing totals to fold the new comments into (incremental
+        re-analysis); the summary then covers old + new comments.
+
+        on_labels([(comment, label), ...]) receives the per-comment labels as
+        they are produced (not in input order), from the calling thread.
         """
+        self._reset_counters()
+        if max_in_flight is None:
+            max_in_flight = 2 * self.max_concurrency
 
-        try:
+        agg = aggregate if aggregate is not None else StreamingAggregate()
+        top_comments: List[Dict[str, Any]] = []
+        routed = {"seen": 0, "local": 0, "cache": 0, "llm": 0}
+        batch_totals = {"batches": 0, "planned": 0, "actual": 0, "measured_planned": 0}
+
+        def pending_stream():
+            """Route comments chunk by chunk; yields those that need the LLM."""
+            iterator = iter(comments)
+            while True:
+                chunk = list(islice(iterator, STREAM_CHUNK_SIZE))
+                if not chunk:
+                    return
+                routed["seen"] += len(chunk)
+                if len(top_comments) < 10:
+                    top_comments.extend(chunk[: 10 - len(top_comments)])
+
+                local_pairs, remaining = (
+                    self.prefilter.classify(chunk) if self.prefilter else ([], chunk)
+                )
+                cached_pairs, pending = self._lookup_cached_labels(remaining)
+                labels = [label for _, label in local_pairs + cached_pairs]
+                if labels:
+                    agg.add(self._labels_to_result(labels))
+                    if on_labels:
+                        on_labels(local_pairs + cached_pairs)
+                routed["local"] += len(local_pairs)
+                routed["cache"] += len(cached_pairs)
+                routed["llm"] += len(pending)
+                yield from pending
+
+        def report(map_done: bool = False):
+            if not on_progress:
+                return
+            try:
+                on_progress(
+                    {
+                        "batches_done": batch_totals["batches"],
+                        "comments_seen": routed["seen"],
+                        "map_done": map_done,
+                        **agg.counts(),
+                    }
+                )
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+
+        def finish(future, batch, planned, usage):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Batch failed: {e}")
+                result = {}
+            agg.add(result)
+            self._store_labels([batch], [result])
+            if on_labels:
+                labels = self._extract_labels(result, len(batch))
+                on_labels([(batch[i], label) for i, label in labels.items()])
+
+            batch_totals["batches"] += 1
+            batch_totals["planned"] += planned
+            if usage.get("input_tokens"):
+                batch_totals["actual"] += usage["input_tokens"]
+                batch_totals["measured_planned"] += planned
+            report()
+
+        def run(batch: List[Dict[str, Any]], usage: Dict[str, int]):
+            with metrics.timed("map_batch"):
+                return self._analyze_batch(batch, usage)
+
+        print(f"\n--- Starting Streaming Analysis (max {max_in_flight} in flight) ---")
+        in_flight = {}
+        with ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="analysis-stream"
+        ) as executor:
+            for batch, planned in self.batch_planner.iter_batches(pending_stream()):
+                while len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future, *in_flight.pop(future))
+
+                usage: Dict[str, int] = {}
+                future = executor.submit(run, batch, usage)
+                in_flight[future] = (batch, planned, usage)
+
+            for future in as_completed(list(in_flight)):
+                finish(future, *in_flight.pop(future))
+
+        if not routed["seen"]:
+            raise ValueError("No comments to analyze.")
+
+        covered = routed["local"] + routed["cache"] + self.analyzed_comments
+        coverage = covered / routed["seen"]
+        if coverage < self.min_coverage:
+            raise ValueError(
+                f"Only {covered} of {routed['seen']} comments could be analyzed. "
+                "Please try again later."
+            )
+        report(map_done=True)
+
+        digest = agg.digest(
+            top_k_topics=getattr(settings, "ANALYSIS_SUMMARY_TOP_TOPICS", 15),
+            top_k_points=getattr(settings, "ANALYSIS_SUMMARY_TOP_POINTS", 10),
+        )
+        final_insight = self._generate_executive_summary(
+            agg.counts(), video_data, top_comments, digest=digest
+        )
+
+        total_cost = self._finish_run(
+            routed["seen"], routed["local"], routed["cache"], routed["llm"], covered
+        )
+
+        final_insight["debug_info"] = {
+            "num_comments": routed["seen"],
+            "total_tokens": self.total_input_tokens + self.total_output_tokens,
+            "input_tokens": self.total_input_tokens,
+            "output_tokens": self.total_output_tokens,
+            "estimated_cost_usd": round(total_cost, 6),
+            "model_used": self.model_name,
+            "stages": self._stage_breakdown(),
+            "api_calls": self.num_api_calls,
+            "max_concurrency": self.max_concurrency,
+            "max_in_flight": max_in_flight,
+            "cache_hits": routed["cache"],
+            "cache_misses": routed["llm"],
+            "routing": {
+                "local": routed["local"],
+                "cache": routed["cache"],
+                "llm": routed["llm"],
+                "prefilter_threshold": (
+                    self.prefilter.threshold if self.prefilter else None
+                ),
+            },
+            "batch_stats": {
+                "batches": batch_totals["batches"],
+                "planned_input_tokens": batch_totals["planned"],
+                "actual_to_planned_ratio": (
+                    round(batch_totals["actual"] / batch_totals["measured_planned"], 3)
+                    if batch_totals["measured_planned"]
+                    else None
+                ),
+            },
+            "coverage": {
+                "requested": routed["seen"],
+                "analyzed": covered,
+                "dropped": self.dropped_comments,
+                "ratio": round(coverage, 4),
+            },
+            "resilience": {
+                "retries": self.num_retries,
+                "bisections": self.num_bisections,
+                "circuit_state": self.breaker.state,
+            },
+        }
+        return final_insight
+
+    def _finish_run(
+        self, num_comments: int, local: int, cached: int, pending: int, covered: int
+    ) -> float:
+        """Estimate cost, record run metrics and print the debug logs."""
+        total_cost = self._estimated_cost()
+
+        self._record_cost_metrics()
+        metrics.COMMENTS_ROUTED.labels(path="local").inc(local)
+        metrics.COMMENTS_ROUTED.labels(path="cache").inc(cached)
+        metrics.COMMENTS_ROUTED.labels(path="llm").inc(self.analyzed_comments)
+        metrics.COMMENTS_ROUTED.labels(path="dropped").inc(self.dropped_comments)
+        if self.comment_cache:
+            metrics.CACHE_REQUESTS.labels(cache="comment", outcome="hit").inc(cached)
+            metrics.CACHE_REQUESTS.labels(cache="comment", outcome="miss").inc(pending)
+
+        # Debug Logs
+        print("--- Analysis Complete ---")
+        print(f"Model: {self.model_name}")
+        print(f"Total Tokens: {self.total_input_tokens + self.total_output_tokens}")
+        print(f"Input Tokens: {self.total_input_tokens}")
+        print(f"Output Tokens: {self.total_output_tokens}")
+        print(f"API Calls: {self.num_api_calls}")
+        print(f"Retries: {self.num_retries}, Bisections: {self.num_bisections}")
+        print(f"Coverage: {covered}/{num_comments} ({self.dropped_comments} dropped)")
+        for stage, models in self._stage_breakdown().items():
+            for model, row in models.items():
+                print(
+                    f"  {stage} / {model}: {row['calls']} calls, "
+                    f"{row['avg_latency_ms']} ms avg, ${row['cost_usd']:.6f}"
+                )
+        print(f"Est. Cost: ${total_cost:.6f}")
+        print("-------------------------\n")
+        return total_cost
+
+    def _estimated_cost(self) -> float:
+        """Priced per model (MODEL_PRICING), summed over stages."""
+        with self._usage_lock:
+            rows = list(self.stage_usage.items())
+        return sum(
+            estimate_cost(model, row["input_tokens"], row["output_tokens"])
+            for (_, model), row in rows
+        )
+
+    def _record_cost_metrics(self) -> None:
+        with self._usage_lock:
+            rows = list(self.stage_usage.items())
+        for (_, model), row in rows:
+            metrics.LLM_COST_USD.labels(model=model).inc(
+                estimate_cost(model, row["input_tokens"], row["output_tokens"])
+            )
+
+    def _stage_breakdown(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """debug_info["stages"]: {stage: {model: calls, tokens, cost, latency}}"""
+        with self._usage_lock:
+            rows = sorted(self.stage_usage.items())
+        breakdown: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (stage, model), row in rows:
+            calls = int(row["calls"])
+            breakdown.setdefault(stage, {})[model] = {
+                "calls": calls,
+                "errors": int(row["errors"]),
+                "fallbacks": int(row["fallbacks"]),
+                "input_tokens": int(row["input_tokens"]),
+                "output_tokens": int(row["output_tokens"]),
+                "cost_usd": round(
+                    estimate_cost(model, row["input_tokens"], row["output_tokens"]),
+                    6,
+                ),
+                "latency_s": round(row["seconds"], 3),
+                "avg_latency_ms": round(1000 * row["seconds"] / calls) if calls else 0,
+            }
+        return breakdown
+
+    def _map_batches(
+        self,
+        batches: List[List[Dict[str, Any]]],
+        on_progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+        batch_usage: Optional[List[Dict[str, int]]] = None,
+        base_results: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run _analyze_batch over all batches with a bounded worker pool.
+        Results are returned in batch order; failed batches become {}.
+        batch_usage[i] (if given) receives the token usage of batch i.
+        base_results are only counted in the running totals sent to on_progress.
+        """
+        completed = list(base_results or [])
+
+        def report(done: int):
+            if not on_progress:
+                return
+            try:
+                on_progress(done, len(batches), self._running_totals(completed))
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+
+        if not batches:
+            report(0)
+            return []
+
+        def run(index: int, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+            print(f"> Processing batch {index + 1}/{len(batches)}...")
+            usage = batch_usage[index] if batch_usage is not None else None
+            with metrics.timed("map_batch"):
+                return self._analyze_batch(batch, usage)
+
+        workers = min(self.max_concurrency, len(batches))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="analysis-map"
+        ) as executor:
+            futures = {
+                executor.submit(run, i, batch): i for i, batch in enumerate(batches)
+            }
+
+            batch_results: List[Dict[str, Any]] = [{} for _ in batches]
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                try:
+                    batch_results[i] = future.result()
+                except Exception as e:
+                    logger.error(f"Batch {i} failed: {e}")
+
+                completed.append(batch_results[i])
+                report(done)
+
+        return batch_results
+
+    def _running_totals(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Counts-only view of _aggregate_results for progress updates."""
+        agg = self._aggregate_results(results)
+        return {
+            "sentiment": agg["sentiment"],
+            "intents": agg["intents"],
+            "toxic_count": agg["toxic_count"],
+        }
+
+    @staticmethod
+    def _batch_stats(
+        batches: List[List[Dict[str, Any]]],
+        planned_tokens: List[int],
+        batch_usage: List[Dict[str, int]],
+    ) -> Dict[str, Any]:
+        """Planned vs actual prompt tokens per batch (estimator calibration)."""
+        per_batch = [
+            {
+                "comments": len(batch),
+                "planned_input_tokens": planned,
+                "actual_input_tokens": usage.get("input_tokens"),
+                "output_tokens": usage.get("output_tokens"),
+            }
+            for batch, planned, usage in zip(batches, planned_tokens, batch_usage)
+        ]
+
+        measured = [b for b in per_batch if b["actual_input_tokens"]]
+        ratio = None
+        if measured:
+            ratio = round(
+                sum(b["actual_input_tokens"] for b in measured)
+                / max(1, sum(b["planned_input_tokens"] for b in measured)),
+                3,
+            )
+        return {"batches": per_batch, "actual_to_planned_ratio": ratio}
+
+    def _lookup_cached_labels(self, comments: List[Dict[str, Any]]):
+        """Split comments into ([(comment, cached label)], comments still to analyze)."""
+        if not self.comment_cache or not comments:
+            return [], list(comments)
+
+        keys = [self.comment_cache.key_for(c) for c in comments]
+        hits = self.comment_cache.get_many(keys)
+
+        cached_pairs = []
+        pending = []
+        for comment, key in zip(comments, keys):
+            if key in hits:
+                cached_pairs.append((comment, hits[key]))
+            else:
+                pending.append(comment)
+        return cached_pairs, pending
+
+    def _store_labels(
+        self, batches: List[List[Dict[str, Any]]], results: List[Dict[str, Any]]
+    ) -> None:
+        """Cache the per-comment labels returned for each batch."""
+        if not self.comment_cache:
+            return
+
+        to_store = {}
+        for batch, res in zip(batches, results):
+            for index, label in self._extract_labels(res, len(batch)).items():
+                to_store[self.comment_cache.key_for(batch[index])] = label
+        self.comment_cache.set_many(to_store)
+
+    @staticmethod
+    def _extract_labels(result: Dict[str, Any], batch_size: int) -> Dict[int, Dict]:
+        """Validate the "labels" list of a batch result -> { index: label }."""
+        labels = {}
+        for item in (result or {}).get("labels") or []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("i"))
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= index < batch_size or item.get("sentiment") not in SENTIMENTS:
+                continue
+
+            intent = item.get("intent")
+            topics = item.get("topics") or []
+            labels[index] = {
+                "sentiment": item["sentiment"],
+                "intent": intent if intent in INTENTS else "other",
+                "toxic": bool(item.get("toxic")),
+                "topics": (
+                    [str(t) for t in topics][:3] if isinstance(topics, list) else []
+                ),
+            }
+        return labels
+
+    @classmethod
+    def _comment_labels(
+        cls,
+        comments: List[Dict[str, Any]],
+        pairs: List[tuple],
+        batches: List[List[Dict[str, Any]]],
+        batch_results: List[Dict[str, Any]],
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Per-comment labels in input order (None where a comment was dropped)."""
+        by_comment = {id(comment): label for comment, label in pairs}
+        for batch, res in zip(batches, batch_results):
+            for index, label in cls._extract_labels(res, len(batch)).items():
+                by_comment[id(batch[index])] = label
+        return [by_comment.get(id(comment)) for comment in comments]
+
+    @staticmethod
+    def _labels_to_result(labels: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Turn per-comment labels into a batch-shaped result for aggregation."""
+        res = {
+            "sentiment": {k: 0 for k in SENTIMENTS},
+            "topics": [],
+            "intents": {k: 0 for k in INTENTS},
+            "notable_points": [],
+            "toxic_count": 0,
+        }
+        for label in labels:
+            if label.get("sentiment") in SENTIMENTS:
+                res["sentiment"][label["sentiment"]] += 1
+            if label.get("intent") in INTENTS:
+                res["intents"][label["intent"]] += 1
+            res["topics"].extend(label.get("topics") or [])
+            if label.get("toxic"):
+                res["toxic_count"] += 1
+        return res
+
+    def _record_call(
+        self,
+        stage: str,
+        model: str,
+        seconds: float,
+        response=None,
+        fallback: bool = False,
+    ) -> None:
+        """Per (stage, model) call stats; response is None for failed calls."""
+        with self._usage_lock:
+            row = self.stage_usage.setdefault(
+                (stage, model),
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "fallbacks": 0,
+                    "input_tokens": 0,
+                    "output_tokens": 0,
+                    "seconds": 0.0,
+                },
+            )
+            row["calls"] += 1
+            row["seconds"] += seconds
+            if fallback:
+                row["fallbacks"] += 1
+            if response is None:
+                row["errors"] += 1
+            else:
+                row["input_tokens"] += response.input_tokens
+                row["output_tokens"] += response.output_tokens
+
+    def _record_usage(self, response, stage: str = "map"):
+        """
+        Add token usage of an LLM response to the running totals.
+        Returns (input_tokens, output_tokens) for this response.
+        """
+        input_tokens, output_tokens = response.input_tokens, response.output_tokens
+        with self._usage_lock:
+            self.total_input_tokens += input_tokens
+            self.total_output_tokens += output_tokens
+        metrics.LLM_TOKENS.labels(stage=stage, direction="input").inc(input_tokens)
+        metrics.LLM_TOKENS.labels(stage=stage, direction="output").inc(output_tokens)
+        return input_tokens, output_tokens
+
+    def _count_api_call(self, stage: str = "map") -> None:
+        with self._usage_lock:
             self.num_api_calls += 1
-            response = self.model.generate_content(prompt)
+        metrics.LLM_API_CALLS.labels(stage=stage).inc()
+
+    def _count(self, attr: str, amount: int = 1) -> None:
+        with self._usage_lock:
+            setattr(self, attr, getattr(self, attr) + amount)
+
+    def _generate(
+        self, prompt: str, stage: str = "map", system_instruction: Optional[str] = None
+    ):
+        """
+        Single logical LLM call: shared per-model rate limit, circuit breaker
+        + retries with backoff on 429/5xx. Within an attempt, a quota /
+        overload error (or an open circuit) on the stage's primary model moves
+        on to its fallback models.
+        Returns (response, input_tokens, output_tokens).
+        """
+        backends = self.stage_backends.get(stage) or self.stage_backends["map"]
+        # Reserved up front; output tokens are charged once known. Estimated
+        # like the batch planner (UTF-8 bytes), so both share one calibration
+        bytes_per_token = self.batch_planner.bytes_per_token
+        estimated_tokens = estimate_text_tokens(prompt, bytes_per_token)
+        estimated_tokens += estimate_text_tokens(system_instruction, bytes_per_token)
 
-            # Track tokens
-            if response.usage_metadata:
-                self.total_input_tokens += response.usage_metadata.prompt_token_count
-                self.total_output_tokens += (
-                    response.usage_metadata.candidates_token_count
+        def attempt():
+            last_error: Optional[Exception] = None
+            for index, backend in enumerate(backends):
+                model = backend.model_name
+                has_fallback = index + 1 < len(backends)
+                limiter = get_rate_limiter(model) if backend.shared_quota else None
+                if limiter:
+                    # Waits (across all workers) for quota instead of a 429
+                    try:
+                        waited = limiter.acquire(estimated_tokens)
+                    except RateLimitTimeout as e:
+                        metrics.LLM_FAILURES.labels(
+                            stage=stage, kind="rate_limited"
+                        ).inc()
+                        last_error = e
+                        continue
+                    metrics.LLM_RATE_LIMIT_WAIT_SECONDS.labels(model=model).observe(
+                        waited
+                    )
+                # Global cap on in-flight provider calls (all worker processes)
+                slots = get_call_slots() if backend.shared_quota else None
+                slot = None
+                if slots:
+                    try:
+                        slot = slots.acquire()
+                    except RateLimitTimeout as e:
+                        metrics.LLM_FAILURES.labels(
+                            stage=stage, kind="rate_limited"
+                        ).inc()
+                        if limiter:
+                            limiter.release(estimated_tokens)
+                        last_error = e
+                        continue
+
+                breaker = get_circuit_breaker(model)
+                try:
+                    breaker.before_call()
+                except CircuitOpenError as e:
+                    metrics.LLM_FAILURES.labels(stage=stage, kind="circuit_open").inc()
+                    if limiter:
+                        limiter.release(estimated_tokens)
+                    if slots:
+                        slots.release(slot)
+                    last_error = e
+                    continue
+
+                self._count_api_call(stage)
+                start = time.perf_counter()
+                try:
+                    response = backend.generate(prompt, system_instruction)
+                except Exception as e:
+                    transient = is_transient_error(e)
+                    if transient:
+                        breaker.record_failure()
+                    if limiter:
+                        # The request was sent, but no tokens were billed
+                        limiter.settle(estimated_tokens, 0)
+                    metrics.LLM_FAILURES.labels(
+                        stage=stage, kind="transient" if transient else "error"
+                    ).inc()
+                    self._record_call(
+                        stage, model, time.perf_counter() - start, fallback=index > 0
+                    )
+                    if has_fallback and is_overload_error(e):
+                        logger.warning(f"{model} overloaded ({e}), trying fallback")
+                        last_error = e
+                        continue
+                    raise
+                else:
+                    breaker.record_success()
+                finally:
+                    # A non-transient error must not leave a half-open trial
+                    # in flight forever (every later call would fail fast)
+                    breaker.release_trial()
+                    if slots:
+                        slots.release(slot)
+                if limiter:
+                    limiter.settle(
+                        estimated_tokens,
+                        response.input_tokens + response.output_tokens,
+                    )
+                self._record_call(
+                    stage, model, time.perf_counter() - start, response, index > 0
                 )
+                return response
+            raise last_error
+
+        def on_retry(attempt_no: int, e: Exception):
+            self._count("num_retries")
+            metrics.LLM_RETRIES.labels(stage=stage).inc()
+
+        response = call_with_retry(
+            attempt,
+            max_retries=self.max_retries,
+            base_delay=self.backoff_base,
+            max_delay=self.backoff_max,
+            on_retry=on_retry,
+        )
+        input_tokens, output_tokens = self._record_usage(response, stage)
+        return response, input_tokens, output_tokens
+
+    @staticmethod
+    def _parse_json_response(response) -> Dict[str, Any]:
+        clean_text = response.text.replace("```json", "").replace("```", "").strip()
+        try:
+            result = json.loads(clean_text)
+        except ValueError as e:
+            raise BatchResponseError(f"Unparseable LLM response: {e}")
+        if not isinstance(result, dict):
+            raise BatchResponseError("LLM response is not a JSON object")
+        return result
 
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
+    def _analyze_batch(
+        self,
+        comments: List[Dict[str, Any]],
+        usage: Optional[Dict[str, int]] = None,
+        depth: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Analyze one batch. Transient errors are retried inside _generate; a
+        bad response (unparseable JSON, rejected content) splits the batch in
+        half and retries each half, so one bad comment only drops itself.
+        Returns {} if nothing in the batch could be analyzed.
+        """
+        try:
+            result = self._request_batch(comments, usage)
         except Exception as e:
-            logger.error(f"LLM Batch Error: {e}")
-            return {}  # Return empty to ignore this batch
+            if isinstance(e, BatchResponseError):
+                metrics.LLM_FAILURES.labels(stage="map", kind="bad_response").inc()
+            if (
+                isinstance(e, CircuitOpenError)
+                or is_transient_error(e)
+                or len(comments) <= 1
+                or depth >= self.max_bisect_depth
+            ):
+                logger.error(f"LLM Batch Error ({len(comments)} comments dropped): {e}")
+                self._count("dropped_comments", len(comments))
+                return {}
+
+            logger.warning(f"Bisecting batch of {len(comments)} comments: {e}")
+            self._count("num_bisections")
+            metrics.BATCH_BISECTIONS.inc()
+            mid = len(comments) // 2
+            left = self._analyze_batch(comments[:mid], usage, depth + 1)
+            right = self._analyze_batch(comments[mid:], usage, depth + 1)
+            return self._merge_halves(left, right, mid)
+
+        self._count("analyzed_comments", len(comments))
+        return result
+
+    def _merge_halves(
+        self, left: Dict[str, Any], right: Dict[str, Any], offset: int
+    ) -> Dict[str, Any]:
+        """Combine the results of a bisected batch (label indexes re-based)."""
+        if not left and not right:
+            return {}
+
+        merged = self._aggregate_results([left, right])
+        labels = list((left or {}).get("labels") or [])
+        for item in (right or {}).get("labels") or []:
+            if isinstance(item, dict) and isinstance(item.get("i"), int):
+                labels.append({**item, "i": item["i"] + offset})
+        merged["labels"] = labels
+        return merged
+
+    def _request_batch(
+        self,
+        comments: List[Dict[str, Any]],
+        usage: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, Any]:
+        """One batch prompt -> parsed JSON. Raises on any failure."""
+        # Instructions + schema go in the (static) system instruction
+        response, input_tokens, output_tokens = self._generate(
+            build_batch_prompt(comments, getattr(comments, "texts", None)),
+            system_instruction=BATCH_SYSTEM_INSTRUCTION,
+        )
+
+        # Track tokens (summed over bisected sub-batches)
+        if usage is not None:
+            usage["input_tokens"] = usage.get("input_tokens", 0) + input_tokens
+            usage["output_tokens"] = usage.get("output_tokens", 0) + output_tokens
+
+        return self._parse_json_response(response)
 
     def _aggregate_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
         agg = {
@@ -162,12 +966,23 @@ class AnalysisService:
         return agg
 
     def _generate_executive_summary(
-        self, agg_stats: Dict, video_meta: Dict, top_comments: List[Dict]
+        self,
+        agg_stats: Dict,
+        video_meta: Dict,
+        top_comments: List[Dict],
+        digest: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        """Final Pass"""
+        """Final Pass (digest is precomputed in streaming mode)"""
 
-        # Prepare context
-        stats_summary = json.dumps(agg_stats, indent=2)
+        # Prepare context: a fixed-size digest (top topics / clustered points
+        # with counts) so the prompt does not grow with the number of comments
+        if digest is None:
+            digest = build_summary_digest(
+                agg_stats,
+                top_k_topics=getattr(settings, "ANALYSIS_SUMMARY_TOP_TOPICS", 15),
+                top_k_points=getattr(settings, "ANALYSIS_SUMMARY_TOP_POINTS", 10),
+            )
+        stats_summary = json.dumps(digest, ensure_ascii=False, separators=(",", ":"))
         top_comments_text = "\n".join(
             [f"- {c['text']} (Likes: {c.get('likes', 0)})" for c in top_comments]
         )
@@ -177,7 +992,7 @@ class AnalysisService:
         
         Video Encoutered: {video_meta.get("title")}
         
-        Aggregated Stats from all comments:
+        Aggregated Stats from all comments (topic / point counts = mentions):
         {stats_summary}
         
         Representative Top Comments:
@@ -200,18 +1015,9 @@ class AnalysisService:
         """
 
         try:
-            self.num_api_calls += 1
-            response = self.model.generate_content(prompt)
-
-            # Track tokens
-            if response.usage_metadata:
-                self.total_input_tokens += response.usage_metadata.prompt_token_count
-                self.total_output_tokens += (
-                    response.usage_metadata.candidates_token_count
-                )
-
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
-            result = json.loads(clean_text)
+            with metrics.timed("summary"):
+                response, _, _ = self._generate(prompt, stage="summary")
+            result = self._parse_json_response(response)
 
             # Merge some stat data back if LLM hallucinated numbers, but usually LLM is better at synthesizing
             # Let's ensure sentiment breakdown comes from our hard stats if possible, or trust LLM to copy it?
@@ -219,8 +1025,91 @@ class AnalysisService:
             result["sentiment_breakdown"] = agg_stats["sentiment"]
             result["total_comments_analyzed"] = sum(agg_stats["sentiment"].values())
             result["toxic_count"] = agg_stats["toxic_count"]
+            result["intents"] = agg_stats["intents"]
+            result["topic_frequencies"] = digest["top_topics"]
 
             return result
         except Exception as e:
             logger.error(f"Executive Summary Error: {e}")
             raise ValueError("Failed to generate summary analysis")
+
+    def summarize_channel(
+        self,
+        aggregate: StreamingAggregate,
+        channel_title: str,
+        videos: List[Dict[str, Any]],
+        max_videos_in_prompt: int = 30,
+    ) -> Dict[str, Any]:
+        """
+        Channel rollup: one summary call over per-video aggregates merged into
+        `aggregate` (no comment is sent again). videos: one row per included
+        video ({video_id, title, comments, sentiment, toxic_count, topics});
+        the most commented ones are listed in the prompt.
+        """
+        self._reset_counters()
+        digest = aggregate.digest(
+            top_k_topics=getattr(settings, "ANALYSIS_SUMMARY_TOP_TOPICS", 15),
+            top_k_points=getattr(settings, "ANALYSIS_SUMMARY_TOP_POINTS", 10),
+        )
+        stats_summary = json.dumps(digest, ensure_ascii=False, separators=(",", ":"))
+        listed = sorted(videos, key=lambda v: v["comments"], reverse=True)
+        video_lines = "\n".join(
+            f"- {v['title']} ({v['comments']} comments, "
+            f"{v['sentiment'].get('positive', 0)} positive / "
+            f"{v['sentiment'].get('negative', 0)} negative; "
+            f"topics: {', '.join(v['topics'][:3]) or '-'})"
+            for v in listed[:max_videos_in_prompt]
+        )
+
+        prompt = f"""
+        You are an expert YouTube channel analyst. Generate a channel-level executive summary.
+
+        Channel: {channel_title}
+        Videos analyzed: {len(videos)}
+
+        Aggregated Stats across all videos (topic / point counts = mentions):
+        {stats_summary}
+
+        Most discussed videos:
+        {video_lines}
+
+        Return JSON ONLY. No markdown. Structure:
+        {{
+          "overall_summary": "1-2 sentence summary of how the audience reacts to the channel.",
+          "what_users_love": ["point 1", "point 2", "point 3"],
+          "areas_for_improvement": ["point 1", "point 2"],
+          "creator_actions": [
+            {{ "action": "specific action", "impact": "High/Medium", "effort": "Low/Medium" }}
+          ],
+          "video_ideas": ["idea 1", "idea 2"],
+          "key_topics": ["topic 1", "topic 2", "topic 3"]
+        }}
+        """
+
+        try:
+            with metrics.timed("summary"):
+                response, _, _ = self._generate(prompt, stage="summary")
+            result = self._parse_json_response(response)
+        except Exception as e:
+            logger.error(f"Channel Summary Error: {e}")
+            raise ValueError("Failed to generate channel summary")
+
+        counts = aggregate.counts()
+        result["sentiment_breakdown"] = counts["sentiment"]
+        result["total_comments_analyzed"] = sum(counts["sentiment"].values())
+        result["toxic_count"] = counts["toxic_count"]
+        result["intents"] = counts["intents"]
+        result["topic_frequencies"] = digest["top_topics"]
+
+        total_cost = self._estimated_cost()
+        self._record_cost_metrics()
+        result["debug_info"] = {
+            "num_videos": len(videos),
+            "input_tokens": self.total_input_tokens,
+            "output_tokens": self.total_output_tokens,
+            "estimated_cost_usd": round(total_cost, 6),
+            "model_used": self.model_name,
+            "stages": self._stage_breakdown(),
+            "api_calls": self.num_api_calls,
+        }
+        return result
@@ -0,0 +1,110 @@
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from .prompts import compact_comment
+
+# Rough UTF-8 bytes per token for Gemini on short social text.
+# Calibrate with debug_info["batch_stats"] (planned vs actual input tokens).
+DEFAULT_BYTES_PER_TOKEN = 4.0
+
+# "[12] " index prefix + newline
+LINE_OVERHEAD_TOKENS = 4
+
+
+def estimate_text_tokens(
+    text: str, bytes_per_token: float = DEFAULT_BYTES_PER_TOKEN
+) -> int:
+    """
+    Cheap token estimate for any prompt text.
+    Counting UTF-8 bytes (not chars) makes emoji/non-latin text cost more,
+    which matches how the tokenizer treats them.
+    """
+    return math.ceil(len((text or "").encode("utf-8")) / bytes_per_token)
+
+
+def estimate_comment_tokens(
+    text: str, bytes_per_token: float = DEFAULT_BYTES_PER_TOKEN
+) -> int:
+    """Cheap token estimate for one comment line (index prefix included)."""
+    return estimate_text_tokens(text, bytes_per_token) + LINE_OVERHEAD_TOKENS
+
+
+class PlannedBatch(list):
+    """
+    A batch of comments plus their compacted texts (same order): each text is
+    compacted once, while sizing the batch, and reused by the prompt. Slices
+    (batch bisection) keep both aligned.
+    """
+
+    def __init__(
+        self, comments: Sequence[Dict[str, Any]] = (), texts: Sequence[str] = ()
+    ):
+        super().__init__(comments)
+        self.texts = list(texts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PlannedBatch(super().__getitem__(index), self.texts[index])
+        return super().__getitem__(index)
+
+
+class BatchPlanner:
+    """
+    Greedily packs comments (in order) into batches so that each prompt stays
+    under `token_budget` input tokens and `max_comments` comments.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        max_comments: int,
+        overhead_tokens: int = 0,
+        bytes_per_token: float = DEFAULT_BYTES_PER_TOKEN,
+    ):
+        self.token_budget = token_budget
+        self.max_comments = max(1, max_comments)
+        self.overhead_tokens = overhead_tokens
+        self.bytes_per_token = bytes_per_token
+
+    def plan(self, comments: List[Dict[str, Any]]):
+        """
+        Returns (batches, planned_tokens) where planned_tokens[i] is the
+        estimated prompt size (overhead included) of batches[i].
+        A single comment larger than the budget gets a batch of its own.
+        """
+        batches: List[PlannedBatch] = []
+        planned_tokens: List[int] = []
+        for batch, tokens in self.iter_batches(comments):
+            batches.append(batch)
+            planned_tokens.append(tokens)
+        return batches, planned_tokens
+
+    def iter_batches(
+        self, comments: Iterable[Dict[str, Any]]
+    ) -> Iterator[Tuple[PlannedBatch, int]]:
+        """
+        Lazy version of plan(): yields (batch, planned_tokens) as soon as a
+        batch is full, so it can sit in a streaming pipeline.
+        """
+        content_budget = max(1, self.token_budget - self.overhead_tokens)
+
+        current = PlannedBatch()
+        current_tokens = 0
+
+        for comment in comments:
+            # Sized as sent: the prompt reuses this compacted text
+            text = compact_comment(comment.get("text", ""))
+            tokens = estimate_comment_tokens(text, self.bytes_per_token)
+            if current and (
+                current_tokens + tokens > content_budget
+                or len(current) >= self.max_comments
+            ):
+                yield current, current_tokens + self.overhead_tokens
+                current, current_tokens = PlannedBatch(), 0
+
+            current.append(comment)
+            current.texts.append(text)
+            current_tokens += tokens
+
+        if current:
+            yield current, current_tokens + self.overhead_tokens
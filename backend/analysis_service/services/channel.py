@@ -0,0 +1,324 @@
+import logging
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from credits.utils import refund_credits, reserve_credits
+from ..models import AnalysisJob, ChannelAnalysis
+from .analyzer import AnalysisService
+from .jobs import _get_executor, expire_stale_job, submit_batch_analysis
+from .reducer import StreamingAggregate
+
+logger = logging.getLogger(__name__)
+
+# The rollup itself is one summary call
+CHANNEL_CREDIT_COST = 1
+
+
+def stored_video_aggregates(
+    video_ids: List[str], max_age_days: Optional[int] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Latest completed analysis per video (any user, any mode), projected down
+    to its aggregates: counts, topic frequencies and the summary points.
+    One aggregation query; full results and comment samples are never loaded.
+    """
+    if max_age_days is None:
+        max_age_days = getattr(settings, "ANALYSIS_CHANNEL_MAX_AGE_DAYS", 30)
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+
+    rows = AnalysisJob.objects(
+        video_id__in=list(video_ids),
+        status=AnalysisJob.STATUS_COMPLETED,
+        finished_at__gte=cutoff,
+    ).aggregate(
+        [
+            {"$sort": {"finished_at": -1}},
+            {
+                "$group": {
+                    "_id": "$video_id",
+                    "title": {"$first": "$result.metadata.title"},
+                    "sentiment": {"$first": "$result.analysis.sentiment_breakdown"},
+                    "intents": {"$first": "$result.analysis.intents"},
+                    "toxic_count": {"$first": "$result.analysis.toxic_count"},
+                    "topic_frequencies": {
+                        "$first": "$result.analysis.topic_frequencies"
+                    },
+                    "key_topics": {"$first": "$result.analysis.key_topics"},
+                    "loved": {"$first": "$result.analysis.what_users_love"},
+                    "improve": {"$first": "$result.analysis.areas_for_improvement"},
+                    "analyzed_at": {"$first": "$finished_at"},
+                }
+            },
+        ]
+    )
+
+    videos = {}
+    for row in rows:
+        sentiment = row.get("sentiment") or {}
+        if not sentiment:
+            continue
+        # Results from before topic frequencies were stored: one mention each
+        topics = row.get("topic_frequencies") or [
+            {"topic": topic, "count": 1} for topic in row.get("key_topics") or []
+        ]
+        videos[row["_id"]] = {
+            "video_id": row["_id"],
+            "title": row.get("title") or row["_id"],
+            "comments": sum(sentiment.values()),
+            "sentiment": sentiment,
+            "intents": row.get("intents") or {},
+            "toxic_count": row.get("toxic_count") or 0,
+            "topic_frequencies": topics,
+            "points": (row.get("loved") or []) + (row.get("improve") or []),
+            "analyzed_at": row.get("analyzed_at"),
+        }
+    return videos
+
+
+def merge_video_aggregates(videos: List[Dict[str, Any]]) -> StreamingAggregate:
+    """Reduce per-video aggregates into one channel aggregate (no LLM call)."""
+    aggregate = StreamingAggregate()
+    for video in videos:
+        aggregate.add(
+            {
+                "sentiment": video["sentiment"],
+                "intents": video["intents"],
+                "toxic_count": video["toxic_count"],
+                "notable_points": video["points"],
+            }
+        )
+        aggregate.add_topic_counts(video["topic_frequencies"])
+    return aggregate
+
+
+def submit_channel_analysis(
+    user,
+    channel_id: str,
+    max_videos: int,
+    comment_limit: int,
+    analyze_missing: bool = True,
+) -> ChannelAnalysis:
+    """
+    Channel rollup over the channel's latest uploads. Videos with a recent
+    stored analysis are reused as-is; the others are analyzed first through
+    a batch (charged per video) unless analyze_missing is False.
+    Raises ValueError (unknown channel / no videos) or InsufficientCreditsError.
+    """
+    from youtube_service.youtube_api_service import YouTubeAPIService
+
+    success, message, channel = YouTubeAPIService().fetch_channel_video_ids(
+        channel_id, max_videos
+    )
+    if not success:
+        raise ValueError(message)
+    video_ids = channel["video_ids"]
+    if not video_ids:
+        raise ValueError("This channel has no public videos")
+
+    stored = stored_video_aggregates(video_ids)
+    missing = [video_id for video_id in video_ids if video_id not in stored]
+
+    reference = f"channel:{channel_id}"
+    new_balance = reserve_credits(user, amount=CHANNEL_CREDIT_COST, reference=reference)
+    analysis = None
+    try:
+        waiting = bool(missing and analyze_missing)
+        analysis = ChannelAnalysis(
+            user=user,
+            channel_id=channel_id,
+            channel_title=channel["title"][:200],
+            video_ids=video_ids,
+            comment_limit=comment_limit,
+            status=(
+                ChannelAnalysis.STATUS_WAITING
+                if waiting
+                else ChannelAnalysis.STATUS_QUEUED
+            ),
+            credits_reserved=CHANNEL_CREDIT_COST,
+            credits_remaining=new_balance,
+        )
+        analysis.save()
+
+        if waiting:
+            batch, _ = submit_batch_analysis(
+                user,
+                [f"https://www.youtube.com/watch?v={video_id}" for video_id in missing],
+                comment_limit,
+            )
+            analysis.update(
+                set__batch_id=str(batch.id),
+                set__credits_remaining=batch.credits_remaining,
+            )
+            analysis.reload()
+            # All missing videos may have been served from the result cache
+            resume_channel_analyses(str(batch.id))
+        else:
+            _get_executor().submit(run_channel_analysis, str(analysis.id))
+    except Exception:
+        if analysis is None or analysis.id is None:
+            refund_credits(user, CHANNEL_CREDIT_COST, reference=reference)
+        else:
+            fail_channel_analysis(str(analysis.id), "Channel submission failed")
+        raise
+
+    logger.info(
+        f"Channel analysis {analysis.id} for {channel_id}: {len(video_ids)} videos, "
+        f"{len(stored)} stored, {len(missing)} missing"
+    )
+    return analysis
+
+
+def resume_channel_analyses(batch_id: str) -> None:
+    """Queue the rollups waiting on a batch once none of its jobs is active."""
+    active = AnalysisJob.objects(
+        batch_id=batch_id, status__in=AnalysisJob.ACTIVE_STATUSES
+    ).count()
+    if active:
+        return
+
+    for analysis in ChannelAnalysis.objects(
+        batch_id=batch_id, status=ChannelAnalysis.STATUS_WAITING
+    ).only("id"):
+        # Atomic transition: only one finishing job queues the rollup
+        queued = ChannelAnalysis.objects(
+            id=analysis.id, status=ChannelAnalysis.STATUS_WAITING
+        ).modify(
+            set__status=ChannelAnalysis.STATUS_QUEUED,
+            set__updated_at=datetime.utcnow(),
+        )
+        if queued:
+            _get_executor().submit(run_channel_analysis, str(analysis.id))
+
+
+def run_channel_analysis(analysis_id: str) -> None:
+    """Worker entry point: merge the stored aggregates and summarize once."""
+    analysis = ChannelAnalysis.objects(
+        id=analysis_id, status=ChannelAnalysis.STATUS_QUEUED
+    ).modify(
+        set__status=ChannelAnalysis.STATUS_RUNNING,
+        set__updated_at=datetime.utcnow(),
+        new=True,
+    )
+    if not analysis:
+        return
+
+    try:
+        stored = stored_video_aggregates(analysis.video_ids)
+        videos = [stored[v] for v in analysis.video_ids if v in stored]
+        if not videos:
+            raise ValueError("None of the channel's videos could be analyzed")
+
+        aggregate = merge_video_aggregates(videos)
+        per_video = [
+            {
+                "video_id": v["video_id"],
+                "title": v["title"],
+                "comments": v["comments"],
+                "sentiment": v["sentiment"],
+                "toxic_count": v["toxic_count"],
+                "topics": [t["topic"] for t in v["topic_frequencies"][:5]],
+                "analyzed_at": (
+                    v["analyzed_at"].isoformat() if v["analyzed_at"] else None
+                ),
+            }
+            for v in videos
+        ]
+        summary = AnalysisService().summarize_channel(
+            aggregate, analysis.channel_title or analysis.channel_id, per_video
+        )
+    except Exception as e:
+        logger.error(f"Channel analysis {analysis_id} failed: {e}")
+        logger.error(traceback.format_exc())
+        fail_channel_analysis(analysis_id, str(e))
+        return
+
+    now = datetime.utcnow()
+    ChannelAnalysis.objects(id=analysis_id).update_one(
+        set__status=ChannelAnalysis.STATUS_COMPLETED,
+        set__result={
+            "analysis": summary,
+            "videos": per_video,
+            "coverage": {
+                "videos_total": len(analysis.video_ids),
+                "videos_included": len(videos),
+                "videos_missing": [v for v in analysis.video_ids if v not in stored],
+            },
+        },
+        set__finished_at=now,
+        set__updated_at=now,
+    )
+
+
+def fail_channel_analysis(analysis_id: str, error: str) -> bool:
+    """Mark an active rollup as failed and refund its credit (at most once)."""
+    now = datetime.utcnow()
+    analysis = ChannelAnalysis.objects(
+        id=analysis_id, status__in=ChannelAnalysis.ACTIVE_STATUSES
+    ).modify(
+        set__status=ChannelAnalysis.STATUS_FAILED,
+        set__error=error[:1000],
+        set__finished_at=now,
+        set__updated_at=now,
+        new=True,
+    )
+    if not analysis:
+        return False
+
+    if analysis.credits_reserved:
+        try:
+            refund_credits(
+                analysis.user,
+                analysis.credits_reserved,
+                reference=f"channel:{analysis.channel_id}",
+            )
+        except Exception as e:
+            logger.error(f"Refund for channel analysis {analysis_id} failed: {e}")
+    return True
+
+
+def refresh_channel_analysis(analysis: ChannelAnalysis) -> ChannelAnalysis:
+    """
+    Polling hook: expire stalled batch jobs, start a rollup whose batch is done
+    and fail a rollup whose worker stopped. Returns the fresh document.
+    """
+    if analysis.status == ChannelAnalysis.STATUS_WAITING and analysis.batch_id:
+        for job in AnalysisJob.objects(
+            batch_id=analysis.batch_id, status__in=AnalysisJob.ACTIVE_STATUSES
+        ):
+            expire_stale_job(job)
+        resume_channel_analyses(analysis.batch_id)
+    elif analysis.status in (
+        ChannelAnalysis.STATUS_QUEUED,
+        ChannelAnalysis.STATUS_RUNNING,
+    ):
+        stale_after = getattr(settings, "ANALYSIS_JOB_STALE_SECONDS", 900)
+        if analysis.updated_at < datetime.utcnow() - timedelta(seconds=stale_after):
+            fail_channel_analysis(
+                str(analysis.id),
+                "Channel analysis timed out. Your credits have been refunded.",
+            )
+    return ChannelAnalysis.objects(id=analysis.id).first()
+
+
+def serialize_channel_analysis(analysis: ChannelAnalysis) -> Dict[str, Any]:
+    data = {
+        "channel_analysis_id": str(analysis.id),
+        "channel_id": analysis.channel_id,
+        "channel_title": analysis.channel_title,
+        "status": analysis.status,
+        "videos_total": len(analysis.video_ids),
+        "batch_id": analysis.batch_id,
+        "credits_remaining": analysis.credits_remaining,
+        "created_at": analysis.created_at.isoformat() if analysis.created_at else None,
+        "finished_at": (
+            analysis.finished_at.isoformat() if analysis.finished_at else None
+        ),
+    }
+    if analysis.status == ChannelAnalysis.STATUS_COMPLETED:
+        data["result"] = analysis.result
+    elif analysis.status == ChannelAnalysis.STATUS_FAILED:
+        data["error"] = analysis.error
+    return data
@@ -1,44 +1,81 @@
 import re
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Normalized texts shorter than this are noise ("lol", "first")
+MIN_TEXT_LENGTH = 5
+# Longer comments are truncated (LLM efficiency)
+MAX_TEXT_LENGTH = 800
+
+# Reasons a comment is dropped, in the order the rules are applied
+DROP_RULES = ("empty", "duplicate", "too_short", "url_only")
+
+_URL_ONLY_RE = re.compile(r"https?://\S+")
 
 
 class CommentCleaner:
-    def clean_comments(self, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """
-        Clean, deduplicate, and filter comments.
-        """
-        seen_texts = set()
-        cleaned = []
+    """
+    Clean, deduplicate and filter comments.
+
+    iter_clean() consumes any iterable lazily; clean_comments() is the list
+    wrapper. The caller's dicts are never modified: a truncated comment is
+    yielded as a copy. drops counts dropped comments per rule (DROP_RULES),
+    summed over every call on this instance.
+    """
+
+    def __init__(self, dedup_window: Optional[int] = None):
+        # Streams: the duplicate set is reset once it holds this many texts
+        self.dedup_window = dedup_window
+        self.drops = {rule: 0 for rule in DROP_RULES}
+        self.kept = 0
+        self.truncated = 0
+
+    def iter_clean(
+        self, comments: Iterable[Dict[str, Any]]
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield the cleaned comments (duplicates are judged per call)."""
+        # Hashes of the normalized texts: small however long the comments are
+        seen = set()
+        drops = self.drops
 
         for c in comments:
-            text = c.get("text", "")
+            text = c.get("text") or ""
             if not text:
+                drops["empty"] += 1
                 continue
 
-            # 1. Deduplication
-            # Normalize for dedup (lowercase, strip)
-            norm_text = text.strip().lower()
-            if norm_text in seen_texts:
+            stripped = text.strip()
+            key = hash(stripped.lower())
+            if key in seen:
+                drops["duplicate"] += 1
                 continue
-            seen_texts.add(norm_text)
+            if self.dedup_window and len(seen) >= self.dedup_window:
+                seen.clear()
+            seen.add(key)
 
-            # 2. Filter empty/short
-            if (
-                len(norm_text) < 5
-            ):  # "lol", "first" -> maybe keep? User said "Remove empty". Let's say < 3 chars is noise.
+            if len(stripped) < MIN_TEXT_LENGTH:
+                drops["too_short"] += 1
                 continue
 
-            # 3. URL-only spam detection
-            # If text is basically just a URL
-            if re.match(r"^https?://\S+$", text.strip()):
+            if stripped.startswith("http") and _URL_ONLY_RE.fullmatch(stripped):
+                drops["url_only"] += 1
                 continue
 
-            # 4. Truncate very long comments (e.g. max 500 chars for LLM efficiency)
-            if len(text) > 800:
-                text = text[:800] + "..."
+            self.kept += 1
+            if len(text) > MAX_TEXT_LENGTH:
+                self.truncated += 1
+                yield {**c, "text": text[:MAX_TEXT_LENGTH] + "..."}
+            else:
+                yield c
 
-            # Update text in dict
-            c["text"] = text
-            cleaned.append(c)
+    def clean_comments(self, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Clean, deduplicate, and filter comments.
+        """
+        return list(self.iter_clean(comments))
 
-        return cleaned
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kept": self.kept,
+            "truncated": self.truncated,
+            "dropped": dict(self.drops),
+        }
@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from mongoengine.errors import NotUniqueError
+from pymongo.errors import DuplicateKeyError
+
+from ..models import AnalysisJob, AnalysisLease
+from .analyzer import PROMPT_VERSION
+from .llm_backends import configured_model_name
+
+logger = logging.getLogger(__name__)
+
+
+def enabled() -> bool:
+    return getattr(settings, "ANALYSIS_COALESCE_ENABLED", True)
+
+
+def lease_key(job: AnalysisJob) -> Optional[str]:
+    """Jobs with the same key produce the same result (None: never coalesced)."""
+    if not job.video_id:
+        return None
+    raw = (
+        f"{job.mode}|{job.video_id}|{job.comment_limit}|{job.scan_limit or ''}|"
+        f"{configured_model_name()}|{PROMPT_VERSION}"
+        # A job storing labels must not reuse a result without them
+        f"{'|labels' if job.include_labels else ''}"
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _lease_seconds() -> int:
+    return getattr(settings, "ANALYSIS_COALESCE_LEASE_SECONDS", 120)
+
+
+def acquire_lease(key: str, job_id: str) -> str:
+    """
+    Take the lease for `key` unless another job holds an unexpired one.
+    Returns the id of the job holding the lease (job_id if acquired).
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=_lease_seconds())
+    try:
+        # Matches only a missing or expired lease; a live one makes the upsert
+        # collide on the primary key
+        AnalysisLease.objects(key=key, expires_at__lt=now).modify(
+            upsert=True, set__job_id=job_id, set__expires_at=expires_at
+        )
+        return job_id
+    except (NotUniqueError, DuplicateKeyError):
+        lease = AnalysisLease.objects(key=key).first()
+        # Released between the two queries: try again
+        return lease.job_id if lease else acquire_lease(key, job_id)
+
+
+def renew_lease(key: str, job_id: str) -> None:
+    expires_at = datetime.utcnow() + timedelta(seconds=_lease_seconds())
+    AnalysisLease.objects(key=key, job_id=job_id).update_one(set__expires_at=expires_at)
+
+
+def release_lease(key: Optional[str], job_id: str) -> None:
+    """Drop the lease if `job_id` still holds it (no-op for followers)."""
+    if key:
+        AnalysisLease.objects(key=key, job_id=job_id).delete()
+
+
+def lease_held(key: str, job_id: str) -> bool:
+    """Whether `job_id` still holds an unexpired lease for `key`."""
+    lease = AnalysisLease.objects(key=key).first()
+    return bool(
+        lease and lease.job_id == job_id and lease.expires_at >= datetime.utcnow()
+    )
+
+
+class LeaseHeartbeat:
+    """
+    Renews the leader's lease from a daemon thread every third of its
+    lifetime while the pipeline runs, so a long summary call (retries,
+    backoff, rate-limit waits) without progress reports keeps it.
+    A no-op without a key.
+    """
+
+    def __init__(self, key: Optional[str], job_id: str):
+        self.key = key
+        self.job_id = job_id
+        self.interval = max(1.0, _lease_seconds() / 3)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        if self.key:
+            self._thread = threading.Thread(
+                target=self._run, name="analysis-lease", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                renew_lease(self.key, self.job_id)
+            except Exception as e:
+                logger.warning(f"Lease of job {self.job_id} not renewed: {e}")
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_comment_text(text: str) -> str:
+    """Lowercase + collapse whitespace so trivial variants share a cache entry."""
+    return _WHITESPACE_RE.sub(" ", (text or "").strip().lower())
+
+
+def comment_cache_key(text: str, model_name: str, prompt_version: str) -> str:
+    raw = f"{model_name}|{prompt_version}|{normalize_comment_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _LRU:
+    """Small thread-safe LRU used as the in-process tier."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+# Shared by every AnalysisService in this process
+_process_lru: Optional[_LRU] = None
+_process_lru_lock = threading.Lock()
+
+
+def _get_process_lru() -> _LRU:
+    global _process_lru
+
+    with _process_lru_lock:
+        if _process_lru is None:
+            _process_lru = _LRU(
+                getattr(settings, "ANALYSIS_COMMENT_CACHE_LRU_SIZE", 20000)
+            )
+        return _process_lru
+
+
+class CommentResultCache:
+    """
+    Two-tier cache of per-comment LLM labels:
+    1. in-process LRU
+    2. Mongo collection with a TTL index (shared by all workers)
+
+    Cache failures never fail an analysis; they just count as misses.
+    """
+
+    def __init__(
+        self, model_name: str, prompt_version: str, use_mongo: Optional[bool] = None
+    ):
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        if use_mongo is None:
+            use_mongo = getattr(settings, "ANALYSIS_COMMENT_CACHE_MONGO", True)
+        self.use_mongo = use_mongo
+        self.lru = _get_process_lru()
+
+    def key_for(self, comment: Dict[str, Any]) -> str:
+        return comment_cache_key(
+            comment.get("text", ""), self.model_name, self.prompt_version
+        )
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            label = self.lru.get(key)
+            if label is not None:
+                found[key] = label
+            else:
+                missing.append(key)
+
+        if missing and self.use_mongo:
+            try:
+                from ..models import CachedCommentLabel
+
+                for doc in CachedCommentLabel.objects(key__in=missing).only(
+                    "key", "label"
+                ):
+                    found[doc.key] = doc.label
+                    self.lru.set(doc.key, doc.label)
+            except Exception as e:
+                logger.warning(f"Comment cache lookup failed: {e}")
+
+        return found
+
+    def set_many(self, labels: Dict[str, Dict[str, Any]]) -> None:
+        if not labels:
+            return
+
+        for key, label in labels.items():
+            self.lru.set(key, label)
+
+        if not self.use_mongo:
+            return
+
+        try:
+            from pymongo import UpdateOne
+            from ..models import CachedCommentLabel
+
+            now = datetime.utcnow()
+            ops = [
+                UpdateOne(
+                    {"_id": key},
+                    {
+                        "$set": {
+                            "label": label,
+                            "model_name": self.model_name,
+                            "prompt_version": self.prompt_version,
+                            "created_at": now,
+                        }
+                    },
+                    upsert=True,
+                )
+                for key, label in labels.items()
+            ]
+            CachedCommentLabel._get_collection().bulk_write(ops, ordered=False)
+        except Exception as e:
+            logger.warning(f"Comment cache write failed: {e}")
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Dict, Any, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from ..models import AnalysisJob
+from .jobs import expire_stale_job, serialize_job
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 15
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+@sync_to_async(thread_sensitive=False)
+def _load_job(job_id: str, user) -> Optional[AnalysisJob]:
+    job = AnalysisJob.objects(id=job_id, user=user).first()
+    return expire_stale_job(job) if job else None
+
+
+async def job_event_stream(job_id: str, user) -> AsyncIterator[str]:
+    """
+    Server-sent events for an analysis job, read from the job document.
+
+    Events: progress, metadata, comments, batch, summary, error.
+    The job runs in a background worker, so any process can serve the stream;
+    waiting happens with asyncio.sleep and holds no worker thread.
+    """
+    poll_interval = getattr(settings, "ANALYSIS_EVENTS_POLL_SECONDS", 0.5)
+    last_progress = None
+    sent_metadata = sent_comments = False
+    last_batch = -1
+    last_write = time.monotonic()
+
+    while True:
+        try:
+            job = await _load_job(job_id, user)
+        except Exception as e:
+            logger.error(f"Event stream for job {job_id} failed: {e}")
+            yield format_sse("error", {"error": "Failed to load analysis job"})
+            return
+
+        if not job:
+            yield format_sse("error", {"error": "Job not found"})
+            return
+
+        events = []
+        live = job.live or {}
+
+        if (job.stage, job.progress) != last_progress:
+            last_progress = (job.stage, job.progress)
+            events.append(("progress", {"stage": job.stage, "progress": job.progress}))
+
+        if not sent_metadata and "fetched" in live:
+            sent_metadata = True
+            events.append(("metadata", live["fetched"]))
+
+        if not sent_comments and "cleaned" in live:
+            sent_comments = True
+            events.append(("comments", live["cleaned"]))
+
+        batch = live.get("analyzing")
+        if batch and batch.get("batches_done", 0) > last_batch:
+            last_batch = batch.get("batches_done", 0)
+            events.append(("batch", batch))
+
+        if job.status == AnalysisJob.STATUS_COMPLETED:
+            events.append(("summary", serialize_job(job)))
+        elif job.status == AnalysisJob.STATUS_FAILED:
+            events.append(("error", serialize_job(job)))
+
+        for event, data in events:
+            yield format_sse(event, data)
+            last_write = time.monotonic()
+
+        if job.status not in AnalysisJob.ACTIVE_STATUSES:
+            return
+
+        if time.monotonic() - last_write >= KEEPALIVE_SECONDS:
+            # Comment line keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
+            last_write = time.monotonic()
+
+        await asyncio.sleep(poll_interval)
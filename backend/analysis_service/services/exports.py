@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ..models import CommentLabelChunk
+from .analyzer import INTENTS, SENTIMENTS
+from .sampling import parse_like_count
+
+logger = logging.getLogger(__name__)
+
+LABEL_CHUNK_SIZE = 500
+LABEL_INTENTS = INTENTS + ("other",)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+EXPORT_COLUMNS = (
+    "cid",
+    "author",
+    "likes",
+    "text",
+    "sentiment",
+    "intent",
+    "toxic",
+    "topics",
+)
+
+
+def compact_row(comment: Dict[str, Any], label: Dict[str, Any]) -> List[Any]:
+    """
+    Stored row: [cid, author, likes, text, sentiment code, intent code,
+    toxic 0/1, topics]; codes index SENTIMENTS / LABEL_INTENTS. likes is
+    parsed (the scraper gives "1.2K").
+    """
+    intent = label.get("intent")
+    return [
+        comment.get("cid"),
+        comment.get("author"),
+        parse_like_count(comment.get("likes")),
+        comment.get("text") or "",
+        SENTIMENTS.index(label["sentiment"]),
+        LABEL_INTENTS.index(intent) if intent in INTENTS else len(INTENTS),
+        1 if label.get("toxic") else 0,
+        list(label.get("topics") or []),
+    ]
+
+
+def expand_row(row: List[Any]) -> Dict[str, Any]:
+    cid, author, likes, text, sentiment, intent, toxic, topics = row
+    return {
+        "cid": cid,
+        "author": author,
+        "likes": likes,
+        "text": text,
+        "sentiment": SENTIMENTS[sentiment],
+        "intent": LABEL_INTENTS[intent],
+        "toxic": bool(toxic),
+        "topics": topics,
+    }
+
+
+class CommentLabelWriter:
+    """
+    Collects (comment, label) pairs from a pipeline run (its on_labels
+    callback) and stores them every LABEL_CHUNK_SIZE rows, so only one chunk
+    is held in memory. Comments without a label (dropped) are skipped.
+    Not thread-safe: the analyzer reports labels from the calling thread.
+    """
+
+    def __init__(self, job_id: str, chunk_size: int = LABEL_CHUNK_SIZE):
+        self.job_id = job_id
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._seq = 0
+        self._rows: List[List[Any]] = []
+        retention = getattr(settings, "ANALYSIS_LABELS_RETENTION_DAYS", 30)
+        self._expires_at = datetime.utcnow() + timedelta(days=retention)
+
+    def add(self, pairs: Iterable[Tuple[Dict[str, Any], Optional[Dict]]]) -> None:
+        for comment, label in pairs:
+            if not label:
+                continue
+            self._rows.append(compact_row(comment, label))
+            self.count += 1
+            if len(self._rows) >= self.chunk_size:
+                self._flush()
+
+    def close(self) -> None:
+        self._flush()
+
+    def discard(self) -> None:
+        """Drop what was stored so far (the run failed)."""
+        self._rows = []
+        try:
+            CommentLabelChunk.objects(job_id=self.job_id).delete()
+        except Exception as e:
+            logger.warning(f"Labels of job {self.job_id} not deleted: {e}")
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        CommentLabelChunk(
+            job_id=self.job_id,
+            seq=self._seq,
+            rows=self._rows,
+            expires_at=self._expires_at,
+        ).save()
+        self._seq += 1
+        self._rows = []
+
+
+def _load_chunk(job_id: str, after_seq: int) -> Optional[Dict[str, Any]]:
+    return (
+        CommentLabelChunk.objects(job_id=job_id, seq__gt=after_seq)
+        .order_by("seq")
+        .only("seq", "rows")
+        .as_pymongo()
+        .first()
+    )
+
+
+def format_rows(rows: List[List[Any]], export_format: str) -> str:
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            data = expand_row(row)
+            data["topics"] = "; ".join(data["topics"])
+            writer.writerow([data[column] for column in EXPORT_COLUMNS])
+        return buffer.getvalue()
+    return "".join(
+        json.dumps(expand_row(row), ensure_ascii=False) + "\n" for row in rows
+    )
+
+
+def _csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_COLUMNS)
+    return buffer.getvalue()
+
+
+def iter_label_export(job_id: str, export_format: str) -> Iterator[str]:
+    """
+    NDJSON lines or CSV rows of a job's stored labels, one chunk per query
+    (keyset on seq): memory stays flat however many comments were labelled.
+    Sync iterator, for WSGI (which would buffer label_export_stream).
+    """
+    if export_format == "csv":
+        yield _csv_header()
+
+    seq = -1
+    while True:
+        try:
+            chunk = _load_chunk(job_id, seq)
+        except Exception as e:
+            # Headers are already sent: the export just ends early
+            logger.error(f"Label export for job {job_id} failed: {e}")
+            return
+        if chunk is None:
+            return
+        seq = chunk["seq"]
+        yield format_rows(chunk["rows"], export_format)
+
+
+async def label_export_stream(job_id: str, export_format: str) -> AsyncIterator[str]:
+    """iter_label_export for ASGI: the queries run off the event loop."""
+    if export_format == "csv":
+        yield _csv_header()
+
+    load_chunk = sync_to_async(_load_chunk, thread_sensitive=False)
+    seq = -1
+    while True:
+        try:
+            chunk = await load_chunk(job_id, seq)
+        except Exception as e:
+            logger.error(f"Label export for job {job_id} failed: {e}")
+            return
+        if chunk is None:
+            return
+        seq = chunk["seq"]
+        yield format_rows(chunk["rows"], export_format)
@@ -0,0 +1,147 @@
+import base64
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from mongoengine.errors import NotUniqueError
+from mongoengine.queryset.visitor import Q
+
+from ..models import AnalysisHistory, AnalysisJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Projection of the list view: never the metadata / analysis bodies
+LIST_FIELDS = (
+    "id",
+    "job_id",
+    "video_id",
+    "youtube_url",
+    "mode",
+    "title",
+    "channel",
+    "thumbnail",
+    "total_comments_analyzed",
+    "sentiment",
+    "created_at",
+)
+
+
+def history_enabled(user) -> bool:
+    """The user's save_analysis_history preference (on by default)."""
+    from accounts.models import MongoUserPreference
+
+    preferences = (
+        MongoUserPreference.objects(user=user).only("save_analysis_history").first()
+    )
+    return preferences is None or bool(preferences.save_analysis_history)
+
+
+def record_analysis(job: AnalysisJob, result: Dict[str, Any]) -> None:
+    """
+    Add a completed job to its user's history. Debug info and comment
+    samples are left out; never raises (history is best effort).
+    """
+    try:
+        if not history_enabled(job.user):
+            return
+        metadata = result.get("metadata") or {}
+        analysis = {
+            key: value
+            for key, value in (result.get("analysis") or {}).items()
+            if key != "debug_info"
+        }
+        sentiment = analysis.get("sentiment_breakdown") or {}
+        AnalysisHistory(
+            user=job.user,
+            job_id=str(job.id),
+            video_id=job.video_id or metadata.get("video_id"),
+            youtube_url=job.youtube_url,
+            mode=job.mode,
+            comment_limit=job.comment_limit,
+            title=(metadata.get("title") or "")[:300],
+            channel=(metadata.get("channel") or "")[:200],
+            thumbnail=(metadata.get("thumbnail") or "")[:500],
+            total_comments_analyzed=analysis.get("total_comments_analyzed")
+            or sum(sentiment.values()),
+            sentiment=sentiment,
+            metadata=metadata,
+            analysis=analysis,
+        ).save()
+    except NotUniqueError:
+        pass  # already recorded (job_id is unique)
+    except Exception as e:
+        logger.warning(f"Analysis history for job {job.id} not saved: {e}")
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = f"{row['created_at'].isoformat()}|{row['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Raises ValueError for a cursor not produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, history_id = raw.split("|")
+        return datetime.fromisoformat(created_at), ObjectId(history_id)
+    except (ValueError, InvalidId, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+
+def list_history(
+    user, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of the user's history, newest first: (items, next_cursor).
+    Keyset pagination on (created_at, _id), so every page is a single range
+    scan of the (user, -created_at, -_id) index, however deep.
+    Raises ValueError for an invalid cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = AnalysisHistory.objects(user=user)
+    if cursor:
+        created_at, history_id = decode_cursor(cursor)
+        query = query.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=history_id)
+        )
+
+    # One extra row tells whether there is a next page
+    rows = list(
+        query.order_by("-created_at", "-id")
+        .only(*LIST_FIELDS)
+        .limit(limit + 1)
+        .as_pymongo()
+    )
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return [serialize_history_row(row) for row in rows[:limit]], next_cursor
+
+
+def serialize_history_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    created_at = row.get("created_at")
+    return {
+        "history_id": str(row["_id"]),
+        "job_id": row.get("job_id"),
+        "video_id": row.get("video_id"),
+        "youtube_url": row.get("youtube_url"),
+        "mode": row.get("mode"),
+        "title": row.get("title"),
+        "channel": row.get("channel"),
+        "thumbnail": row.get("thumbnail"),
+        "total_comments_analyzed": row.get("total_comments_analyzed", 0),
+        "sentiment": row.get("sentiment") or {},
+        "created_at": created_at.isoformat() if created_at else None,
+    }
+
+
+def serialize_history_entry(entry: AnalysisHistory) -> Dict[str, Any]:
+    """Detail view: the stored report, shaped like a job result."""
+    return {
+        **serialize_history_row(entry.to_mongo().to_dict()),
+        "comment_limit": entry.comment_limit,
+        "result": {"metadata": entry.metadata, "analysis": entry.analysis},
+    }
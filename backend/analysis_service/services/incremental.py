@@ -0,0 +1,282 @@
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from django.conf import settings
+
+from .analyzer import PROMPT_VERSION, AnalysisService
+from .cleaner import CommentCleaner
+from .metrics import timed
+from .pipeline import NoCommentsError
+from .reducer import StreamingAggregate
+from .youtube import YouTubeFetchService
+
+logger = logging.getLogger(__name__)
+
+# YoutubeCommentDownloader sort order: 0 = newest first
+SORT_NEWEST = 0
+
+
+def load_state(video_id: str, model_name: str):
+    """Stored state for the video, or None if missing / made by another model."""
+    from ..models import VideoAnalysisState
+
+    state = VideoAnalysisState.objects(video_id=video_id).first()
+    if not state:
+        return None
+    if state.model_name != model_name or state.prompt_version != PROMPT_VERSION:
+        # Labels from a different model/prompt can't be mixed in
+        return None
+    return state
+
+
+def new_comments(
+    comments: Iterable[Dict[str, Any]],
+    seen: Set[str],
+    stop_after_known: int,
+    resume_after: Optional[Set[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Newest-first comments up to the already-analyzed ones.
+    Stops after `stop_after_known` consecutive known ids (a pinned comment is
+    listed first even in newest-first order, so a single known id at the top
+    must not end the scan).
+    resume_after: backlog cursors; the scan skips the known comments down to
+    each one and yields the unseen comments after it too. Cursors are removed
+    from the set as they are passed.
+    """
+    pending = resume_after if resume_after is not None else set()
+    collecting = True
+    known_run = 0
+    for comment in comments:
+        cid = comment.get("cid")
+        if cid in pending:
+            pending.discard(cid)
+            collecting, known_run = True, 0
+            continue
+        if cid in seen:
+            if collecting:
+                known_run += 1
+                if known_run >= stop_after_known:
+                    if not pending:
+                        return
+                    collecting = False
+            continue
+        if collecting:
+            known_run = 0
+            yield comment
+
+
+def save_state(
+    state,
+    video_id: str,
+    model_name: str,
+    new_ids: List[str],
+    aggregate: StreamingAggregate,
+    result: Dict[str, Any],
+    fetched_at: datetime,
+    backlog: List[str],
+) -> bool:
+    """
+    Persist the merged state. Returns False if another run updated the video
+    in the meantime (that run's state wins; this result is still returned).
+    """
+    from ..models import VideoAnalysisState
+
+    max_ids = getattr(settings, "ANALYSIS_INCREMENTAL_MAX_SEEN_IDS", 20000)
+    old_ids = list(state.seen_comment_ids) if state else []
+    fields = dict(
+        model_name=model_name,
+        prompt_version=PROMPT_VERSION,
+        seen_comment_ids=(new_ids + old_ids)[:max_ids],
+        backlog_cursors=backlog,
+        aggregate=aggregate.to_state(),
+        analyzed_count=sum(aggregate.sentiment.values()),
+        metadata=result["metadata"],
+        analysis=result["analysis"],
+        last_fetched_at=fetched_at,
+        updated_at=datetime.utcnow(),
+    )
+    updates = {f"set__{name}": value for name, value in fields.items()}
+
+    if state is None:
+        # Stale state from another model / prompt version is replaced
+        state = VideoAnalysisState.objects(video_id=video_id).first()
+        if not state:
+            try:
+                VideoAnalysisState(video_id=video_id, **fields).save()
+                return True
+            except Exception as e:
+                # Unique video_id: another run created it first
+                logger.warning(f"Incremental state for {video_id} not saved: {e}")
+                return False
+
+    updated = VideoAnalysisState.objects(id=state.id, version=state.version).update_one(
+        inc__version=1, **updates
+    )
+    return bool(updated)
+
+
+def backlog_cursors(
+    state,
+    raw_comments: List[Dict[str, Any]],
+    pending: Set[str],
+    truncated: bool,
+) -> List[str]:
+    """
+    Cursors to store after a scan: the ones it did not reach, plus the oldest
+    comment analyzed if comment_limit cut it short. A scan that was not cut
+    short either passed every cursor or reached the end of the comments.
+    The first run (no state) only ever covers the newest comments.
+    """
+    if not truncated or state is None:
+        return []
+    ids = [c["cid"] for c in raw_comments if c.get("cid")]
+    return sorted(pending) + ids[-1:]
+
+
+def clear_backlog(state) -> None:
+    from ..models import VideoAnalysisState
+
+    VideoAnalysisState.objects(id=state.id, version=state.version).update_one(
+        set__backlog_cursors=[], inc__version=1
+    )
+
+
+def run_incremental_analysis_pipeline(
+    url: str,
+    comment_limit: int,
+    progress: Optional[Callable[..., None]] = None,
+    fetcher: Optional[YouTubeFetchService] = None,
+    analyzer: Optional[AnalysisService] = None,
+) -> Dict[str, Any]:
+    """
+    Re-analysis that only processes comments posted since the last run.
+
+    Fetches newest-first, stops at the already-analyzed comments, analyzes
+    at most comment_limit new ones, merges them into the stored aggregate and
+    regenerates the summary over everything. When more new comments arrived
+    than comment_limit, the oldest one analyzed is kept as a backlog cursor
+    and the next runs analyze the rest (analysis["incremental"]["truncated"]
+    / ["backlog_pending"]). The first run analyzes the newest comment_limit
+    comments. With no new comments the stored result is returned without any
+    LLM call.
+    Progress stages as run_analysis_pipeline.
+    """
+    from youtube_service.youtube_api_service import get_video_id_from_url
+
+    report = progress or (lambda stage, percent, data=None: None)
+    video_id = get_video_id_from_url(url)
+    if not video_id:
+        raise ValueError("Could not determine the video id of this URL.")
+
+    analyzer = analyzer or AnalysisService()
+    state = load_state(video_id, analyzer.model_name)
+    seen = set(state.seen_comment_ids) if state else set()
+
+    # 1. Fetch the delta
+    report("fetching", 5)
+    fetcher = fetcher or YouTubeFetchService()
+    fetched_at = datetime.utcnow()
+    with timed("fetch"):
+        metadata = fetcher.fetch_metadata(url)
+        stop_after = getattr(settings, "ANALYSIS_INCREMENTAL_STOP_AFTER_KNOWN", 3)
+        cursors = set(state.backlog_cursors or []) if state else set()
+        scan = new_comments(
+            fetcher.iter_comments(url, sort_by=SORT_NEWEST),
+            seen,
+            stop_after,
+            resume_after=cursors,
+        )
+        raw_comments = list(islice(scan, comment_limit))
+        # One more comment tells whether the cap left some behind
+        truncated = len(raw_comments) == comment_limit and next(scan, None) is not None
+    backlog = backlog_cursors(state, raw_comments, cursors, truncated)
+    report(
+        "fetched",
+        25,
+        {"metadata": metadata, "comments_fetched": len(raw_comments)},
+    )
+
+    previous = state.analyzed_count if state else 0
+    since = (
+        state.last_fetched_at.isoformat() if state and state.last_fetched_at else None
+    )
+    if not raw_comments:
+        if not state:
+            raise NoCommentsError("No comments found or comments are disabled.")
+        logger.info(f"No new comments for {video_id} since {since}")
+        if state.backlog_cursors:
+            # The scan ran to the end without finding them (deleted comments)
+            clear_backlog(state)
+        analysis = dict(state.analysis)
+        analysis["incremental"] = {
+            "new_comments": 0,
+            "previous_comments": previous,
+            "since": since,
+            "truncated": False,
+            "backlog_pending": False,
+        }
+        return {"metadata": metadata, "analysis": analysis, "sample_comments": []}
+
+    # 2. Clean
+    report("cleaning", 30)
+    with timed("clean"):
+        cleaned = CommentCleaner().clean_comments(raw_comments)
+    report(
+        "cleaned",
+        35,
+        {"comments_fetched": len(raw_comments), "comments_cleaned": len(cleaned)},
+    )
+    if not cleaned and not state:
+        raise NoCommentsError("No comments left after cleaning.")
+
+    # 3. Analyze only the delta, folded into the stored aggregate
+    if state:
+        aggregate = StreamingAggregate.from_state(state.aggregate)
+    else:
+        aggregate = StreamingAggregate()
+
+    def on_progress(data: Dict[str, Any]):
+        done = min(1.0, data["comments_seen"] / max(1, len(cleaned)))
+        report("analyzing", 35 + int(55 * done), data)
+        if data["map_done"]:
+            report("summarizing", 90)
+
+    if cleaned:
+        analysis = analyzer.analyze_stream(
+            metadata, cleaned, on_progress=on_progress, aggregate=aggregate
+        )
+    else:
+        # Only noise arrived: nothing to summarize again
+        analysis = dict(state.analysis)
+
+    analysis["incremental"] = {
+        "new_comments": len(cleaned),
+        "previous_comments": previous,
+        "since": since,
+        "truncated": truncated,
+        # Older new comments are left for the next run(s)
+        "backlog_pending": bool(backlog),
+    }
+    result = {
+        "metadata": metadata,
+        "analysis": analysis,
+        "sample_comments": raw_comments[:5],
+    }
+
+    # All fetched ids count as seen (cleaner-dropped noise is not re-fetched)
+    new_ids = [c["cid"] for c in raw_comments if c.get("cid")]
+    if not save_state(
+        state,
+        video_id,
+        analyzer.model_name,
+        new_ids,
+        aggregate,
+        result,
+        fetched_at,
+        backlog,
+    ):
+        logger.warning(f"Concurrent incremental run for {video_id}; state not updated")
+    return result
@@ -0,0 +1,641 @@
+import logging
+import math
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from django.conf import settings
+from credits.utils import consume_credits, reserve_credits, refund_credits
+from ..models import AnalysisBatch, AnalysisJob
+from .coalescing import (
+    LeaseHeartbeat,
+    acquire_lease,
+    enabled as coalescing_enabled,
+    lease_held,
+    lease_key,
+    release_lease,
+)
+from .incremental import run_incremental_analysis_pipeline
+from .pipeline import (
+    run_analysis_pipeline,
+    run_sampled_analysis_pipeline,
+    run_streaming_analysis_pipeline,
+)
+from .exports import CommentLabelWriter
+from .history import record_analysis
+from .result_cache import get_cached_result, store_result
+from .scheduler import JobScheduler, claim_job, user_priority
+from .youtube import YouTubeFetchService
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_CREDIT_COST = 1
+
+
+def job_credit_cost(mode: str, comment_limit: int) -> int:
+    """Credits charged per job; streaming jobs pay per 1k comments."""
+    if mode != AnalysisJob.MODE_STREAM:
+        return JOB_CREDIT_COST
+    per_1k = getattr(settings, "ANALYSIS_STREAM_CREDITS_PER_1K", 1)
+    minimum = getattr(settings, "ANALYSIS_STREAM_MIN_CREDITS", 2)
+    return max(minimum, math.ceil(comment_limit / 1000) * per_1k)
+
+
+# 🔒 One executor + scheduler per process, created lazily
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_scheduler: Optional[JobScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, "ANALYSIS_JOB_WORKERS", 2)
+            # One extra thread for short side tasks (batch metadata, rollups),
+            # so they never wait behind the scheduler's job slots
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, workers) + 1, thread_name_prefix="analysis-job"
+            )
+        return _executor
+
+
+def _get_scheduler() -> JobScheduler:
+    """Jobs are queued in Mongo and started by the fair-share scheduler."""
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler(
+                _get_executor(),
+                getattr(settings, "ANALYSIS_JOB_WORKERS", 2),
+                execute_job,
+            )
+            _scheduler.start()
+        return _scheduler
+
+
+def submit_analysis_job(
+    user,
+    url: str,
+    comment_limit: int,
+    force_refresh: bool = False,
+    mode: str = AnalysisJob.MODE_STANDARD,
+    scan_limit: Optional[int] = None,
+    include_labels: bool = False,
+) -> AnalysisJob:
+    """
+    Reserve credits, persist a queued job and hand it to the background worker.
+    A fresh cached result completes the job immediately (still charged).
+    Sampled jobs (comment_limit = sample size), streaming jobs
+    (comment_limit = max comments) and incremental jobs (comment_limit = max
+    new comments) bypass the result cache, as do jobs storing per-comment
+    labels for export (include_labels).
+    Raises InsufficientCreditsError if the user cannot pay for the job.
+    """
+    from youtube_service.youtube_api_service import get_video_id_from_url
+
+    video_id = get_video_id_from_url(url)
+
+    if not force_refresh and not include_labels and mode == AnalysisJob.MODE_STANDARD:
+        cached = get_cached_result(video_id, comment_limit)
+        metrics.CACHE_REQUESTS.labels(
+            cache="result", outcome="hit" if cached else "miss"
+        ).inc()
+        if cached:
+            return _complete_from_cache(user, url, video_id, comment_limit, *cached)
+
+    cost = job_credit_cost(mode, comment_limit)
+    new_balance = reserve_credits(user, amount=cost, reference=video_id or "unknown")
+
+    job = AnalysisJob(
+        user=user,
+        youtube_url=url,
+        video_id=video_id,
+        comment_limit=comment_limit,
+        force_refresh=force_refresh,
+        mode=mode,
+        scan_limit=scan_limit,
+        include_labels=include_labels,
+        priority=user_priority(user),
+        credits_reserved=cost,
+        credits_remaining=new_balance,
+    )
+    try:
+        job.save()
+    except Exception:
+        refund_credits(user, cost, reference=video_id or "unknown")
+        raise
+
+    _get_scheduler().wake()
+    return job
+
+
+def _complete_from_cache(
+    user,
+    url: str,
+    video_id: str,
+    comment_limit: int,
+    result: Dict,
+    age: int,
+    batch_id: Optional[str] = None,
+    credits_remaining: Optional[int] = None,
+) -> AnalysisJob:
+    """
+    Charge the user and record an already-completed job for a cache hit.
+    Batch jobs were paid for when the batch reserved its credits.
+    """
+    if batch_id:
+        new_balance = credits_remaining
+    else:
+        new_balance = consume_credits(
+            user, amount=JOB_CREDIT_COST, transaction_type="CONSUME", reference=video_id
+        )
+
+    now = datetime.utcnow()
+    job = AnalysisJob(
+        user=user,
+        youtube_url=url,
+        video_id=video_id,
+        comment_limit=comment_limit,
+        status=AnalysisJob.STATUS_COMPLETED,
+        stage="done",
+        progress=100,
+        result={**result, "cache": {"status": "hit", "age_seconds": age}},
+        batch_id=batch_id,
+        credits_remaining=new_balance,
+        started_at=now,
+        finished_at=now,
+        updated_at=now,
+    )
+    job.save()
+    record_analysis(job, result)
+    logger.info(
+        f"Served {video_id} (limit {comment_limit}) from result cache ({age}s old)"
+    )
+    return job
+
+
+def submit_batch_analysis(
+    user, urls: List[str], comment_limit: int
+) -> Tuple[AnalysisBatch, List[AnalysisJob]]:
+    """
+    Multi-video analysis. URLs are deduplicated by video id and the credits
+    for every video are reserved in one atomic operation (all or nothing).
+    Cached videos complete right away; the rest start on the shared job pool
+    once their metadata has been fetched (one videos.list call per 50 ids).
+    Raises ValueError if no URL is valid, InsufficientCreditsError if the user
+    cannot pay for the whole set.
+    """
+    from youtube_service.youtube_api_service import get_video_id_from_url
+
+    urls_by_id: Dict[str, str] = {}
+    invalid = []
+    for url in urls:
+        video_id = get_video_id_from_url(str(url or ""))
+        if video_id:
+            urls_by_id.setdefault(video_id, url)
+        else:
+            invalid.append(str(url)[:500])
+    if not urls_by_id:
+        raise ValueError("No valid YouTube URLs in the batch")
+
+    cost = JOB_CREDIT_COST * len(urls_by_id)
+    reference = f"batch:{len(urls_by_id)} videos"
+    new_balance = reserve_credits(user, amount=cost, reference=reference)
+
+    priority = user_priority(user)
+    jobs: List[AnalysisJob] = []
+    try:
+        batch = AnalysisBatch(
+            user=user,
+            video_ids=list(urls_by_id),
+            invalid_urls=invalid,
+            comment_limit=comment_limit,
+            credits_reserved=cost,
+            credits_remaining=new_balance,
+        )
+        batch.save()
+        batch_id = str(batch.id)
+
+        for video_id, url in urls_by_id.items():
+            cached = get_cached_result(video_id, comment_limit)
+            metrics.CACHE_REQUESTS.labels(
+                cache="result", outcome="hit" if cached else "miss"
+            ).inc()
+            if cached:
+                jobs.append(
+                    _complete_from_cache(
+                        user,
+                        url,
+                        video_id,
+                        comment_limit,
+                        *cached,
+                        batch_id=batch_id,
+                        credits_remaining=new_balance,
+                    )
+                )
+                continue
+
+            job = AnalysisJob(
+                user=user,
+                youtube_url=url,
+                video_id=video_id,
+                comment_limit=comment_limit,
+                batch_id=batch_id,
+                priority=priority,
+                credits_reserved=JOB_CREDIT_COST,
+                credits_remaining=new_balance,
+            )
+            job.save()
+            jobs.append(job)
+    except Exception:
+        # Jobs already saved refund through fail_job; refund the rest here
+        for job in jobs:
+            if job.status == AnalysisJob.STATUS_QUEUED:
+                fail_job(str(job.id), "Batch submission failed")
+        unassigned = len(urls_by_id) - len(jobs)
+        if unassigned:
+            refund_credits(user, JOB_CREDIT_COST * unassigned, reference=reference)
+        raise
+
+    queued = [
+        (str(job.id), job.video_id)
+        for job in jobs
+        if job.status == AnalysisJob.STATUS_QUEUED
+    ]
+    if queued:
+        _get_executor().submit(_prefetch_batch_metadata, queued)
+        _get_scheduler().wake()
+    return batch, jobs
+
+
+def _prefetch_batch_metadata(jobs: List[Tuple[str, str]]) -> None:
+    """
+    Fetch metadata for a batch (50 ids per videos.list call) and store it on
+    the jobs still queued; a job started before this finishes fetches its own.
+    """
+    try:
+        metadata = YouTubeFetchService().fetch_metadata_many(
+            [video_id for _, video_id in jobs]
+        )
+    except Exception as e:
+        logger.warning(f"Batch metadata prefetch failed: {e}")
+        return
+
+    for job_id, video_id in jobs:
+        if video_id in metadata:
+            AnalysisJob.objects(id=job_id, status=AnalysisJob.STATUS_QUEUED).update_one(
+                set__prefetched_metadata=metadata[video_id]
+            )
+
+
+def run_analysis_job(job_id: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+    """Claim a queued job and run it now, bypassing the scheduler."""
+    job = claim_job(job_id)
+    if not job:
+        # Already picked up (or cancelled) elsewhere
+        return
+    execute_job(job, metadata)
+
+
+def execute_job(job: AnalysisJob, metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Worker entry point for a claimed (running) job: run the pipeline and
+    store the outcome on the job.
+    metadata: prefetched video metadata (batch jobs), skips its fetch.
+    """
+    job_id = str(job.id)
+    metadata = metadata or job.prefetched_metadata or None
+
+    def progress(stage: str, percent: int, data: Optional[Dict[str, Any]] = None):
+        update = {"stage": stage, "progress": percent, "updated_at": datetime.utcnow()}
+        if data is not None:
+            # Partial results per stage, streamed to clients by the events endpoint
+            update[f"live.{stage}"] = data
+        AnalysisJob.objects(id=job_id).update_one(__raw__={"$set": update})
+
+    key = lease_key(job) if coalescing_enabled() else None
+    if key:
+        holder = acquire_lease(key, job_id)
+        if holder != job_id:
+            metrics.CACHE_REQUESTS.labels(cache="inflight", outcome="hit").inc()
+            logger.info(f"Job {job_id} waits for in-flight job {holder}")
+            _park_follower(job, holder)
+            return
+        metrics.CACHE_REQUESTS.labels(cache="inflight", outcome="miss").inc()
+
+    try:
+        with metrics.timed("pipeline"), LeaseHeartbeat(key, job_id):
+            result = _run_pipeline(job, progress, metadata)
+    except Exception as e:
+        logger.error(f"Analysis job {job_id} failed: {e}")
+        logger.error(traceback.format_exc())
+        metrics.ANALYSIS_JOBS.labels(status="failed").inc()
+        # Also fails the jobs waiting on this one
+        fail_job(job_id, str(e))
+        release_lease(key, job_id)
+        _batch_job_finished(job.batch_id)
+        return
+
+    video_id = job.video_id or result["metadata"].get("video_id")
+    if job.mode == AnalysisJob.MODE_STANDARD:
+        # The labels are stored for this job only
+        store_result(
+            video_id,
+            job.comment_limit,
+            {key: value for key, value in result.items() if key != "labels"},
+        )
+        result["cache"] = {
+            "status": "bypass" if job.force_refresh else "miss",
+            "age_seconds": 0,
+        }
+
+    # Only a job still running is completed: a job already failed (and
+    # refunded) by a timeout or cancellation keeps its status
+    completed = _complete_job(job, result, video_id, AnalysisJob.STATUS_RUNNING)
+    release_lease(key, job_id)
+    if completed:
+        _finish_followers(job_id)
+    else:
+        logger.warning(f"Job {job_id} finished after leaving running; result dropped")
+    _batch_job_finished(job.batch_id)
+
+
+def _complete_job(
+    job: AnalysisJob, result: Dict[str, Any], video_id: Optional[str], status: str
+) -> bool:
+    """Store the result if the job is still in `status`; False otherwise."""
+    now = datetime.utcnow()
+    completed = AnalysisJob.objects(id=job.id, status=status).update_one(
+        set__status=AnalysisJob.STATUS_COMPLETED,
+        set__stage="done",
+        set__progress=100,
+        set__result=result,
+        set__video_id=video_id,
+        set__finished_at=now,
+        set__updated_at=now,
+    )
+    if not completed:
+        return False
+    metrics.ANALYSIS_JOBS.labels(status="completed").inc()
+    job.video_id = video_id
+    record_analysis(job, result)
+    return True
+
+
+def _park_follower(job: AnalysisJob, leader_id: str) -> None:
+    """
+    Coalesced job: wait for the leader without holding a worker thread (nor
+    a per-user scheduler slot). The leader finishes it when done; polling
+    clients settle it otherwise (settle_follower).
+    """
+    parked = AnalysisJob.objects(
+        id=job.id, status=AnalysisJob.STATUS_RUNNING
+    ).update_one(
+        set__status=AnalysisJob.STATUS_WAITING,
+        set__leader_job_id=leader_id,
+        set__stage="waiting",
+        set__updated_at=datetime.utcnow(),
+    )
+    if parked:
+        # The leader may have finished before this job was parked
+        job.status = AnalysisJob.STATUS_WAITING
+        job.leader_job_id = leader_id
+        settle_follower(job)
+
+
+def _finish_followers(leader_id: str) -> None:
+    for follower in AnalysisJob.objects(
+        leader_job_id=leader_id, status=AnalysisJob.STATUS_WAITING
+    ):
+        try:
+            settle_follower(follower)
+        except Exception as e:
+            logger.error(f"Follower job {follower.id} not settled: {e}")
+
+
+def settle_follower(job: AnalysisJob) -> AnalysisJob:
+    """
+    Move a waiting job on from its leader's state: completed -> reuse the
+    result, failed -> fail (refunded), lease lost without finishing (its
+    worker died) -> queued again, to compute it itself. While the leader
+    runs, its progress is mirrored. Returns the fresh job document.
+    """
+    job_id = str(job.id)
+    leader = (
+        AnalysisJob.objects(id=job.leader_job_id)
+        .only("status", "error", "stage", "progress")
+        .first()
+    )
+    if leader is None or leader.status == AnalysisJob.STATUS_FAILED:
+        error = (leader.error if leader else None) or "Analysis failed"
+        if fail_job(job_id, error):
+            metrics.ANALYSIS_JOBS.labels(status="failed").inc()
+            _batch_job_finished(job.batch_id)
+    elif leader.status == AnalysisJob.STATUS_COMPLETED:
+        result = dict(
+            AnalysisJob.objects(id=job.leader_job_id).only("result").first().result
+        )
+        result["cache"] = {"status": "coalesced", "leader_job_id": job.leader_job_id}
+        video_id = job.video_id or result["metadata"].get("video_id")
+        if _complete_job(job, result, video_id, AnalysisJob.STATUS_WAITING):
+            _batch_job_finished(job.batch_id)
+    elif not lease_held(lease_key(job), job.leader_job_id):
+        logger.warning(f"Leader job {job.leader_job_id} lost its lease")
+        requeued = AnalysisJob.objects(
+            id=job_id, status=AnalysisJob.STATUS_WAITING
+        ).update_one(
+            set__status=AnalysisJob.STATUS_QUEUED,
+            set__stage="queued",
+            unset__leader_job_id=True,
+            set__updated_at=datetime.utcnow(),
+        )
+        if requeued:
+            _get_scheduler().wake()
+    else:
+        AnalysisJob.objects(id=job_id, status=AnalysisJob.STATUS_WAITING).update_one(
+            set__stage=leader.stage,
+            set__progress=leader.progress,
+            set__updated_at=datetime.utcnow(),
+        )
+    return AnalysisJob.objects(id=job_id).first()
+
+
+def _run_pipeline(
+    job: AnalysisJob, progress, metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Run the job's pipeline. With include_labels the per-comment labels are
+    written to CommentLabelChunk as they come in; result["labels"] then says
+    where to export them from (followers of a coalesced job share its labels).
+    """
+    if job.mode == AnalysisJob.MODE_INCREMENTAL:
+        return run_incremental_analysis_pipeline(
+            job.youtube_url, job.comment_limit, progress
+        )
+
+    writer = CommentLabelWriter(str(job.id)) if job.include_labels else None
+    on_labels = writer.add if writer else None
+    try:
+        if job.mode == AnalysisJob.MODE_SAMPLED:
+            scan_limit = job.scan_limit or getattr(
+                settings, "ANALYSIS_SAMPLING_MAX_SCAN", 20000
+            )
+            result = run_sampled_analysis_pipeline(
+                job.youtube_url,
+                job.comment_limit,
+                scan_limit,
+                progress,
+                on_labels=on_labels,
+            )
+        elif job.mode == AnalysisJob.MODE_STREAM:
+            result = run_streaming_analysis_pipeline(
+                job.youtube_url, job.comment_limit, progress, on_labels=on_labels
+            )
+        else:
+            result = run_analysis_pipeline(
+                job.youtube_url,
+                job.comment_limit,
+                progress,
+                metadata=metadata,
+                on_labels=on_labels,
+            )
+        if writer:
+            writer.close()
+    except Exception:
+        if writer:
+            writer.discard()
+        raise
+
+    if writer:
+        result["labels"] = {"job_id": writer.job_id, "count": writer.count}
+    return result
+
+
+def _batch_job_finished(batch_id: Optional[str]) -> None:
+    """Start channel rollups that were waiting for this batch to finish."""
+    if not batch_id:
+        return
+    from .channel import resume_channel_analyses
+
+    try:
+        resume_channel_analyses(batch_id)
+    except Exception as e:
+        logger.warning(f"Could not resume rollups of batch {batch_id}: {e}")
+
+
+def fail_job(job_id: str, error: str) -> bool:
+    """
+    Mark an active job as failed and refund its reserved credits.
+    The status transition is atomic, so credits are refunded at most once.
+    """
+    now = datetime.utcnow()
+    job = AnalysisJob.objects(id=job_id, status__in=AnalysisJob.ACTIVE_STATUSES).modify(
+        set__status=AnalysisJob.STATUS_FAILED,
+        set__stage="failed",
+        set__error=error[:1000],
+        set__finished_at=now,
+        set__updated_at=now,
+        new=True,
+    )
+    if not job:
+        return False
+
+    if job.credits_reserved:
+        try:
+            refund_credits(
+                job.user, job.credits_reserved, reference=job.video_id or "unknown"
+            )
+        except Exception as e:
+            logger.error(f"Refund for job {job_id} failed: {e}")
+    _finish_followers(job_id)
+    return True
+
+
+def expire_stale_job(job: AnalysisJob) -> AnalysisJob:
+    """
+    Fail a job whose worker stopped reporting (e.g. the process was recycled).
+    Returns the fresh job document.
+    """
+    now = datetime.utcnow()
+    if job.status == AnalysisJob.STATUS_QUEUED:
+        # Waiting is normal under load; a polled queued job also makes sure
+        # this process is dispatching
+        _get_scheduler().wake()
+        max_wait = getattr(settings, "ANALYSIS_JOB_MAX_QUEUE_SECONDS", 3600)
+        if job.created_at and job.created_at > now - timedelta(seconds=max_wait):
+            return job
+    elif job.status == AnalysisJob.STATUS_WAITING:
+        return settle_follower(job)
+    elif job.status == AnalysisJob.STATUS_RUNNING:
+        stale_after = getattr(settings, "ANALYSIS_JOB_STALE_SECONDS", 900)
+        if job.updated_at and job.updated_at > now - timedelta(seconds=stale_after):
+            return job
+    else:
+        return job
+
+    fail_job(str(job.id), "Analysis timed out. Your credits have been refunded.")
+    return AnalysisJob.objects(id=job.id).first()
+
+
+def serialize_job(job: AnalysisJob) -> Dict[str, Any]:
+    data = {
+        "job_id": str(job.id),
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "video_id": job.video_id,
+        "mode": job.mode,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == AnalysisJob.STATUS_COMPLETED:
+        data["result"] = {
+            **(job.result or {}),
+            "credits_remaining": job.credits_remaining,
+        }
+    elif job.status == AnalysisJob.STATUS_FAILED:
+        data["error"] = job.error
+    return data
+
+
+def serialize_batch(
+    batch: AnalysisBatch, finished_after: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Batch progress plus one entry per video. Results are included as each
+    video finishes; with finished_after, only for videos finished since then
+    (clients polling for new results don't re-download old ones).
+    """
+    jobs = list(AnalysisJob.objects(batch_id=str(batch.id)).order_by("created_at"))
+    jobs = [expire_stale_job(job) for job in jobs]
+
+    counts = {status: 0 for status in AnalysisJob.STATUS_CHOICES}
+    videos = []
+    for job in jobs:
+        counts[job.status] += 1
+        data = serialize_job(job)
+        if (
+            finished_after
+            and "result" in data
+            and job.finished_at
+            and job.finished_at <= finished_after
+        ):
+            data.pop("result")
+        videos.append(data)
+
+    return {
+        "batch_id": str(batch.id),
+        "created_at": batch.created_at.isoformat() if batch.created_at else None,
+        "total": len(batch.video_ids),
+        "counts": counts,
+        "done": not any(counts[status] for status in AnalysisJob.ACTIVE_STATUSES),
+        "invalid_urls": batch.invalid_urls,
+        "credits_reserved": batch.credits_reserved,
+        "videos": videos,
+    }
@@ -0,0 +1,312 @@
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .batching import DEFAULT_BYTES_PER_TOKEN
+from .prefilter import SENTIMENT_LEXICON, tokenize
+
+GEMINI_MODEL = "gemini-2.0-flash"
+OFFLINE_MODEL = "offline-v1"
+
+# Pipeline stages that make LLM calls (each can use its own model)
+STAGES = ("map", "summary")
+
+# USD per 1M (input, output) tokens, standard tier
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    OFFLINE_MODEL: (0.0, 0.0),
+}
+
+
+def estimate_cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    """USD for one model's usage (unknown models are priced as GEMINI_MODEL)."""
+    input_price, output_price = MODEL_PRICING.get(
+        model_name, MODEL_PRICING[GEMINI_MODEL]
+    )
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class LLMResponse:
+    """Backend-neutral result of one generate() call."""
+
+    def __init__(self, text: str, input_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMBackend:
+    """
+    Interface used by AnalysisService for every LLM call.
+    Implementations must be thread-safe (the map stage calls them concurrently)
+    and raise on failure; retries/backoff are handled by the caller.
+    system_instruction is the static part of a prompt (same on every call).
+    """
+
+    model_name = ""
+    # Calls count against the provider quota shared by all worker processes
+    # (see rate_limiter.py); False for local / offline backends
+    shared_quota = False
+
+    def generate(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> LLMResponse:
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    shared_quota = True
+
+    def __init__(self, model_name: str = GEMINI_MODEL, api_key: Optional[str] = None):
+        import google.generativeai as genai
+
+        if api_key is None:
+            api_key = getattr(settings, "GOOGLE_API_KEY", None)
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not configured")
+        genai.configure(api_key=api_key)
+
+        self._genai = genai
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        # One model object per system instruction (built once, reused)
+        self._models: Dict[str, object] = {}
+        self._models_lock = threading.Lock()
+
+    def _model_for(self, system_instruction: Optional[str]):
+        if not system_instruction:
+            return self.model
+        with self._models_lock:
+            model = self._models.get(system_instruction)
+            if model is None:
+                model = self._genai.GenerativeModel(
+                    self.model_name, system_instruction=system_instruction
+                )
+                self._models[system_instruction] = model
+            return model
+
+    def generate(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> LLMResponse:
+        response = self._model_for(system_instruction).generate_content(prompt)
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            text=response.text,
+            input_tokens=usage.prompt_token_count if usage else 0,
+            output_tokens=usage.candidates_token_count if usage else 0,
+        )
+
+
+class OfflineBackendError(Exception):
+    """Injected failure; `code` makes it look like a 429/503 to the retry logic."""
+
+    def __init__(self, message: str, code: int = 503):
+        super().__init__(message)
+        self.code = code
+
+
+_COMMENT_LINE_RE = re.compile(r"^\s*\[(\d+)\]\s?(.*)$", re.M)
+_OFFLINE_TOPICS = ("editing", "audio", "content", "music", "thumbnail", "pacing")
+
+
+class OfflineBackend(LLMBackend):
+    """
+    Deterministic local backend for load tests and benchmarks (no network).
+
+    - Labels come from the prefilter lexicon, so the same comment always gets
+      the same label and aggregates look realistic.
+    - Token counts are estimated from UTF-8 bytes, like the batch planner.
+    - latency (+ latency_per_1k_tokens) is slept per call to simulate the API.
+    - error_rate / bad_response_rate inject transient errors and unparseable
+      responses from a seeded RNG, for exercising retries and bisection.
+    """
+
+    model_name = OFFLINE_MODEL
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_per_1k_tokens: float = 0.0,
+        error_rate: float = 0.0,
+        bad_response_rate: float = 0.0,
+        seed: int = 0,
+        bytes_per_token: float = DEFAULT_BYTES_PER_TOKEN,
+    ):
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.error_rate = error_rate
+        self.bad_response_rate = bad_response_rate
+        self.bytes_per_token = bytes_per_token
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def generate(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> LLMResponse:
+        # The system instruction is billed as input on every call
+        input_tokens = self._count_tokens((system_instruction or "") + prompt)
+        time.sleep(self.latency + self.latency_per_1k_tokens * input_tokens / 1000)
+
+        with self._rng_lock:
+            roll_error = self._rng.random()
+            roll_bad = self._rng.random()
+        if roll_error < self.error_rate:
+            raise OfflineBackendError("503 injected offline backend error")
+
+        if not system_instruction and "executive summary" in prompt:
+            text = json.dumps(self._summary_payload())
+        else:
+            text = json.dumps(self._batch_payload(prompt))
+        if roll_bad < self.bad_response_rate:
+            text = text[: len(text) // 2]
+
+        return LLMResponse(text, input_tokens, self._count_tokens(text))
+
+    def _count_tokens(self, text: str) -> int:
+        return max(1, int(len(text.encode("utf-8")) / self.bytes_per_token))
+
+    @staticmethod
+    def _label(index: int, text: str) -> Dict:
+        tokens = tokenize(text)
+        score = sum(SENTIMENT_LEXICON.get(t, 0.0) for t in tokens)
+        if score > 0:
+            sentiment, intent = "positive", "praise"
+        elif score < 0:
+            sentiment, intent = "negative", "complaint"
+        else:
+            sentiment, intent = "neutral", "other"
+        if "?" in tokens:
+            intent = "question"
+
+        topic = _OFFLINE_TOPICS[zlib.crc32(text.encode("utf-8")) % len(_OFFLINE_TOPICS)]
+        return {
+            "i": index,
+            "sentiment": sentiment,
+            "intent": intent,
+            "toxic": score <= -4,
+            "topics": [topic],
+        }
+
+    def _batch_payload(self, prompt: str) -> Dict:
+        labels = [
+            self._label(int(i), text) for i, text in _COMMENT_LINE_RE.findall(prompt)
+        ]
+        sentiment = {"positive": 0, "neutral": 0, "negative": 0}
+        intents = {"praise": 0, "complaint": 0, "question": 0, "suggestion": 0}
+        topics = []
+        for label in labels:
+            sentiment[label["sentiment"]] += 1
+            if label["intent"] in intents:
+                intents[label["intent"]] += 1
+            if label["topics"][0] not in topics:
+                topics.append(label["topics"][0])
+        return {
+            "sentiment": sentiment,
+            "topics": topics,
+            "intents": intents,
+            "notable_points": [f"{t} comes up often" for t in topics[:2]],
+            "toxic_count": sum(1 for label in labels if label["toxic"]),
+            "labels": labels,
+        }
+
+    @staticmethod
+    def _summary_payload() -> Dict:
+        return {
+            "overall_summary": "Offline backend summary.",
+            "what_users_love": ["editing"],
+            "areas_for_improvement": ["audio"],
+            "creator_actions": [
+                {"action": "Improve audio", "impact": "Medium", "effort": "Low"}
+            ],
+            "video_ideas": ["follow-up video"],
+            "sentiment_breakdown": {"positive": 0, "neutral": 0, "negative": 0},
+            "key_topics": ["editing"],
+        }
+
+
+def stage_models(stage: str) -> List[str]:
+    """
+    [primary, *fallbacks] for a stage, from ANALYSIS_<STAGE>_MODEL and
+    ANALYSIS_<STAGE>_FALLBACK_MODELS (comma separated).
+    """
+    prefix = f"ANALYSIS_{stage.upper()}"
+    primary = getattr(settings, f"{prefix}_MODEL", "") or GEMINI_MODEL
+    fallbacks = getattr(settings, f"{prefix}_FALLBACK_MODELS", "") or ""
+    models = [primary]
+    for name in fallbacks.split(","):
+        name = name.strip()
+        if name and name not in models:
+            models.append(name)
+    return models
+
+
+def models_signature(map_model: str, summary_model: str) -> str:
+    """One name for a map/summary model pair (cache keys, stored state)."""
+    if map_model == summary_model:
+        return map_model
+    return f"{map_model}+{summary_model}"
+
+
+def configured_model_name() -> str:
+    """Model name(s) of the configured backend (used in cache keys)."""
+    if getattr(settings, "ANALYSIS_LLM_BACKEND", "gemini") == "offline":
+        return OFFLINE_MODEL
+    return models_signature(stage_models("map")[0], stage_models("summary")[0])
+
+
+def get_stage_backends(name: Optional[str] = None) -> Dict[str, List[LLMBackend]]:
+    """
+    {stage: [primary, *fallbacks]} for the configured backend. Gemini stages
+    follow stage_models(); the offline backend serves every stage.
+    """
+    if name is None:
+        name = getattr(settings, "ANALYSIS_LLM_BACKEND", "gemini")
+    if name != "gemini":
+        backend = get_llm_backend(name)
+        return {stage: [backend] for stage in STAGES}
+
+    # Stages sharing a model share its backend
+    built: Dict[str, LLMBackend] = {}
+    stages = {}
+    for stage in STAGES:
+        backends = []
+        for model_name in stage_models(stage):
+            if model_name not in built:
+                built[model_name] = GeminiBackend(model_name)
+            backends.append(built[model_name])
+        stages[stage] = backends
+    return stages
+
+
+def get_llm_backend(
+    name: Optional[str] = None, model_name: Optional[str] = None
+) -> LLMBackend:
+    """Build the backend selected by ANALYSIS_LLM_BACKEND ("gemini" | "offline")."""
+    if name is None:
+        name = getattr(settings, "ANALYSIS_LLM_BACKEND", "gemini")
+
+    if name == "gemini":
+        return GeminiBackend(model_name or GEMINI_MODEL)
+    if name == "offline":
+        return OfflineBackend(
+            latency=getattr(settings, "ANALYSIS_OFFLINE_LATENCY", 0.0),
+            latency_per_1k_tokens=getattr(
+                settings, "ANALYSIS_OFFLINE_LATENCY_PER_1K_TOKENS", 0.0
+            ),
+            error_rate=getattr(settings, "ANALYSIS_OFFLINE_ERROR_RATE", 0.0),
+            bad_response_rate=getattr(
+                settings, "ANALYSIS_OFFLINE_BAD_RESPONSE_RATE", 0.0
+            ),
+            seed=getattr(settings, "ANALYSIS_OFFLINE_SEED", 0),
+        )
+    raise ValueError(f"Unknown ANALYSIS_LLM_BACKEND: {name}")
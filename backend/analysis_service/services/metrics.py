@@ -0,0 +1,111 @@
+"""
+Prometheus metrics for the analysis pipeline.
+
+Under gunicorn every worker is a separate process, so metrics are written in
+prometheus_client multiprocess mode when PROMETHEUS_MULTIPROC_DIR is set
+(see start.sh / gunicorn.conf.py) and merged at scrape time by /api/metrics.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+)
+
+# Pipeline stages: fetch, clean, map_batch, summary, pipeline (end to end)
+STAGE_SECONDS = Histogram(
+    "getsentimate_stage_seconds",
+    "Latency of analysis pipeline stages",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300),
+)
+
+LLM_TOKENS = Counter(
+    "getsentimate_llm_tokens_total",
+    "LLM tokens used",
+    ["stage", "direction"],  # direction: input / output
+)
+LLM_API_CALLS = Counter(
+    "getsentimate_llm_api_calls_total", "LLM API calls (including retries)", ["stage"]
+)
+LLM_COST_USD = Counter(
+    "getsentimate_llm_cost_usd_total", "Estimated LLM spend in USD", ["model"]
+)
+LLM_FAILURES = Counter(
+    "getsentimate_llm_failures_total",
+    "Failed LLM calls",
+    # kind: transient / bad_response / circuit_open / rate_limited / error
+    ["stage", "kind"],
+)
+LLM_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "getsentimate_llm_rate_limit_wait_seconds",
+    "Time LLM calls waited for the shared per-model quota",
+    ["model"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+LLM_RETRIES = Counter("getsentimate_llm_retries_total", "LLM call retries", ["stage"])
+BATCH_BISECTIONS = Counter(
+    "getsentimate_batch_bisections_total", "Batches split in half after a bad response"
+)
+COMMENTS_ROUTED = Counter(
+    "getsentimate_comments_total",
+    "Comments by how they were labelled",
+    ["path"],  # path: llm / cache / local / dropped
+)
+CACHE_REQUESTS = Counter(
+    "getsentimate_cache_requests_total",
+    "Cache lookups",
+    # cache: comment / result / inflight (coalesced jobs), outcome: hit / miss
+    ["cache", "outcome"],
+)
+ANALYSIS_JOBS = Counter(
+    "getsentimate_analysis_jobs_total", "Finished analysis jobs", ["status"]
+)
+
+# Scheduler (jobs waiting in Mongo; every process reports the same depth)
+QUEUE_DEPTH = Gauge(
+    "getsentimate_job_queue_depth",
+    "Queued analysis jobs",
+    ["priority"],  # paid / free
+    multiprocess_mode="livemax",
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "getsentimate_job_queue_wait_seconds",
+    "Time from submission to start of analysis jobs",
+    ["priority"],
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+JOBS_IN_FLIGHT = Gauge(
+    "getsentimate_jobs_in_flight",
+    "Analysis jobs running",
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """with timed("fetch"): ... -> observes getsentimate_stage_seconds{stage}"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def render_metrics():
+    """Returns (body, content_type) for the scrape endpoint."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,327 @@
+import logging
+from itertools import islice
+from django.conf import settings
+from typing import Dict, Any, Iterable, List, Optional, Callable, Tuple
+from .youtube import YouTubeFetchService
+from .cleaner import CommentCleaner
+from .analyzer import AnalysisService
+from .metrics import timed
+from .sampling import StratifiedSampler, scale_up
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMMENT_LIMIT = 150
+MIN_COMMENT_LIMIT = 50
+MAX_COMMENT_LIMIT = 500
+
+# Sampled mode: comments sent to the LLM / comments scanned from the video
+DEFAULT_SAMPLE_SIZE = 500
+MIN_SCAN_LIMIT = 1000
+
+
+class NoCommentsError(ValueError):
+    """Raised when a video has no comments (or comments are disabled)"""
+
+    pass
+
+
+def parse_comment_limit(value) -> int:
+    """Clamp a user supplied comment limit to [50, 500], default 150."""
+    try:
+        return min(max(int(value), MIN_COMMENT_LIMIT), MAX_COMMENT_LIMIT)
+    except (TypeError, ValueError):
+        return DEFAULT_COMMENT_LIMIT
+
+
+def parse_stream_limit(value, max_comments: int) -> int:
+    """Clamp the streaming-mode comment count to [1000, max_comments]."""
+    try:
+        return min(max(int(value), MIN_SCAN_LIMIT), max_comments)
+    except (TypeError, ValueError):
+        return max_comments
+
+
+def parse_scan_limit(value, max_scan: int) -> int:
+    """Clamp the number of comments scanned in sampled mode to [1000, max_scan]."""
+    try:
+        return min(max(int(value), MIN_SCAN_LIMIT), max_scan)
+    except (TypeError, ValueError):
+        return max_scan
+
+
+def run_analysis_pipeline(
+    url: str,
+    comment_limit: int = DEFAULT_COMMENT_LIMIT,
+    progress: Optional[Callable[..., None]] = None,
+    fetcher: Optional[YouTubeFetchService] = None,
+    analyzer: Optional[AnalysisService] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    on_labels: Optional[Callable[[List[Tuple[Dict, Dict]]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch -> Clean -> Analyze -> Summarize for a single video.
+    metadata, if given, was prefetched (batch analyses) and is not refetched.
+    on_labels([(comment, label), ...]) receives the per-comment labels
+    (label None for dropped comments); same in the sampled / streaming modes.
+
+    progress(stage, percent, data=None) is called as the pipeline advances.
+    data carries the partial results of a finished stage:
+      "fetched"   -> { metadata, comments_fetched }
+      "cleaned"   -> { comments_fetched, comments_cleaned }
+      "analyzing" -> { batches_done, batches_total, sentiment, intents, toxic_count }
+    Returns { "metadata": ..., "analysis": ..., "sample_comments": [...] }
+
+    fetcher/analyzer can be injected (benchmarks replay recorded comments).
+    """
+    report = progress or (lambda stage, percent, data=None: None)
+
+    # 1. Fetch
+    report("fetching", 5)
+    fetcher = fetcher or YouTubeFetchService()
+    logger.info(f"Fetching data for: {url} (limit: {comment_limit})")
+    with timed("fetch"):
+        data = fetcher.fetch_video_data(
+            url, max_comments=comment_limit, metadata=metadata
+        )
+
+    raw_comments = data["comments"]
+    metadata = data["metadata"]
+
+    if not raw_comments:
+        raise NoCommentsError("No comments found or comments are disabled.")
+
+    report(
+        "fetched",
+        25,
+        {"metadata": metadata, "comments_fetched": len(raw_comments)},
+    )
+
+    # 2. Clean
+    report("cleaning", 30)
+    cleaner = CommentCleaner()
+    with timed("clean"):
+        cleaned_comments = cleaner.clean_comments(raw_comments)
+    # Ensure we only analyze up to the requested limit
+    cleaned_comments = cleaned_comments[:comment_limit]
+    logger.info(
+        f"Cleaned {len(raw_comments)} -> {len(cleaned_comments)} comments "
+        f"(dropped: {cleaner.drops})"
+    )
+    report(
+        "cleaned",
+        35,
+        {
+            "comments_fetched": len(raw_comments),
+            "comments_cleaned": len(cleaned_comments),
+            "comments_dropped": dict(cleaner.drops),
+        },
+    )
+
+    # 3. Analyze (batches 35% -> 90%, then summary)
+    def on_batch(done: int, total: int, totals: Dict[str, Any]):
+        percent = 35 + int(55 * done / total) if total else 90
+        report(
+            "analyzing",
+            percent,
+            {"batches_done": done, "batches_total": total, **totals},
+        )
+        if done == total:
+            report("summarizing", 90)
+
+    analyzer = analyzer or AnalysisService()
+    logger.info("Starting analysis...")
+    analysis_result = analyzer.analyze(
+        metadata,
+        cleaned_comments,
+        on_progress=on_batch,
+        include_labels=on_labels is not None,
+    )
+    if on_labels:
+        on_labels(list(zip(cleaned_comments, analysis_result.pop("comment_labels"))))
+    analysis_result["debug_info"]["cleaning"] = cleaner.stats()
+
+    return {
+        "metadata": metadata,
+        "analysis": analysis_result,
+        "sample_comments": raw_comments[:5],
+    }
+
+
+def _stream_cleaner() -> CommentCleaner:
+    """Cleaner for long comment streams (duplicate set bounded)."""
+    return CommentCleaner(
+        dedup_window=getattr(settings, "ANALYSIS_CLEAN_DEDUP_WINDOW", 100000)
+    )
+
+
+def run_sampled_analysis_pipeline(
+    url: str,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    scan_limit: int = 20000,
+    progress: Optional[Callable[..., None]] = None,
+    fetcher: Optional[YouTubeFetchService] = None,
+    analyzer: Optional[AnalysisService] = None,
+    on_labels: Optional[Callable[[List[Tuple[Dict, Dict]]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Sampled analysis for very large comment sections.
+
+    Streams up to scan_limit comments (only a bounded reservoir per stratum is
+    kept), analyzes a stratified sample of sample_size comments and scales the
+    sentiment / intent / toxicity counts back up to everything scanned, with
+    95% confidence intervals in analysis["sampling"].
+    Progress stages as run_analysis_pipeline, plus
+      "sampling" -> { scanned }
+    """
+    report = progress or (lambda stage, percent, data=None: None)
+
+    # 1. Fetch metadata, then stream + stratify comments
+    report("fetching", 5)
+    fetcher = fetcher or YouTubeFetchService()
+    with timed("fetch"):
+        metadata = fetcher.fetch_metadata(url)
+    report("fetched", 10, {"metadata": metadata, "comments_fetched": 0})
+
+    sampler = StratifiedSampler(sample_size)
+    cleaner = _stream_cleaner()
+    stream = cleaner.iter_clean(islice(fetcher.iter_comments(url), scan_limit))
+    with timed("sample"):
+        for comment in stream:
+            sampler.add(comment)
+            if sampler.scanned % 1000 == 0:
+                percent = 10 + int(20 * sampler.scanned / scan_limit)
+                report("sampling", percent, {"scanned": sampler.scanned})
+
+    if not sampler.scanned:
+        raise NoCommentsError("No comments found or comments are disabled.")
+
+    allocation = sampler.allocation()
+    picked = sampler.sample(allocation)
+    comments: List[Dict[str, Any]] = [comment for _, comment in picked]
+    logger.info(f"Sampled {len(comments)} of {sampler.scanned} comments")
+    report(
+        "cleaned",
+        35,
+        {
+            "comments_fetched": sampler.scanned,
+            "comments_cleaned": len(comments),
+            "comments_dropped": dict(cleaner.drops),
+        },
+    )
+
+    # 2. Analyze the sample (batches 35% -> 90%, then summary)
+    def on_batch(done: int, total: int, totals: Dict[str, Any]):
+        percent = 35 + int(55 * done / total) if total else 90
+        report(
+            "analyzing",
+            percent,
+            {"batches_done": done, "batches_total": total, **totals},
+        )
+        if done == total:
+            report("summarizing", 90)
+
+    analyzer = analyzer or AnalysisService()
+    analysis = analyzer.analyze(
+        metadata, comments, on_progress=on_batch, include_labels=True
+    )
+
+    # 3. Scale the sample counts up to the scanned population
+    labels = analysis.pop("comment_labels")
+    if on_labels:
+        on_labels(list(zip(comments, labels)))
+    estimates = scale_up(
+        sampler.population,
+        [(stratum, label) for (stratum, _), label in zip(picked, labels)],
+    )
+    analysis["sampling"] = {
+        "scanned": sampler.scanned,
+        "sample_size": len(comments),
+        "strata": {
+            stratum: {"population": size, "sampled": allocation.get(stratum, 0)}
+            for stratum, size in sampler.population.items()
+        },
+        "sample_counts": {
+            "sentiment": analysis["sentiment_breakdown"],
+            "intents": analysis.get("intents"),
+            "toxic_count": analysis.get("toxic_count"),
+        },
+        "estimates": estimates,
+    }
+    # Headline numbers describe everything scanned, not just the sample
+    analysis["sentiment_breakdown"] = {
+        k: v["estimate"] for k, v in estimates["sentiment"].items()
+    }
+    analysis["intents"] = {k: v["estimate"] for k, v in estimates["intents"].items()}
+    analysis["toxic_count"] = estimates["toxic_count"]["estimate"]
+    analysis["total_comments_estimated"] = estimates["population_covered"]
+    analysis["debug_info"]["cleaning"] = cleaner.stats()
+
+    return {
+        "metadata": metadata,
+        "analysis": analysis,
+        "sample_comments": comments[:5],
+    }
+
+
+def run_streaming_analysis_pipeline(
+    url: str,
+    max_comments: int,
+    progress: Optional[Callable[..., None]] = None,
+    fetcher: Optional[YouTubeFetchService] = None,
+    analyzer: Optional[AnalysisService] = None,
+    on_labels: Optional[Callable[[List[Tuple[Dict, Dict]]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Large-analysis mode: fetch -> clean -> batch -> LLM chained as a stream.
+
+    Nothing is materialized: comments flow from the scraper through the
+    cleaner into AnalysisService.analyze_stream, which applies backpressure
+    (the scraper is only pulled as LLM slots free up) and aggregates
+    incrementally. Memory is flat whether the job is 1k or 100k comments.
+    Progress stages: "fetching", "fetched", "analyzing" (with
+    comments_seen / batches_done and running totals), "summarizing".
+    """
+    report = progress or (lambda stage, percent, data=None: None)
+
+    report("fetching", 5)
+    fetcher = fetcher or YouTubeFetchService()
+    with timed("fetch"):
+        metadata = fetcher.fetch_metadata(url)
+    report("fetched", 10, {"metadata": metadata, "comments_fetched": 0})
+
+    sample_comments: List[Dict[str, Any]] = []
+
+    def keep_samples(stream: Iterable[Dict[str, Any]]):
+        for comment in stream:
+            if len(sample_comments) < 5:
+                sample_comments.append(dict(comment))
+            yield comment
+
+    cleaner = _stream_cleaner()
+    stream = cleaner.iter_clean(
+        keep_samples(islice(fetcher.iter_comments(url), max_comments))
+    )
+
+    def on_progress(data: Dict[str, Any]):
+        percent = 10 + int(80 * min(1.0, data["comments_seen"] / max_comments))
+        report("analyzing", percent, data)
+        if data["map_done"]:
+            report("summarizing", 95)
+
+    analyzer = analyzer or AnalysisService()
+    logger.info(f"Starting streaming analysis of up to {max_comments} comments")
+    try:
+        analysis = analyzer.analyze_stream(
+            metadata, stream, on_progress=on_progress, on_labels=on_labels
+        )
+    except ValueError:
+        if not sample_comments:
+            raise NoCommentsError("No comments found or comments are disabled.")
+        raise
+    analysis["debug_info"]["cleaning"] = cleaner.stats()
+
+    return {
+        "metadata": metadata,
+        "analysis": analysis,
+        "sample_comments": sample_comments,
+    }
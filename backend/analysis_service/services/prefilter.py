@@ -0,0 +1,225 @@
+import re
+import string
+from typing import List, Dict, Any, Tuple
+import numpy as np
+
+# Lexicon weights: > 0 positive, < 0 negative
+SENTIMENT_LEXICON = {
+    # positive words
+    "love": 2.0,
+    "loved": 2.0,
+    "loving": 2.0,
+    "amazing": 2.0,
+    "awesome": 2.0,
+    "incredible": 2.0,
+    "fantastic": 2.0,
+    "excellent": 2.0,
+    "brilliant": 2.0,
+    "masterpiece": 2.5,
+    "great": 1.5,
+    "best": 1.5,
+    "beautiful": 1.5,
+    "perfect": 1.5,
+    "legend": 1.5,
+    "legendary": 1.5,
+    "wholesome": 1.5,
+    "goat": 1.5,
+    "good": 1.0,
+    "nice": 1.0,
+    "cool": 1.0,
+    "wow": 1.0,
+    "fire": 1.0,
+    "thanks": 1.0,
+    "thank": 1.0,
+    "underrated": 1.0,
+    "helpful": 1.5,
+    "enjoyed": 1.5,
+    "fun": 1.0,
+    # negative words
+    "hate": -2.0,
+    "worst": -2.0,
+    "terrible": -2.0,
+    "awful": -2.0,
+    "horrible": -2.0,
+    "trash": -2.0,
+    "garbage": -2.0,
+    "sucks": -2.0,
+    "unsubscribed": -2.0,
+    "boring": -1.5,
+    "disappointed": -1.5,
+    "disappointing": -1.5,
+    "clickbait": -1.5,
+    "cringe": -1.5,
+    "waste": -1.5,
+    "annoying": -1.5,
+    "dislike": -1.5,
+    "bad": -1.0,
+    # emoji
+    "❤": 2.0,
+    "😍": 2.0,
+    "🥰": 2.0,
+    "🔥": 1.5,
+    "💯": 1.5,
+    "👏": 1.5,
+    "🙌": 1.5,
+    "👍": 1.0,
+    "😊": 1.0,
+    "😂": 0.5,
+    "👎": -1.5,
+    "😡": -2.0,
+    "🤮": -2.0,
+    "💩": -2.0,
+    "😒": -1.0,
+}
+
+# Anything that flips or muddies polarity, asks something, or may be toxic
+# goes to the LLM regardless of score.
+AMBIGUITY_MARKERS = {
+    "but",
+    "not",
+    "no",
+    "never",
+    "dont",
+    "don't",
+    "isnt",
+    "isn't",
+    "wasnt",
+    "wasn't",
+    "cant",
+    "can't",
+    "although",
+    "though",
+    "however",
+    "except",
+    "why",
+    "how",
+    "what",
+    "should",
+    "could",
+    "would",
+    "wish",
+    "please",
+    "pls",
+    "if",
+    "?",
+    "idiot",
+    "stupid",
+    "stfu",
+    "kill",
+}
+
+# Engagement noise with no opinion ("first", "early squad")
+NOISE_COMMENTS = {
+    "first",
+    "early",
+    "im early",
+    "i'm early",
+    "here before",
+    "who's here",
+    "whos here",
+    "notification squad",
+}
+
+# Comments longer than this are never labelled locally
+MAX_LOCAL_TOKENS = 12
+
+_TOKEN_RE = re.compile(r"[a-z']+|[^\w\s]", re.UNICODE)
+# Plain punctuation is not a token ("?" is kept as an ambiguity marker)
+_SKIP_TOKENS = set(string.punctuation) - {"?"}
+_NOISE_STRIP_RE = re.compile(r"[^\w\s']+")
+
+_VOCAB = {term: i for i, term in enumerate(SENTIMENT_LEXICON)}
+_WEIGHTS = np.array(list(SENTIMENT_LEXICON.values()), dtype=np.float64)
+
+
+def tokenize(text: str) -> List[str]:
+    # "❤️" -> "❤" (drop variation selectors so emoji match the lexicon)
+    return [
+        t
+        for t in _TOKEN_RE.findall(text.lower().replace("\ufe0f", ""))
+        if t not in _SKIP_TOKENS
+    ]
+
+
+class LocalSentimentClassifier:
+    """
+    Lexicon + vectorized scoring pre-classifier.
+
+    Labels only comments it is confident about; everything else is returned
+    for the LLM. Labels use the same shape as the LLM per-comment labels.
+    """
+
+    def __init__(self, threshold: float = 0.85):
+        self.threshold = threshold
+
+    def score(self, comments: List[Dict[str, Any]]):
+        """
+        Returns (scores, confidence) arrays, one entry per comment.
+        All lexicon hits are scored in one pass with np.bincount.
+        """
+        n = len(comments)
+        rows, cols, amb_rows = [], [], []
+        token_counts = np.zeros(n, dtype=np.float64)
+
+        for row, comment in enumerate(comments):
+            tokens = tokenize(comment.get("text", ""))
+            token_counts[row] = len(tokens)
+            for token in tokens:
+                col = _VOCAB.get(token)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+                elif token in AMBIGUITY_MARKERS:
+                    amb_rows.append(row)
+
+        rows_arr = np.array(rows, dtype=np.int64)
+        hit_weights = _WEIGHTS[np.array(cols, dtype=np.int64)]
+
+        scores = np.bincount(rows_arr, weights=hit_weights, minlength=n)
+        hits = np.bincount(rows_arr, minlength=n).astype(np.float64)
+        pos_hits = np.bincount(rows_arr, weights=hit_weights > 0, minlength=n)
+        neg_hits = np.bincount(rows_arr, weights=hit_weights < 0, minlength=n)
+        ambiguous = np.bincount(np.array(amb_rows, dtype=np.int64), minlength=n)
+
+        # Strength grows with |score|; coverage = share of tokens that carry sentiment
+        strength = 1.0 - np.exp(-np.abs(scores))
+        coverage = np.minimum(1.0, 2.0 * hits / np.maximum(token_counts, 1.0))
+        confidence = strength * (0.6 + 0.4 * coverage)
+
+        unsure = (
+            (ambiguous > 0)
+            | ((pos_hits > 0) & (neg_hits > 0))
+            | (token_counts > MAX_LOCAL_TOKENS)
+        )
+        confidence[unsure] = 0.0
+        return scores, confidence
+
+    def classify(
+        self, comments: List[Dict[str, Any]]
+    ) -> Tuple[List[Tuple[Dict[str, Any], Dict[str, Any]]], List[Dict[str, Any]]]:
+        """
+        Split comments into ([(comment, label), ...] handled locally,
+        [comment, ...] that still need the LLM).
+        """
+        if not comments:
+            return [], []
+
+        scores, confidence = self.score(comments)
+
+        local, remaining = [], []
+        for comment, score, conf in zip(comments, scores, confidence):
+            norm = _NOISE_STRIP_RE.sub("", comment.get("text", "").lower()).strip()
+            if norm in NOISE_COMMENTS:
+                local.append((comment, _label("neutral", "other")))
+            elif conf >= self.threshold:
+                if score > 0:
+                    local.append((comment, _label("positive", "praise")))
+                else:
+                    local.append((comment, _label("negative", "complaint")))
+            else:
+                remaining.append(comment)
+        return local, remaining
+
+
+def _label(sentiment: str, intent: str) -> Dict[str, Any]:
+    return {"sentiment": sentiment, "intent": intent, "toxic": False, "topics": []}
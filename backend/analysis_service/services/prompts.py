@@ -0,0 +1,61 @@
+import html
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+# Bump whenever the batch prompt / label schema changes (part of cache keys)
+PROMPT_VERSION = "3"
+
+# Static part of every batch call: sent as the system instruction, so the
+# per-batch prompt is only the comment lines (and the prefix stays identical
+# across calls for provider-side prompt caching).
+BATCH_SYSTEM_INSTRUCTION = (
+    "Label YouTube comments. Input: one comment per line as [index] text.\n"
+    "Return JSON only, no markdown:\n"
+    '{"sentiment":{"positive":int,"neutral":int,"negative":int},'
+    '"topics":[str],'
+    '"intents":{"praise":int,"complaint":int,"question":int,"suggestion":int},'
+    '"notable_points":[str],"toxic_count":int,'
+    '"labels":[{"i":int,"sentiment":"positive|neutral|negative",'
+    '"intent":"praise|complaint|question|suggestion|other",'
+    '"toxic":bool,"topics":[str]}]}\n'
+    "Exactly one labels entry per comment. Topics and notable points are short "
+    "phrases."
+)
+
+# Approx. tokens of the fixed instructions/schema (4 bytes per token)
+BATCH_PROMPT_OVERHEAD_TOKENS = math.ceil(len(BATCH_SYSTEM_INSTRUCTION) / 4) + 4
+
+_HTML_BREAK_RE = re.compile(r"<br\s*/?>", re.I)
+_HTML_TAG_RE = re.compile(r"</?[a-zA-Z][^>]*>")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Same emoji (optionally with a variation selector / skin tone) repeated
+_REPEATED_EMOJI_RE = re.compile(
+    "([\U0001F000-\U0001FAFF\u2600-\u27BF][\uFE0F\U0001F3FB-\U0001F3FF]?)\\1+"
+)
+
+
+def compact_comment(text: str) -> str:
+    """
+    Comment text as sent to the LLM: HTML leftovers of the Data API
+    (textDisplay) removed, whitespace collapsed, runs of the same emoji cut
+    to one. Does not change the comment dict itself.
+    """
+    text = text or ""
+    if "<" in text or "&" in text:
+        text = _HTML_TAG_RE.sub("", _HTML_BREAK_RE.sub(" ", text))
+        text = html.unescape(text)
+    text = _REPEATED_EMOJI_RE.sub(r"\1", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def build_batch_prompt(
+    comments: List[Dict[str, Any]], texts: Optional[List[str]] = None
+) -> str:
+    """
+    Per-batch prompt: the compacted comment lines only.
+    texts: the comments already compacted (by the batch planner).
+    """
+    if texts is None:
+        texts = [compact_comment(c["text"]) for c in comments]
+    return "\n".join(f"[{i}] {text}" for i, text in enumerate(texts))
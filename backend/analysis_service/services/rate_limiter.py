@@ -0,0 +1,264 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from mongoengine.errors import NotUniqueError
+from pymongo.errors import DuplicateKeyError
+
+from ..models import LLMCallSlot, LLMRateBucket
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-set attempts per acquire round before backing off briefly
+_CAS_ATTEMPTS = 5
+_CONTENTION_DELAY = 0.05
+# Pause between scans for a free call slot
+_SLOT_POLL_DELAY = 0.1
+
+
+class RateLimitTimeout(Exception):
+    """The shared quota did not free up within the allowed wait."""
+
+    # Treated like a provider 429 (retried with backoff / falls back)
+    code = 429
+
+
+def refill(available: float, elapsed: float, per_minute: int) -> float:
+    """Bucket level after `elapsed` seconds (capacity: one minute of quota)."""
+    if per_minute <= 0:
+        return available
+    return min(float(per_minute), available + max(0.0, elapsed) * per_minute / 60.0)
+
+
+def take(
+    requests: float, tokens: float, need: int, rpm: int, tpm: int
+) -> Tuple[bool, float]:
+    """
+    (granted, seconds to wait) for one call needing `need` tokens from a
+    refilled bucket. A limit of 0 is unlimited. A call larger than the whole
+    token bucket only waits for a full bucket.
+    """
+    wait = 0.0
+    if rpm > 0 and requests < 1:
+        wait = max(wait, (1 - requests) * 60.0 / rpm)
+    if tpm > 0:
+        need = min(need, tpm)
+        if tokens < need:
+            wait = max(wait, (need - tokens) * 60.0 / tpm)
+    return wait <= 0, wait
+
+
+class SharedRateLimiter:
+    """
+    Requests-per-minute + tokens-per-minute token bucket for one model,
+    stored in Mongo so every gunicorn worker draws from the same quota.
+
+    acquire() reserves one request and the estimated input tokens before a
+    call, sleeping until the bucket refills (up to max_wait, then raises
+    RateLimitTimeout); settle() charges the difference once the actual usage
+    is known (0 for a failed call), release() refunds a call that was never
+    sent. A bucket over capacity after a refund is clamped at the next
+    refill. Updates are compare-and-set on a version field; if Mongo is
+    unavailable calls are let through.
+    """
+
+    def __init__(self, key: str, rpm: int, tpm: int, max_wait: float):
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait = max_wait
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    def acquire(self, tokens: int) -> float:
+        """Reserve one call; returns the seconds spent waiting."""
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        while True:
+            try:
+                wait = self._try_take(tokens)
+            except Exception as e:
+                logger.warning(f"Rate limiter for {self.key} unavailable: {e}")
+                return time.monotonic() - start
+            waited = time.monotonic() - start
+            if wait <= 0:
+                return waited
+            if waited + wait > self.max_wait:
+                raise RateLimitTimeout(
+                    f"{self.key}: quota still exhausted after {waited:.1f}s"
+                )
+            # Jitter so waiting workers don't all retry at the same instant
+            time.sleep(wait * random.uniform(1.0, 1.2))
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Charge (or give back) the difference between estimate and usage."""
+        if self.tpm <= 0 or used == reserved:
+            return
+        try:
+            LLMRateBucket.objects(key=self.key).update_one(
+                inc__tokens=reserved - used, inc__version=1
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter for {self.key} not settled: {e}")
+
+    def release(self, reserved: int) -> None:
+        """Give back the whole reservation of a call that was never sent."""
+        try:
+            LLMRateBucket.objects(key=self.key).update_one(
+                inc__requests=1 if self.rpm > 0 else 0,
+                inc__tokens=min(reserved, self.tpm) if self.tpm > 0 else 0,
+                inc__version=1,
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter for {self.key} not released: {e}")
+
+    def _try_take(self, need: int) -> float:
+        """One acquire round: 0 if reserved, else the seconds to wait."""
+        need = min(need, self.tpm) if self.tpm > 0 else 0
+        for _ in range(_CAS_ATTEMPTS):
+            now = time.time()
+            bucket = LLMRateBucket.objects(key=self.key).as_pymongo().first()
+            if bucket is None:
+                self._create(now)
+                continue
+
+            elapsed = now - bucket.get("refilled_at", 0)
+            requests = refill(bucket.get("requests", 0), elapsed, self.rpm)
+            tokens = refill(bucket.get("tokens", 0), elapsed, self.tpm)
+            granted, wait = take(requests, tokens, need, self.rpm, self.tpm)
+            if not granted:
+                return wait
+
+            updated = LLMRateBucket.objects(
+                key=self.key, version=bucket.get("version", 0)
+            ).update_one(
+                set__requests=requests - 1,
+                set__tokens=tokens - need,
+                set__refilled_at=now,
+                inc__version=1,
+            )
+            if updated:
+                return 0.0
+        # Lost every compare-and-set round to other workers
+        return _CONTENTION_DELAY
+
+    def _create(self, now: float) -> None:
+        """First use of this model: start with a full bucket."""
+        try:
+            LLMRateBucket(
+                key=self.key,
+                requests=float(self.rpm),
+                tokens=float(self.tpm),
+                refilled_at=now,
+            ).save(force_insert=True)
+        except (NotUniqueError, DuplicateKeyError):
+            pass  # created by another worker
+
+
+# One limiter object per model and process (the state itself is in Mongo)
+_limiters: Dict[str, SharedRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str) -> Optional[SharedRateLimiter]:
+    """Shared limiter for a model, or None if no quota is configured."""
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limiter = SharedRateLimiter(
+                model_name,
+                rpm=getattr(settings, "ANALYSIS_LLM_RPM", 0),
+                tpm=getattr(settings, "ANALYSIS_LLM_TPM", 0),
+                max_wait=getattr(settings, "ANALYSIS_LLM_RATE_LIMIT_MAX_WAIT", 30.0),
+            )
+            _limiters[model_name] = limiter
+    return limiter if limiter.enabled else None
+
+
+class SharedCallSlots:
+    """
+    Counting semaphore for in-flight LLM calls across all worker processes:
+    `limit` slot documents in Mongo, each held by at most one call. A slot
+    is taken with an upsert that only matches a free (missing or expired)
+    one, so a worker that dies mid-call frees its slot after lease_seconds.
+
+    acquire() waits up to max_wait (then raises RateLimitTimeout) and
+    returns a handle for release(). If Mongo is unavailable calls are let
+    through (handle None).
+    """
+
+    def __init__(self, limit: int, lease_seconds: float, max_wait: float):
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self.max_wait = max_wait
+
+    def acquire(self) -> Optional[Tuple[str, str]]:
+        """Take a slot; returns (slot, holder), or None if not enforced."""
+        holder = uuid.uuid4().hex
+        start = time.monotonic()
+        while True:
+            try:
+                slot = self._try_take(holder)
+            except Exception as e:
+                logger.warning(f"LLM call slots unavailable: {e}")
+                return None
+            if slot is not None:
+                return slot, holder
+            waited = time.monotonic() - start
+            if waited > self.max_wait:
+                raise RateLimitTimeout(
+                    f"All {self.limit} LLM call slots still busy after {waited:.1f}s"
+                )
+            time.sleep(_SLOT_POLL_DELAY * random.uniform(1.0, 1.5))
+
+    def release(self, handle: Optional[Tuple[str, str]]) -> None:
+        if handle is None:
+            return
+        slot, holder = handle
+        try:
+            # Only if still ours (not expired and taken over meanwhile)
+            LLMCallSlot.objects(key=slot, holder=holder).delete()
+        except Exception as e:
+            logger.warning(f"LLM call slot {slot} not released: {e}")
+
+    def _try_take(self, holder: str) -> Optional[str]:
+        """One scan over the slots (from a random one, to spread contention)."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        offset = random.randrange(self.limit)
+        for index in range(self.limit):
+            slot = str((offset + index) % self.limit)
+            try:
+                # A held slot makes the upsert collide on the primary key
+                LLMCallSlot.objects(key=slot, expires_at__lt=now).modify(
+                    upsert=True, set__holder=holder, set__expires_at=expires_at
+                )
+                return slot
+            except (NotUniqueError, DuplicateKeyError):
+                continue
+        return None
+
+
+_call_slots: Optional[SharedCallSlots] = None
+
+
+def get_call_slots() -> Optional[SharedCallSlots]:
+    """Global LLM concurrency cap, or None if disabled (limit 0)."""
+    global _call_slots
+
+    with _limiters_lock:
+        if _call_slots is None:
+            _call_slots = SharedCallSlots(
+                limit=getattr(settings, "ANALYSIS_LLM_GLOBAL_CONCURRENCY", 8),
+                lease_seconds=getattr(settings, "ANALYSIS_LLM_SLOT_LEASE_SECONDS", 300),
+                max_wait=getattr(settings, "ANALYSIS_LLM_RATE_LIMIT_MAX_WAIT", 30.0),
+            )
+    return _call_slots if _call_slots.limit > 0 else None
@@ -0,0 +1,241 @@
+import heapq
+import random
+import re
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Iterable
+
+_PUNCT_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_LEADING_WORDS = {"the", "a", "an", "about", "of"}
+
+# Words too common to make two notable points "the same"
+_STOPWORDS = set(
+    "the a an and or of to in on for is are was it this that with be by as at video".split()
+)
+
+
+def _singular(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def canonicalize_topic(topic: str) -> str:
+    """'The Editing!' / 'editing' / 'Edits' -> 'editing' / 'edit' style keys."""
+    text = _WHITESPACE_RE.sub(" ", _PUNCT_RE.sub(" ", str(topic).lower())).strip()
+    words = text.split(" ")
+    while len(words) > 1 and words[0] in _LEADING_WORDS:
+        words = words[1:]
+    return " ".join(_singular(w) for w in words if w)
+
+
+def top_topics(topics: Iterable[str], k: int) -> List[Dict[str, Any]]:
+    """
+    Frequency table over canonical topics; the top-k (by count) come back as
+    [{"topic": most common original spelling, "count": n}].
+    """
+    counts: Counter = Counter()
+    spellings: Dict[str, Counter] = defaultdict(Counter)
+    for topic in topics:
+        if not topic:
+            continue
+        key = canonicalize_topic(topic)
+        if not key:
+            continue
+        counts[key] += 1
+        spellings[key][str(topic).strip()] += 1
+
+    best = heapq.nlargest(k, counts.items(), key=lambda item: (item[1], item[0]))
+    return [
+        {"topic": spellings[key].most_common(1)[0][0], "count": count}
+        for key, count in best
+    ]
+
+
+def _point_tokens(point: str) -> frozenset:
+    words = _PUNCT_RE.sub(" ", str(point).lower()).split()
+    return frozenset(_singular(w) for w in words if w not in _STOPWORDS)
+
+
+def cluster_points(
+    points: Iterable[str], k: int, similarity: float = 0.5
+) -> List[Dict[str, Any]]:
+    """
+    Greedy leader clustering of notable points by token Jaccard similarity.
+    Returns the k largest clusters as [{"point": representative, "count": n}].
+    """
+    leaders: List[frozenset] = []
+    clusters: List[Dict[str, Any]] = []
+    # token -> indexes of clusters whose leader contains it (limits comparisons)
+    index: Dict[str, List[int]] = defaultdict(list)
+
+    for point in points:
+        if not point:
+            continue
+        tokens = _point_tokens(point)
+        if not tokens:
+            continue
+
+        candidates = {i for t in tokens for i in index.get(t, ())}
+        match = None
+        for i in candidates:
+            leader = leaders[i]
+            if len(tokens & leader) / len(tokens | leader) >= similarity:
+                match = i
+                break
+
+        if match is None:
+            match = len(clusters)
+            leaders.append(tokens)
+            clusters.append({"point": str(point).strip(), "count": 0})
+            for t in tokens:
+                index[t].append(match)
+        clusters[match]["count"] += 1
+
+    return heapq.nlargest(k, clusters, key=lambda c: c["count"])
+
+
+def build_summary_digest(
+    agg: Dict[str, Any], top_k_topics: int = 15, top_k_points: int = 10
+) -> Dict[str, Any]:
+    """
+    Fixed-size, frequency-annotated view of the aggregate for the summary
+    prompt: counts plus the top topics / notable point clusters.
+    """
+    return {
+        "total_comments": sum(agg["sentiment"].values()),
+        "sentiment": agg["sentiment"],
+        "intents": agg["intents"],
+        "toxic_count": agg["toxic_count"],
+        "top_topics": top_topics(agg["topics"], top_k_topics),
+        "notable_points": cluster_points(agg["notable_points"], top_k_points),
+    }
+
+
+class StreamingAggregate:
+    """
+    Incremental, bounded-memory aggregate of batch results (streaming mode).
+
+    Counts are exact. Topic counts are pruned to the most frequent
+    `max_topics` canonical topics whenever the table doubles, and notable
+    points are kept as a uniform reservoir of `max_points`, so memory does not
+    grow with the number of comments. digest() has the build_summary_digest
+    shape.
+    """
+
+    def __init__(self, max_topics: int = 2000, max_points: int = 1000, seed=None):
+        self.sentiment = {"positive": 0, "neutral": 0, "negative": 0}
+        self.intents = {"praise": 0, "complaint": 0, "question": 0, "suggestion": 0}
+        self.toxic_count = 0
+        self.max_topics = max_topics
+        self.max_points = max_points
+        self._topic_counts: Counter = Counter()
+        self._spellings: Dict[str, Counter] = defaultdict(Counter)
+        self._points: List[str] = []
+        self._points_seen = 0
+        self._rng = random.Random(seed)
+
+    def add(self, result: Dict[str, Any]) -> None:
+        if not result:
+            return
+        for key in self.sentiment:
+            self.sentiment[key] += result.get("sentiment", {}).get(key, 0)
+        for key in self.intents:
+            self.intents[key] += result.get("intents", {}).get(key, 0)
+        self.toxic_count += result.get("toxic_count", 0)
+
+        for topic in result.get("topics", []):
+            self._add_topic(topic)
+        for point in result.get("notable_points", []):
+            self._add_point(point)
+
+    def add_topic_counts(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Merge a precomputed [{"topic", "count"}] table (topic_frequencies)."""
+        for row in rows:
+            self._add_topic(row.get("topic"), int(row.get("count") or 0))
+
+    def _add_topic(self, topic: str, count: int = 1) -> None:
+        key = canonicalize_topic(topic) if topic else ""
+        if not key or count <= 0:
+            return
+        self._topic_counts[key] += count
+        self._spellings[key][str(topic).strip()] += count
+
+        if len(self._topic_counts) > 2 * self.max_topics:
+            keep = dict(self._topic_counts.most_common(self.max_topics))
+            self._topic_counts = Counter(keep)
+            self._spellings = defaultdict(
+                Counter, {k: v for k, v in self._spellings.items() if k in keep}
+            )
+
+    def _add_point(self, point: str) -> None:
+        if not point:
+            return
+        self._points_seen += 1
+        if len(self._points) < self.max_points:
+            self._points.append(point)
+        else:
+            slot = self._rng.randrange(self._points_seen)
+            if slot < self.max_points:
+                self._points[slot] = point
+
+    def to_state(self) -> Dict[str, Any]:
+        """JSON/Mongo-safe snapshot (topics as [key, count, spelling] rows)."""
+        return {
+            **self.counts(),
+            "topics": [
+                [key, count, self._spellings[key].most_common(1)[0][0]]
+                for key, count in self._topic_counts.most_common(self.max_topics)
+            ],
+            "points": list(self._points),
+            "points_seen": self._points_seen,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], **kwargs) -> "StreamingAggregate":
+        agg = cls(**kwargs)
+        agg.add(
+            {
+                "sentiment": state.get("sentiment", {}),
+                "intents": state.get("intents", {}),
+                "toxic_count": state.get("toxic_count", 0),
+            }
+        )
+        for key, count, spelling in state.get("topics", []):
+            agg._topic_counts[key] = count
+            agg._spellings[key][spelling] = count
+        agg._points = list(state.get("points", []))[: agg.max_points]
+        agg._points_seen = max(state.get("points_seen", 0), len(agg._points))
+        return agg
+
+    def counts(self) -> Dict[str, Any]:
+        return {
+            "sentiment": dict(self.sentiment),
+            "intents": dict(self.intents),
+            "toxic_count": self.toxic_count,
+        }
+
+    def digest(self, top_k_topics: int = 15, top_k_points: int = 10) -> Dict[str, Any]:
+        best = heapq.nlargest(
+            top_k_topics,
+            self._topic_counts.items(),
+            key=lambda item: (item[1], item[0]),
+        )
+        # Reservoir cluster sizes are scaled back to all points seen
+        scale = self._points_seen / len(self._points) if self._points else 1.0
+        points = [
+            {"point": c["point"], "count": round(c["count"] * scale)}
+            for c in cluster_points(self._points, top_k_points)
+        ]
+        return {
+            "total_comments": sum(self.sentiment.values()),
+            "sentiment": dict(self.sentiment),
+            "intents": dict(self.intents),
+            "toxic_count": self.toxic_count,
+            "top_topics": [
+                {"topic": self._spellings[key].most_common(1)[0][0], "count": count}
+                for key, count in best
+            ],
+            "notable_points": points,
+        }
@@ -0,0 +1,198 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP-ish status codes worth retrying (rate limit / server side)
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and calls are short-circuited"""
+
+    pass
+
+
+class BatchResponseError(ValueError):
+    """Raised when the LLM response for a batch cannot be used (bad JSON etc.)"""
+
+    pass
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """429 / 5xx / timeouts from the Gemini client (google.api_core exceptions)."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+        return True
+
+    try:
+        from google.api_core import exceptions as gexc
+
+        return isinstance(
+            exc,
+            (
+                gexc.TooManyRequests,
+                gexc.ResourceExhausted,
+                gexc.ServerError,
+                gexc.DeadlineExceeded,
+            ),
+        )
+    except ImportError:
+        return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def is_overload_error(exc: Exception) -> bool:
+    """Quota exhausted (429) or model overloaded (503): worth another model."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in (429, 503):
+        return True
+
+    try:
+        from google.api_core import exceptions as gexc
+
+        return isinstance(
+            exc,
+            (
+                gexc.TooManyRequests,
+                gexc.ResourceExhausted,
+                gexc.ServiceUnavailable,
+            ),
+        )
+    except ImportError:
+        return False
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+def call_with_retry(
+    fn: Callable[[], T],
+    max_retries: int,
+    base_delay: float = 1.0,
+    max_delay: float = 20.0,
+    on_retry: Optional[Callable[[int, Exception], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> T:
+    """
+    Call fn, retrying transient errors up to max_retries times.
+    Non-transient errors (and the last transient one) are re-raised.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_transient_error(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.warning(
+                f"Transient LLM error (attempt {attempt + 1}/{max_retries}), "
+                f"retrying in {delay:.2f}s: {e}"
+            )
+            if on_retry:
+                on_retry(attempt, e)
+            sleep(delay)
+            attempt += 1
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker.
+
+    closed    -> calls pass; `failure_threshold` consecutive failures open it
+    open      -> calls fail fast with CircuitOpenError for `reset_timeout` s
+    half_open -> one trial call; success closes, failure re-opens, any
+                 other outcome must release_trial() to let the next one in
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+    def before_call(self) -> None:
+        with self._lock:
+            self._refresh()
+            if self._state == self.OPEN:
+                raise CircuitOpenError("LLM circuit breaker is open")
+            if self._state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError("LLM circuit breaker is half-open")
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """End a half-open trial that neither closed nor re-opened the breaker."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state == self.HALF_OPEN
+                or self._failures >= self.failure_threshold
+            ):
+                if self._state != self.OPEN:
+                    logger.error(
+                        f"LLM circuit breaker opened after {self._failures} failures"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker per model name."""
+    from django.conf import settings
+
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                failure_threshold=getattr(
+                    settings, "ANALYSIS_CIRCUIT_FAILURE_THRESHOLD", 5
+                ),
+                reset_timeout=getattr(settings, "ANALYSIS_CIRCUIT_RESET_SECONDS", 30),
+            )
+        return _breakers[name]
@@ -0,0 +1,84 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+from django.conf import settings
+from .analyzer import PROMPT_VERSION
+from .llm_backends import configured_model_name
+
+logger = logging.getLogger(__name__)
+
+
+def result_cache_key(
+    video_id: str,
+    comment_limit: int,
+    model_name: Optional[str] = None,
+    prompt_version: str = PROMPT_VERSION,
+) -> str:
+    model_name = model_name or configured_model_name()
+    raw = f"{video_id}|{comment_limit}|{model_name}|{prompt_version}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _enabled() -> bool:
+    return getattr(settings, "ANALYSIS_RESULT_CACHE_ENABLED", True)
+
+
+def get_cached_result(
+    video_id: str, comment_limit: int
+) -> Optional[Tuple[Dict[str, Any], int]]:
+    """
+    Return (result, age_seconds) for a fresh cached analysis, or None.
+    result has the pipeline shape: { metadata, analysis, sample_comments }
+    """
+    if not video_id or not _enabled():
+        return None
+
+    from ..models import CachedAnalysisResult
+
+    ttl = getattr(settings, "ANALYSIS_RESULT_CACHE_TTL", 6 * 3600)
+    try:
+        # TTL index cleanup is lazy, so freshness is also checked here
+        entry = CachedAnalysisResult.objects(
+            key=result_cache_key(video_id, comment_limit),
+            created_at__gte=datetime.utcnow() - timedelta(seconds=ttl),
+        ).first()
+    except Exception as e:
+        logger.warning(f"Result cache lookup failed: {e}")
+        return None
+
+    if not entry:
+        return None
+
+    age = int((datetime.utcnow() - entry.created_at).total_seconds())
+    return (
+        {
+            "metadata": entry.metadata,
+            "analysis": entry.analysis,
+            "sample_comments": entry.sample_comments,
+        },
+        age,
+    )
+
+
+def store_result(video_id: str, comment_limit: int, result: Dict[str, Any]) -> None:
+    """Save a freshly computed pipeline result (overwrites older entries)."""
+    if not video_id or not _enabled():
+        return
+
+    from ..models import CachedAnalysisResult
+
+    try:
+        CachedAnalysisResult(
+            key=result_cache_key(video_id, comment_limit),
+            video_id=video_id,
+            comment_limit=comment_limit,
+            model_name=configured_model_name(),
+            prompt_version=PROMPT_VERSION,
+            metadata=result["metadata"],
+            analysis=result["analysis"],
+            sample_comments=result.get("sample_comments", []),
+            created_at=datetime.utcnow(),
+        ).save()
+    except Exception as e:
+        logger.warning(f"Result cache write failed: {e}")
@@ -0,0 +1,216 @@
+import math
+import random
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .analyzer import INTENTS, SENTIMENTS
+
+# Stratum boundaries (lower bounds): likes 0 | 1-9 | 10-99 | 100+,
+# age < 1 day | < 1 week | < 30 days | older (unknown ages count as older)
+LIKE_EDGES = (1, 10, 100)
+AGE_EDGES_DAYS = (1, 7, 30)
+
+# z for a two-sided 95% interval
+Z_95 = 1.96
+
+_UNIT_DAYS = {
+    "second": 1 / 86400,
+    "minute": 1 / 1440,
+    "hour": 1 / 24,
+    "day": 1,
+    "week": 7,
+    "month": 30,
+    "year": 365,
+}
+_RELATIVE_AGE_RE = re.compile(
+    r"(\d+)\s+(second|minute|hour|day|week|month|year)s?\s+ago"
+)
+_LIKES_RE = re.compile(r"([\d.,]+)\s*([kKmM]?)")
+
+
+def parse_like_count(value) -> int:
+    """Scraper votes come as "0", "12", "1.2K", "3M"; the API gives ints."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _LIKES_RE.search(str(value or ""))
+    if not match:
+        return 0
+    number = float(match.group(1).replace(",", "") or 0)
+    scale = {"k": 1_000, "m": 1_000_000}.get(match.group(2).lower(), 1)
+    return int(number * scale)
+
+
+def comment_age_days(value, now: Optional[datetime] = None) -> Optional[float]:
+    """Age from "3 weeks ago (edited)" (scraper) or an ISO timestamp (API)."""
+    if not value:
+        return None
+    text = str(value)
+    match = _RELATIVE_AGE_RE.search(text)
+    if match:
+        return int(match.group(1)) * _UNIT_DAYS[match.group(2)]
+    try:
+        published = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if published.tzinfo is None:
+        published = published.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (now - published).total_seconds() / 86400)
+
+
+def _bucket(value: float, edges: Tuple) -> int:
+    return sum(1 for edge in edges if value >= edge)
+
+
+def stratum_of(comment: Dict[str, Any], now: Optional[datetime] = None) -> str:
+    likes = _bucket(parse_like_count(comment.get("likes")), LIKE_EDGES)
+    age = comment_age_days(comment.get("time"), now)
+    age_bucket = len(AGE_EDGES_DAYS) if age is None else _bucket(age, AGE_EDGES_DAYS)
+    return f"l{likes}a{age_bucket}"
+
+
+class StratifiedSampler:
+    """
+    One-pass stratified sample of a comment stream.
+
+    Keeps a uniform reservoir (Algorithm R) of at most `budget` comments per
+    stratum (like count x age), so memory is bounded by the number of strata,
+    not the length of the stream. sample() then allocates the budget across
+    strata proportionally to their size (at least 2 per stratum, so variances
+    can be estimated).
+    """
+
+    def __init__(self, budget: int, seed: Optional[int] = None):
+        self.budget = max(1, budget)
+        self.population: Dict[str, int] = {}
+        self._reservoirs: Dict[str, List[Dict[str, Any]]] = {}
+        self._rng = random.Random(seed)
+        self._now = datetime.now(timezone.utc)
+
+    @property
+    def scanned(self) -> int:
+        return sum(self.population.values())
+
+    def add(self, comment: Dict[str, Any]) -> None:
+        stratum = stratum_of(comment, self._now)
+        seen = self.population.get(stratum, 0) + 1
+        self.population[stratum] = seen
+
+        reservoir = self._reservoirs.setdefault(stratum, [])
+        if len(reservoir) < self.budget:
+            reservoir.append(comment)
+        else:
+            slot = self._rng.randrange(seen)
+            if slot < self.budget:
+                reservoir[slot] = comment
+
+    def consume(self, comments: Iterable[Dict[str, Any]]) -> "StratifiedSampler":
+        for comment in comments:
+            self.add(comment)
+        return self
+
+    def allocation(self) -> Dict[str, int]:
+        """
+        Sample size per stratum: proportional, rounded by largest remainder,
+        at least 2 per non-empty stratum (can exceed the budget by a few).
+        """
+        total = self.scanned
+        if total <= self.budget:
+            return dict(self.population)
+
+        shares = {h: self.budget * n / total for h, n in self.population.items()}
+        alloc = {
+            h: min(self.population[h], max(2, int(share)))
+            for h, share in shares.items()
+        }
+        spare = self.budget - sum(alloc.values())
+        by_remainder = sorted(
+            shares, key=lambda h: shares[h] - int(shares[h]), reverse=True
+        )
+        for h in by_remainder:
+            if spare <= 0:
+                break
+            if alloc[h] < self.population[h]:
+                alloc[h] += 1
+                spare -= 1
+        return alloc
+
+    def sample(
+        self, allocation: Optional[Dict[str, int]] = None
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """[(stratum, comment), ...] drawn from the reservoirs per allocation()."""
+        picked = []
+        for stratum, size in (allocation or self.allocation()).items():
+            reservoir = self._reservoirs[stratum]
+            for comment in self._rng.sample(reservoir, min(size, len(reservoir))):
+                picked.append((stratum, comment))
+        return picked
+
+
+def _estimate_total(
+    population: Dict[str, int],
+    hits: Dict[str, int],
+    sampled: Dict[str, int],
+) -> Dict[str, float]:
+    """
+    Stratified estimate of how many comments in the population fall into a
+    category, with a 95% normal-approximation interval (finite population
+    correction applied per stratum).
+    """
+    estimate, variance = 0.0, 0.0
+    for stratum, n in sampled.items():
+        if not n:
+            continue
+        N = population[stratum]
+        p = hits.get(stratum, 0) / n
+        estimate += N * p
+        if n > 1:
+            variance += N * N * (1 - n / N) * p * (1 - p) / (n - 1)
+
+    margin = Z_95 * math.sqrt(variance)
+    total = sum(population.values())
+    return {
+        "estimate": round(estimate),
+        "ci_low": max(0, round(estimate - margin)),
+        "ci_high": min(total, round(estimate + margin)),
+    }
+
+
+def scale_up(
+    population: Dict[str, int],
+    labelled: List[Tuple[str, Optional[Dict[str, Any]]]],
+) -> Dict[str, Any]:
+    """
+    Estimate population counts from labelled sample comments.
+    labelled: [(stratum, label or None)]; unlabelled comments are ignored
+    (treated as missing at random within their stratum).
+    """
+    sampled: Dict[str, int] = {}
+    counts: Dict[str, Dict[str, int]] = {}
+
+    def hit(category: str, stratum: str):
+        per_stratum = counts.setdefault(category, {})
+        per_stratum[stratum] = per_stratum.get(stratum, 0) + 1
+
+    for stratum, label in labelled:
+        if not label:
+            continue
+        sampled[stratum] = sampled.get(stratum, 0) + 1
+        hit(f"sentiment.{label.get('sentiment')}", stratum)
+        hit(f"intent.{label.get('intent')}", stratum)
+        if label.get("toxic"):
+            hit("toxic", stratum)
+
+    # Strata with no labelled comment at all cannot be estimated
+    covered = {h: n for h, n in population.items() if sampled.get(h)}
+
+    def estimate(category: str) -> Dict[str, float]:
+        return _estimate_total(covered, counts.get(category, {}), sampled)
+
+    return {
+        "sentiment": {k: estimate(f"sentiment.{k}") for k in SENTIMENTS},
+        "intents": {k: estimate(f"intent.{k}") for k in INTENTS},
+        "toxic_count": estimate("toxic"),
+        "population_covered": sum(covered.values()),
+    }
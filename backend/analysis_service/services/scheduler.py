@@ -0,0 +1,208 @@
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+
+from ..models import AnalysisJob
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_FREE = 0
+PRIORITY_PAID = 1
+
+
+def user_priority(user) -> int:
+    """Users who ever purchased credits (see Transaction) are served first."""
+    from transactions.models import Transaction
+
+    try:
+        paid = Transaction.objects(user_id=str(user.id), type="purchase").first()
+    except Exception as e:
+        logger.warning(f"Could not determine job priority: {e}")
+        return PRIORITY_FREE
+    return PRIORITY_PAID if paid else PRIORITY_FREE
+
+
+def claim_job(job_id) -> Optional[AnalysisJob]:
+    """Atomic queued -> running; None if another worker got it first."""
+    now = datetime.utcnow()
+    return AnalysisJob.objects(id=job_id, status=AnalysisJob.STATUS_QUEUED).modify(
+        set__status=AnalysisJob.STATUS_RUNNING,
+        set__stage="starting",
+        set__started_at=now,
+        set__updated_at=now,
+        new=True,
+    )
+
+
+def fair_order(
+    queued: List[Dict[str, Any]],
+    running: Dict[Any, int],
+    per_user_cap: int,
+    slots: int,
+    aging_seconds: float,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Pick up to `slots` queued jobs: highest priority first, round-robin across
+    users within a priority (one job per user per round, oldest first), never
+    more than `per_user_cap` running jobs per user. A job that waited longer
+    than `aging_seconds` is bumped one priority level, so free users are not
+    starved by a steady stream of paid work.
+    queued: rows with "_id", "user", "priority", "created_at".
+    running: {user: running jobs}.
+    """
+    now = now or datetime.utcnow()
+    aged_before = now - timedelta(seconds=aging_seconds)
+
+    def effective(row) -> int:
+        priority = row.get("priority") or PRIORITY_FREE
+        return priority + (1 if row["created_at"] < aged_before else 0)
+
+    levels: Dict[int, "OrderedDict[Any, deque]"] = {}
+    for row in sorted(queued, key=lambda r: r["created_at"]):
+        per_user = levels.setdefault(effective(row), OrderedDict())
+        per_user.setdefault(row["user"], deque()).append(row)
+
+    counts = dict(running)
+    picked: List[Dict[str, Any]] = []
+    for level in sorted(levels, reverse=True):
+        per_user = levels[level]
+        while per_user and len(picked) < slots:
+            for user in list(per_user):
+                if len(picked) >= slots:
+                    break
+                if counts.get(user, 0) >= per_user_cap:
+                    del per_user[user]
+                    continue
+                picked.append(per_user[user].popleft())
+                counts[user] = counts.get(user, 0) + 1
+                if not per_user[user]:
+                    del per_user[user]
+    return picked
+
+
+class JobScheduler:
+    """
+    Fair-share dispatcher for analysis jobs.
+
+    The queue is the analysis_jobs collection itself (status "queued"), so
+    it survives restarts and is shared by every gunicorn worker. Each process
+    runs one dispatcher thread that claims jobs for its own worker pool, as
+    slots free up, in fair_order(). The per-user cap counts running jobs in
+    all processes; so does the cap on in-flight LLM calls,
+    ANALYSIS_LLM_GLOBAL_CONCURRENCY (see rate_limiter.SharedCallSlots).
+    """
+
+    def __init__(
+        self,
+        executor: ThreadPoolExecutor,
+        capacity: int,
+        run_job: Callable[[AnalysisJob], None],
+    ):
+        self.executor = executor
+        self.capacity = max(1, capacity)
+        self.run_job = run_job
+        self.poll_seconds = getattr(settings, "ANALYSIS_SCHEDULER_POLL_SECONDS", 2.0)
+        self.per_user_cap = max(1, getattr(settings, "ANALYSIS_USER_MAX_IN_FLIGHT", 2))
+        self.aging_seconds = getattr(settings, "ANALYSIS_SCHEDULER_AGING_SECONDS", 300)
+        self.scan_limit = getattr(settings, "ANALYSIS_SCHEDULER_SCAN_LIMIT", 500)
+
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="analysis-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def wake(self) -> None:
+        """Dispatch now (new job submitted / a slot freed up)."""
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            try:
+                self.dispatch()
+            except Exception as e:
+                logger.error(f"Job dispatch failed: {e}")
+
+    def free_slots(self) -> int:
+        with self._lock:
+            return self.capacity - self._in_flight
+
+    def dispatch(self) -> int:
+        """One scheduling pass; returns the number of jobs started."""
+        self._report_queue_depth()
+        slots = self.free_slots()
+        if slots <= 0:
+            return 0
+
+        queued = list(
+            AnalysisJob.objects(status=AnalysisJob.STATUS_QUEUED)
+            .order_by("-priority", "created_at")
+            .only("id", "user", "priority", "created_at")
+            .limit(self.scan_limit)
+            .as_pymongo()
+        )
+        if not queued:
+            return 0
+
+        running = {
+            row["_id"]: row["count"]
+            for row in AnalysisJob.objects(status=AnalysisJob.STATUS_RUNNING).aggregate(
+                [{"$group": {"_id": "$user", "count": {"$sum": 1}}}]
+            )
+        }
+
+        started = 0
+        for row in fair_order(
+            queued, running, self.per_user_cap, slots, self.aging_seconds
+        ):
+            job = claim_job(row["_id"])
+            if not job:
+                continue  # taken by another process
+            priority = "paid" if row.get("priority") else "free"
+            metrics.QUEUE_WAIT_SECONDS.labels(priority=priority).observe(
+                max(0.0, (job.started_at - job.created_at).total_seconds())
+            )
+            with self._lock:
+                self._in_flight += 1
+            metrics.JOBS_IN_FLIGHT.inc()
+            self.executor.submit(self._run, job)
+            started += 1
+        return started
+
+    def _run(self, job: AnalysisJob) -> None:
+        try:
+            self.run_job(job)
+        except Exception as e:
+            logger.error(f"Analysis job {job.id} crashed: {e}")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            metrics.JOBS_IN_FLIGHT.dec()
+            self.wake()
+
+    @staticmethod
+    def _report_queue_depth() -> None:
+        counts = {PRIORITY_FREE: 0, PRIORITY_PAID: 0}
+        for row in AnalysisJob.objects(status=AnalysisJob.STATUS_QUEUED).aggregate(
+            [{"$group": {"_id": "$priority", "count": {"$sum": 1}}}]
+        ):
+            level = PRIORITY_PAID if row["_id"] else PRIORITY_FREE
+            counts[level] += row["count"]
+        metrics.QUEUE_DEPTH.labels(priority="paid").set(counts[PRIORITY_PAID])
+        metrics.QUEUE_DEPTH.labels(priority="free").set(counts[PRIORITY_FREE])
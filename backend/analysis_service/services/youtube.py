@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional
 from itertools import islice
 from youtube_comment_downloader import YoutubeCommentDownloader
 
@@ -7,9 +7,15 @@ logger = logging.getLogger(__name__)
 
 
 class YouTubeFetchService:
-    def fetch_video_data(self, url: str, max_comments: int = 150) -> Dict[str, Any]:
+    def fetch_video_data(
+        self,
+        url: str,
+        max_comments: int = 150,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         """
         Fetch video metadata and comments in a single pass.
+        Pass metadata to skip its fetch (prefetched by fetch_metadata_many).
         Returns:
             {
                 "metadata": { ... },
@@ -17,11 +23,49 @@ class YouTubeFetchService:
             }
         """
         return {
-            "metadata": self._fetch_metadata(url),
+            "metadata": metadata or self.fetch_metadata(url),
             "comments": self._fetch_comments(url, max_comments),
         }
 
-    def _fetch_metadata(self, url: str) -> Dict[str, Any]:
+    def fetch_metadata_many(self, video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Metadata for several videos with one videos.list call per 50 ids.
+        Videos the API could not return are left out (callers fall back to
+        fetch_metadata for those).
+        """
+        from youtube_service.youtube_api_service import YouTubeAPIService
+
+        try:
+            api_service = YouTubeAPIService()
+            success, message, details = api_service.fetch_youtube_metadata_batch(
+                video_ids
+            )
+        except Exception as e:
+            logger.warning(f"Batch metadata fetch failed: {e}")
+            return {}
+        if not success:
+            logger.warning(f"Batch metadata fetch incomplete: {message}")
+        return {
+            video_id: self._normalize_metadata(video_id, metadata)
+            for video_id, metadata in details.items()
+        }
+
+    @staticmethod
+    def _normalize_metadata(video_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "video_id": video_id,
+            "title": metadata.get("title"),
+            "channel": metadata.get("channel_title"),
+            "views": metadata.get("view_count"),
+            "upload_date": metadata.get("published_at").strftime("%Y-%m-%d")
+            if metadata.get("published_at")
+            else None,
+            "thumbnail": metadata.get("thumbnail_url"),
+            "duration": metadata.get("duration"),
+            "likes": metadata.get("like_count"),
+        }
+
+    def fetch_metadata(self, url: str) -> Dict[str, Any]:
         """
         Fetch video metadata using official API or oEmbed fallback.
         Avoids yt-dlp bot detection issues.
@@ -41,18 +85,7 @@ class YouTubeFetchService:
             )
 
             if success and metadata:
-                return {
-                    "video_id": video_id,
-                    "title": metadata.get("title"),
-                    "channel": metadata.get("channel_title"),
-                    "views": metadata.get("view_count"),
-                    "upload_date": metadata.get("published_at").strftime("%Y-%m-%d")
-                    if metadata.get("published_at")
-                    else None,
-                    "thumbnail": metadata.get("thumbnail_url"),
-                    "duration": metadata.get("duration"),
-                    "likes": metadata.get("like_count"),
-                }
+                return self._normalize_metadata(video_id, metadata)
 
             logger.warning(
                 f"Metadata fetch fallback triggered for {url}. Message: {message}"
@@ -76,30 +109,31 @@ class YouTubeFetchService:
             logger.error(f"Metadata fetch failed: {e}")
             raise ValueError(f"Could not fetch video details: {str(e)}")
 
+    def iter_comments(self, url: str, sort_by: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily stream comments from the scraper (1 = Top comments, 0 = Newest).
+        Pages are only requested as the caller consumes the iterator.
+        """
+        downloader = YoutubeCommentDownloader()
+        # method get_comments_from_url returns a generator
+        for comment in downloader.get_comments_from_url(url, sort_by=sort_by):
+            yield {
+                "text": comment.get("text"),
+                "author": comment.get("author"),
+                "likes": comment.get("votes") or 0,
+                "cid": comment.get("cid"),
+                "time": comment.get("time"),
+            }
+
     def _fetch_comments(self, url: str, max_comments: int) -> List[Dict[str, Any]]:
         comments = []
 
         # 1. Try Scraper (YoutubeCommentDownloader) - Better for large volume if not blocked
         try:
-            downloader = YoutubeCommentDownloader()
-            # method get_comments_from_url returns a generator
-            generator = downloader.get_comments_from_url(
-                url, sort_by=1
-            )  # 1 = Top comments, 0 = Newest
-
             # Fetch slightly more to account for cleaner filtering
             fetch_limit = int(max_comments * 1.4)  # 40% buffer
 
-            for comment in islice(generator, fetch_limit):
-                comments.append(
-                    {
-                        "text": comment.get("text"),
-                        "author": comment.get("author"),
-                        "likes": comment.get("votes") or 0,
-                        "cid": comment.get("cid"),
-                        "time": comment.get("time"),
-                    }
-                )
+            comments.extend(islice(self.iter_comments(url), fetch_limit))
 
             if comments:
                 logger.info(f"Successfully scraped {len(comments)} comments")
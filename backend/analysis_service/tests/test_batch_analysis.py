@@ -0,0 +1,141 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from accounts.models import MongoUser
+from analysis_service.models import AnalysisJob
+from analysis_service.services import jobs
+from analysis_service.services.result_cache import store_result
+
+
+def url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+VIDEOS = ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+
+
+class SubmitBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.user = MongoUser(username="viewer", email="viewer@example.com").save()
+        patches = [
+            mock.patch.object(jobs, "reserve_credits", return_value=7),
+            mock.patch.object(jobs, "refund_credits"),
+            mock.patch.object(jobs, "record_analysis"),
+            mock.patch.object(jobs, "_get_executor"),
+            mock.patch.object(jobs, "_get_scheduler"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_videos_are_deduplicated_and_paid_for_once(self):
+        urls = [url(VIDEOS[0]), url(VIDEOS[1]), url(VIDEOS[0]), "not a url"]
+
+        batch, batch_jobs = jobs.submit_batch_analysis(self.user, urls, 150)
+
+        self.assertEqual(batch.video_ids, VIDEOS[:2])
+        self.assertEqual(batch.invalid_urls, ["not a url"])
+        self.assertEqual(batch.credits_reserved, 2)
+        jobs.reserve_credits.assert_called_once()
+        self.assertEqual(jobs.reserve_credits.call_args.kwargs["amount"], 2)
+        self.assertEqual([job.batch_id for job in batch_jobs], [str(batch.id)] * 2)
+
+    def test_cached_videos_complete_and_the_rest_are_queued(self):
+        store_result(
+            VIDEOS[1],
+            150,
+            {
+                "metadata": {"video_id": VIDEOS[1]},
+                "analysis": {},
+                "sample_comments": [],
+            },
+        )
+
+        _, batch_jobs = jobs.submit_batch_analysis(
+            self.user, [url(v) for v in VIDEOS], 150
+        )
+
+        self.assertEqual(
+            [job.status for job in batch_jobs],
+            [
+                AnalysisJob.STATUS_QUEUED,
+                AnalysisJob.STATUS_COMPLETED,
+                AnalysisJob.STATUS_QUEUED,
+            ],
+        )
+        (prefetched,) = jobs._get_executor.return_value.submit.call_args.args[1:]
+        self.assertEqual([video_id for _, video_id in prefetched], VIDEOS[::2])
+        jobs._get_scheduler.return_value.wake.assert_called_once()
+
+    def test_no_valid_url_is_rejected_before_charging(self):
+        with self.assertRaises(ValueError):
+            jobs.submit_batch_analysis(self.user, ["nope", ""], 150)
+
+        jobs.reserve_credits.assert_not_called()
+
+    def test_failed_submission_refunds_every_video(self):
+        saved = AnalysisJob.save
+
+        def save(job, *args, **kwargs):
+            if job.video_id == VIDEOS[1]:
+                raise RuntimeError("write failed")
+            return saved(job, *args, **kwargs)
+
+        with mock.patch.object(AnalysisJob, "save", save):
+            with self.assertRaises(RuntimeError):
+                jobs.submit_batch_analysis(self.user, [url(v) for v in VIDEOS], 150)
+
+        # The saved job is failed (and refunded), the other two in one go
+        self.assertEqual(
+            list(AnalysisJob.objects.values_list("status")), [AnalysisJob.STATUS_FAILED]
+        )
+        refunds = [call.args[1] for call in jobs.refund_credits.call_args_list]
+        self.assertEqual(sorted(refunds), [1, 2])
+
+
+class SerializeBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.user = MongoUser(username="viewer", email="viewer@example.com").save()
+        patches = [
+            mock.patch.object(jobs, "reserve_credits", return_value=7),
+            mock.patch.object(jobs, "_get_executor"),
+            mock.patch.object(jobs, "_get_scheduler"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.batch, self.jobs = jobs.submit_batch_analysis(
+            self.user, [url(v) for v in VIDEOS[:2]], 150
+        )
+
+    def finish(self, job, finished_at):
+        AnalysisJob.objects(id=job.id).update_one(
+            set__status=AnalysisJob.STATUS_COMPLETED,
+            set__result={"metadata": {}, "analysis": {}},
+            set__finished_at=finished_at,
+        )
+
+    def test_done_once_no_video_is_active(self):
+        self.finish(self.jobs[0], datetime.utcnow())
+
+        data = jobs.serialize_batch(self.batch)
+        self.assertEqual(data["counts"]["completed"], 1)
+        self.assertEqual(data["counts"]["queued"], 1)
+        self.assertFalse(data["done"])
+
+        self.finish(self.jobs[1], datetime.utcnow())
+        self.assertTrue(jobs.serialize_batch(self.batch)["done"])
+
+    def test_finished_after_omits_results_already_seen(self):
+        seen = datetime.utcnow() - timedelta(minutes=1)
+        self.finish(self.jobs[0], seen - timedelta(minutes=1))
+        self.finish(self.jobs[1], datetime.utcnow())
+
+        videos = jobs.serialize_batch(self.batch, finished_after=seen)["videos"]
+
+        self.assertEqual(["result" in video for video in videos], [False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
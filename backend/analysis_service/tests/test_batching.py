@@ -0,0 +1,105 @@
+import unittest
+from unittest import mock
+
+from analysis_service.services import batching
+from analysis_service.services.batching import (
+    LINE_OVERHEAD_TOKENS,
+    BatchPlanner,
+    estimate_comment_tokens,
+)
+from analysis_service.services.prompts import build_batch_prompt
+
+
+def comments(n: int):
+    return [{"text": f"  Comment   number {i}\n\nloved it  "} for i in range(n)]
+
+
+class BatchPlannerTests(unittest.TestCase):
+    def test_batches_stay_within_the_token_budget(self):
+        planner = BatchPlanner(token_budget=120, max_comments=100, overhead_tokens=20)
+
+        batches, planned = planner.plan(comments(40))
+
+        self.assertGreater(len(batches), 1)
+        self.assertTrue(all(tokens <= 120 for tokens in planned))
+        # Packed greedily: adding the next comment would have crossed the budget
+        for batch, tokens, following in zip(batches, planned, batches[1:]):
+            self.assertGreater(
+                tokens + estimate_comment_tokens(following.texts[0]), 120
+            )
+
+    def test_batches_hold_at_most_max_comments_in_order(self):
+        planner = BatchPlanner(token_budget=100000, max_comments=7)
+        items = comments(20)
+
+        batches, _ = planner.plan(items)
+
+        self.assertEqual([len(batch) for batch in batches], [7, 7, 6])
+        self.assertEqual([c for batch in batches for c in batch], items)
+
+    def test_planned_tokens_include_the_prompt_overhead(self):
+        planner = BatchPlanner(token_budget=4000, max_comments=100, overhead_tokens=50)
+
+        (batch,), (planned,) = planner.plan(comments(3))
+
+        self.assertEqual(
+            planned, 50 + sum(estimate_comment_tokens(text) for text in batch.texts)
+        )
+
+    def test_oversized_comment_gets_a_batch_of_its_own(self):
+        planner = BatchPlanner(token_budget=100, max_comments=100)
+        items = comments(2) + [{"text": "long " * 200}] + comments(2)
+
+        batches, _ = planner.plan(items)
+
+        self.assertIn([items[2]], batches)
+
+    def test_non_latin_text_costs_more_than_its_length(self):
+        self.assertEqual(
+            estimate_comment_tokens("abcd" * 10), 10 + LINE_OVERHEAD_TOKENS
+        )
+        self.assertEqual(estimate_comment_tokens("é" * 40), 20 + LINE_OVERHEAD_TOKENS)
+
+    def test_iter_batches_matches_plan(self):
+        planner = BatchPlanner(token_budget=150, max_comments=5, overhead_tokens=10)
+        items = comments(30)
+
+        self.assertEqual(
+            list(zip(*planner.plan(items))), list(planner.iter_batches(iter(items)))
+        )
+
+
+class PlannedBatchTests(unittest.TestCase):
+    def test_each_comment_is_compacted_once(self):
+        planner = BatchPlanner(token_budget=200, max_comments=10)
+        with mock.patch.object(
+            batching, "compact_comment", wraps=batching.compact_comment
+        ) as compact:
+            batches, _ = planner.plan(comments(25))
+
+        self.assertEqual(compact.call_count, 25)
+        self.assertEqual(sum(len(batch) for batch in batches), 25)
+
+    def test_prompt_matches_compacting_on_the_fly(self):
+        planner = BatchPlanner(token_budget=4000, max_comments=100)
+        (batch,), _ = planner.plan(comments(6))
+
+        self.assertEqual(
+            build_batch_prompt(batch, batch.texts), build_batch_prompt(list(batch))
+        )
+
+    def test_slices_keep_texts_aligned(self):
+        planner = BatchPlanner(token_budget=4000, max_comments=100)
+        (batch,), _ = planner.plan(comments(6))
+
+        right = batch[3:]
+
+        self.assertIs(right[0], batch[3])
+        self.assertEqual(right.texts, batch.texts[3:])
+        self.assertEqual(
+            build_batch_prompt(right, right.texts), build_batch_prompt(list(right))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
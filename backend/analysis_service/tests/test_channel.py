@@ -0,0 +1,141 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from accounts.models import MongoUser
+from analysis_service.models import AnalysisJob, ChannelAnalysis
+from analysis_service.services import channel
+from analysis_service.services.channel import (
+    merge_video_aggregates,
+    resume_channel_analyses,
+    run_channel_analysis,
+    stored_video_aggregates,
+)
+
+
+class ChannelRollupTests(unittest.TestCase):
+    def setUp(self):
+        self.user = MongoUser(username="viewer", email="viewer@example.com").save()
+        patches = [
+            mock.patch.object(channel, "refund_credits"),
+            mock.patch.object(channel, "_get_executor"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def analysis(self, video_id, positive, negative, age_days=0, **extra):
+        result = {
+            "metadata": {"title": f"Video {video_id}"},
+            "analysis": {
+                "sentiment_breakdown": {
+                    "positive": positive,
+                    "neutral": 0,
+                    "negative": negative,
+                },
+                "intents": {"praise": positive, "complaint": negative},
+                "toxic_count": 1,
+                "what_users_love": ["editing"],
+                "areas_for_improvement": ["audio"],
+                **extra,
+            },
+        }
+        return AnalysisJob(
+            user=self.user,
+            youtube_url=f"https://www.youtube.com/watch?v={video_id}",
+            video_id=video_id,
+            status=AnalysisJob.STATUS_COMPLETED,
+            result=result,
+            finished_at=datetime.utcnow() - timedelta(days=age_days),
+        ).save()
+
+    def test_latest_recent_analysis_per_video_is_used(self):
+        topics = [{"topic": "Editing", "count": 7}]
+        self.analysis("v1", 10, 5, age_days=3, topic_frequencies=topics)
+        self.analysis("v1", 20, 2, age_days=1, topic_frequencies=topics)
+        self.analysis("v2", 4, 4, age_days=60)
+        self.analysis("v3", 1, 1, key_topics=["Music", "Intro"])
+
+        videos = stored_video_aggregates(["v1", "v2", "v3"], max_age_days=30)
+
+        self.assertEqual(set(videos), {"v1", "v3"})
+        self.assertEqual(videos["v1"]["sentiment"]["positive"], 20)
+        self.assertEqual(videos["v1"]["comments"], 22)
+        self.assertEqual(videos["v1"]["topic_frequencies"], topics)
+        # Older results without frequencies count one mention per key topic
+        self.assertEqual(
+            videos["v3"]["topic_frequencies"],
+            [{"topic": "Music", "count": 1}, {"topic": "Intro", "count": 1}],
+        )
+
+    def test_merge_adds_counts_and_topic_frequencies(self):
+        self.analysis("v1", 10, 5, topic_frequencies=[{"topic": "editing", "count": 4}])
+        self.analysis("v2", 3, 1, topic_frequencies=[{"topic": "Editing", "count": 2}])
+
+        merged = merge_video_aggregates(stored_video_aggregates(["v1", "v2"]).values())
+
+        self.assertEqual(
+            merged.sentiment, {"positive": 13, "neutral": 0, "negative": 6}
+        )
+        self.assertEqual(merged.toxic_count, 2)
+        self.assertEqual(merged.digest()["top_topics"][0]["count"], 6)
+
+    def rollup(self, video_ids, **fields):
+        return ChannelAnalysis(
+            user=self.user,
+            channel_id="UC123",
+            channel_title="Channel",
+            video_ids=video_ids,
+            credits_reserved=1,
+            **fields,
+        ).save()
+
+    def test_rollup_summarizes_stored_videos_once(self):
+        self.analysis("v1", 10, 5)
+        rollup = self.rollup(["v1", "v2"])
+
+        with mock.patch.object(channel, "AnalysisService") as service:
+            service.return_value.summarize_channel.return_value = {"summary": "ok"}
+            run_channel_analysis(str(rollup.id))
+
+        rollup.reload()
+        self.assertEqual(rollup.status, ChannelAnalysis.STATUS_COMPLETED)
+        self.assertEqual(rollup.result["analysis"], {"summary": "ok"})
+        self.assertEqual(
+            rollup.result["coverage"],
+            {"videos_total": 2, "videos_included": 1, "videos_missing": ["v2"]},
+        )
+        service.return_value.summarize_channel.assert_called_once()
+
+    def test_rollup_without_any_stored_video_fails_and_refunds(self):
+        rollup = self.rollup(["v1"])
+
+        run_channel_analysis(str(rollup.id))
+
+        rollup.reload()
+        self.assertEqual(rollup.status, ChannelAnalysis.STATUS_FAILED)
+        channel.refund_credits.assert_called_once()
+
+    def test_waiting_rollup_is_queued_once_its_batch_is_done(self):
+        job = AnalysisJob(
+            user=self.user, youtube_url="u", video_id="v1", batch_id="batch-1"
+        ).save()
+        rollup = self.rollup(
+            ["v1"], batch_id="batch-1", status=ChannelAnalysis.STATUS_WAITING
+        )
+
+        resume_channel_analyses("batch-1")
+        self.assertEqual(rollup.reload().status, ChannelAnalysis.STATUS_WAITING)
+
+        job.update(set__status=AnalysisJob.STATUS_COMPLETED)
+        resume_channel_analyses("batch-1")
+        resume_channel_analyses("batch-1")
+
+        self.assertEqual(rollup.reload().status, ChannelAnalysis.STATUS_QUEUED)
+        channel._get_executor.return_value.submit.assert_called_once_with(
+            run_channel_analysis, str(rollup.id)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
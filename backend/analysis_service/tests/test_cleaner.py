@@ -0,0 +1,79 @@
+import unittest
+
+from analysis_service.services.cleaner import (
+    MAX_TEXT_LENGTH,
+    CommentCleaner,
+)
+
+
+def comment(text, cid=None):
+    return {"cid": cid or text[:10], "text": text}
+
+
+class CommentCleanerTests(unittest.TestCase):
+    def test_drop_counts_per_rule(self):
+        comments = [
+            comment("Great video, thanks!"),
+            comment("  great VIDEO, thanks!  "),
+            comment(""),
+            {"cid": "none", "text": None},
+            comment("lol"),
+            comment("https://example.com/spam"),
+            comment("Watch https://example.com for more"),
+        ]
+        cleaner = CommentCleaner()
+
+        kept = cleaner.clean_comments(comments)
+
+        self.assertEqual(
+            [c["text"] for c in kept],
+            ["Great video, thanks!", "Watch https://example.com for more"],
+        )
+        self.assertEqual(
+            cleaner.stats(),
+            {
+                "kept": 2,
+                "truncated": 0,
+                "dropped": {"empty": 2, "duplicate": 1, "too_short": 1, "url_only": 1},
+            },
+        )
+
+    def test_long_comments_are_truncated_on_a_copy(self):
+        original = comment("x" * (MAX_TEXT_LENGTH + 50))
+
+        (kept,) = CommentCleaner().clean_comments([original])
+
+        self.assertEqual(kept["text"], "x" * MAX_TEXT_LENGTH + "...")
+        self.assertEqual(len(original["text"]), MAX_TEXT_LENGTH + 50)
+
+    def test_iter_clean_is_lazy(self):
+        def stream():
+            yield comment("First real comment")
+            raise AssertionError("read past the first comment")
+
+        first = next(CommentCleaner().iter_clean(stream()))
+
+        self.assertEqual(first["text"], "First real comment")
+
+    def test_dedup_window_bounds_the_duplicate_set(self):
+        texts = ["comment one", "comment two", "comment three", "comment one"]
+
+        windowed = CommentCleaner(dedup_window=2)
+        unbounded = CommentCleaner()
+
+        self.assertEqual(len(windowed.clean_comments(map(comment, texts))), 4)
+        self.assertEqual(len(unbounded.clean_comments(map(comment, texts))), 3)
+
+    def test_drops_add_up_over_calls_but_duplicates_are_per_call(self):
+        cleaner = CommentCleaner()
+
+        cleaner.clean_comments([comment("same comment"), comment("lol")])
+        cleaner.clean_comments([comment("same comment"), comment("lol")])
+
+        self.assertEqual(cleaner.kept, 2)
+        self.assertEqual(cleaner.drops["too_short"], 2)
+        self.assertEqual(cleaner.drops["duplicate"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from accounts.models import MongoUser
+from analysis_service.models import AnalysisJob, AnalysisLease
+from analysis_service.services import jobs
+from analysis_service.services.coalescing import (
+    LeaseHeartbeat,
+    acquire_lease,
+    lease_key,
+)
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def result(video_id="dQw4w9WgXcQ"):
+    return {"metadata": {"video_id": video_id}, "analysis": {"total_comments": 3}}
+
+
+class CoalescingTests(unittest.TestCase):
+    def setUp(self):
+        self.user = MongoUser(username="viewer", email="viewer@example.com").save()
+        patches = [
+            mock.patch.object(jobs, "store_result"),
+            mock.patch.object(jobs, "record_analysis"),
+            mock.patch.object(jobs, "_get_scheduler"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def running_job(self) -> AnalysisJob:
+        return AnalysisJob(
+            user=self.user,
+            youtube_url=URL,
+            video_id="dQw4w9WgXcQ",
+            status=AnalysisJob.STATUS_RUNNING,
+        ).save()
+
+    def reload(self, job: AnalysisJob) -> AnalysisJob:
+        return AnalysisJob.objects(id=job.id).first()
+
+    def test_follower_parks_without_running_the_pipeline(self):
+        leader, follower = self.running_job(), self.running_job()
+        acquire_lease(lease_key(leader), str(leader.id))
+
+        with mock.patch.object(jobs, "_run_pipeline") as run:
+            jobs.execute_job(follower)
+
+        run.assert_not_called()
+        follower = self.reload(follower)
+        self.assertEqual(follower.status, AnalysisJob.STATUS_WAITING)
+        self.assertEqual(follower.leader_job_id, str(leader.id))
+
+    def test_leader_completion_finishes_followers(self):
+        leader, follower = self.running_job(), self.running_job()
+
+        def pipeline(job, progress, metadata=None):
+            # Submitted while the leader computes the same analysis
+            jobs.execute_job(follower)
+            self.assertEqual(self.reload(follower).status, AnalysisJob.STATUS_WAITING)
+            return result()
+
+        with mock.patch.object(jobs, "_run_pipeline", side_effect=pipeline) as run:
+            jobs.execute_job(leader)
+
+        self.assertEqual(run.call_count, 1)
+        follower = self.reload(follower)
+        self.assertEqual(follower.status, AnalysisJob.STATUS_COMPLETED)
+        self.assertEqual(
+            follower.result["cache"],
+            {"status": "coalesced", "leader_job_id": str(leader.id)},
+        )
+        self.assertEqual(follower.result["analysis"], {"total_comments": 3})
+        self.assertIsNone(AnalysisLease.objects(key=lease_key(leader)).first())
+
+    def test_follower_parked_after_the_leader_finished_completes(self):
+        leader, follower = self.running_job(), self.running_job()
+        with mock.patch.object(jobs, "_run_pipeline", return_value=result()):
+            jobs.execute_job(leader)
+        # The lease outlived the leader (e.g. a slow release)
+        acquire_lease(lease_key(leader), str(leader.id))
+
+        jobs.execute_job(follower)
+
+        self.assertEqual(self.reload(follower).status, AnalysisJob.STATUS_COMPLETED)
+
+    def test_leader_failure_fails_followers(self):
+        leader, follower = self.running_job(), self.running_job()
+
+        def pipeline(job, progress, metadata=None):
+            jobs.execute_job(follower)
+            raise RuntimeError("quota exhausted")
+
+        with mock.patch.object(jobs, "_run_pipeline", side_effect=pipeline):
+            jobs.execute_job(leader)
+
+        follower = self.reload(follower)
+        self.assertEqual(follower.status, AnalysisJob.STATUS_FAILED)
+        self.assertEqual(follower.error, "quota exhausted")
+
+    def test_lost_lease_requeues_the_follower(self):
+        leader, follower = self.running_job(), self.running_job()
+        acquire_lease(lease_key(leader), str(leader.id))
+        with mock.patch.object(jobs, "_run_pipeline"):
+            jobs.execute_job(follower)
+        # The leader's worker died: its lease expired without a result
+        AnalysisLease.objects(key=lease_key(leader)).update_one(
+            set__expires_at=datetime.utcnow() - timedelta(seconds=1)
+        )
+
+        follower = jobs.expire_stale_job(self.reload(follower))
+
+        self.assertEqual(follower.status, AnalysisJob.STATUS_QUEUED)
+        self.assertIsNone(follower.leader_job_id)
+        jobs._get_scheduler.return_value.wake.assert_called_once()
+
+    def test_waiting_follower_mirrors_leader_progress(self):
+        leader, follower = self.running_job(), self.running_job()
+        acquire_lease(lease_key(leader), str(leader.id))
+        jobs.execute_job(follower)
+        AnalysisJob.objects(id=leader.id).update_one(
+            set__stage="summarizing", set__progress=80
+        )
+
+        follower = jobs.expire_stale_job(self.reload(follower))
+
+        self.assertEqual(follower.status, AnalysisJob.STATUS_WAITING)
+        self.assertEqual((follower.stage, follower.progress), ("summarizing", 80))
+
+
+class LeaseHeartbeatTests(unittest.TestCase):
+    def test_renews_without_progress_reports(self):
+        acquire_lease("key", "leader")
+        stale = datetime.utcnow() - timedelta(seconds=5)
+        AnalysisLease.objects(key="key").update_one(set__expires_at=stale)
+
+        heartbeat = LeaseHeartbeat("key", "leader")
+        heartbeat.interval = 0.01
+        with heartbeat:
+            time.sleep(0.1)
+
+        self.assertGreater(
+            AnalysisLease.objects(key="key").first().expires_at, datetime.utcnow()
+        )
+
+    def test_no_thread_without_a_key(self):
+        with LeaseHeartbeat(None, "leader") as heartbeat:
+            self.assertIsNone(heartbeat._thread)
+
+
+if __name__ == "__main__":
+    unittest.main()
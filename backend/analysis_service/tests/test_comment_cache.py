@@ -0,0 +1,94 @@
+import unittest
+from unittest import mock
+
+from analysis_service.models import CachedCommentLabel
+from analysis_service.services import comment_cache
+from analysis_service.services.analyzer import PROMPT_VERSION, AnalysisService
+from analysis_service.services.comment_cache import (
+    CommentResultCache,
+    _LRU,
+    comment_cache_key,
+)
+from analysis_service.services.llm_backends import OfflineBackend
+from benchmarks.fakes import synthetic_comments
+
+LABEL = {"sentiment": "positive", "intent": "praise", "toxic": False, "topics": []}
+
+
+class CacheKeyTests(unittest.TestCase):
+    def test_case_and_whitespace_variants_share_a_key(self):
+        self.assertEqual(
+            comment_cache_key("  Great   VIDEO\n", "model", "v1"),
+            comment_cache_key("great video", "model", "v1"),
+        )
+
+    def test_model_and_prompt_version_are_part_of_the_key(self):
+        key = comment_cache_key("great video", "model", "v1")
+
+        self.assertNotEqual(key, comment_cache_key("great video", "other", "v1"))
+        self.assertNotEqual(key, comment_cache_key("great video", "model", "v2"))
+
+
+class LRUTests(unittest.TestCase):
+    def test_evicts_the_least_recently_used_entry(self):
+        lru = _LRU(2)
+        lru.set("a", {"n": 1})
+        lru.set("b", {"n": 2})
+        lru.get("a")
+        lru.set("c", {"n": 3})
+
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), {"n": 1})
+
+
+class CommentResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        # A fresh process tier per test
+        patcher = mock.patch.object(comment_cache, "_process_lru", _LRU(1000))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_miss_then_hit(self):
+        cache = CommentResultCache("model", "v1", use_mongo=False)
+        key = cache.key_for({"text": "Great video"})
+
+        self.assertEqual(cache.get_many([key]), {})
+        cache.set_many({key: LABEL})
+
+        self.assertEqual(cache.get_many([key]), {key: LABEL})
+
+    def test_other_workers_hit_the_mongo_tier(self):
+        key = comment_cache_key("Great video", "model", "v1")
+        # Written by another worker process
+        CachedCommentLabel(key=key, label=LABEL).save()
+        cache = CommentResultCache("model", "v1", use_mongo=True)
+
+        self.assertEqual(cache.get_many([key]), {key: LABEL})
+        # Now served by the in-process tier
+        self.assertEqual(cache.lru.get(key), LABEL)
+
+    def test_cache_failures_count_as_misses(self):
+        cache = CommentResultCache("model", "v1", use_mongo=True)
+        with mock.patch.object(CachedCommentLabel, "objects") as objects:
+            objects.side_effect = RuntimeError("no server")
+            self.assertEqual(cache.get_many(["key"]), {})
+
+    def test_repeat_analysis_skips_the_llm_for_cached_comments(self):
+        comments = synthetic_comments(120)
+
+        def analyze():
+            cache = CommentResultCache("offline-v1", PROMPT_VERSION, use_mongo=False)
+            analyzer = AnalysisService(backend=OfflineBackend(), comment_cache=cache)
+            return analyzer.analyze({"title": "Test"}, comments)["debug_info"]
+
+        first, second = analyze(), analyze()
+
+        self.assertEqual(first["cache_hits"], 0)
+        self.assertEqual(second["cache_hits"], 120)
+        self.assertEqual(second["cache_misses"], 0)
+        # Only the summary call is left
+        self.assertEqual(second["api_calls"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
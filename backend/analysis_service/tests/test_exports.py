@@ -0,0 +1,84 @@
+import json
+import unittest
+from unittest import mock
+
+from analysis_service.services import exports
+from analysis_service.services.exports import (
+    CommentLabelWriter,
+    compact_row,
+    expand_row,
+    format_rows,
+)
+
+LABEL = {"sentiment": "negative", "intent": "complaint", "toxic": True, "topics": []}
+
+
+def scraped_comment(votes: str):
+    """Shaped like youtube.py iter_comments (votes passed through)."""
+    return {
+        "text": "audio is too quiet",
+        "author": "@viewer",
+        "likes": votes,
+        "cid": "Ugx1",
+        "time": "2 days ago",
+    }
+
+
+class CompactRowTests(unittest.TestCase):
+    def test_scraper_like_strings_are_parsed(self):
+        for votes, likes in (("1.2K", 1200), ("3M", 3_000_000), ("17", 17), ("", 0)):
+            row = compact_row(scraped_comment(votes), LABEL)
+            self.assertEqual(expand_row(row)["likes"], likes)
+
+    def test_round_trip(self):
+        label = {**LABEL, "intent": "rant", "topics": ["audio"]}
+        row = compact_row(scraped_comment("5"), label)
+
+        self.assertEqual(
+            expand_row(row),
+            {
+                "cid": "Ugx1",
+                "author": "@viewer",
+                "likes": 5,
+                "text": "audio is too quiet",
+                "sentiment": "negative",
+                "intent": "other",
+                "toxic": True,
+                "topics": ["audio"],
+            },
+        )
+
+    def test_formats(self):
+        rows = [compact_row(scraped_comment("1.2K"), {**LABEL, "topics": ["a", "b"]})]
+
+        line = json.loads(format_rows(rows, "ndjson"))
+        self.assertEqual(line["likes"], 1200)
+        self.assertEqual(
+            format_rows(rows, "csv").strip(),
+            "Ugx1,@viewer,1200,audio is too quiet,negative,complaint,True,a; b",
+        )
+
+
+class CommentLabelWriterTests(unittest.TestCase):
+    def test_chunks_scraped_comments_and_skips_unlabelled(self):
+        saved = []
+        with mock.patch.object(exports, "CommentLabelChunk") as chunk:
+            chunk.side_effect = lambda **fields: saved.append(fields) or mock.Mock()
+            writer = CommentLabelWriter("job-1", chunk_size=2)
+            writer.add(
+                [
+                    (scraped_comment("1.2K"), LABEL),
+                    (scraped_comment("3"), None),
+                    (scraped_comment("2K"), LABEL),
+                    (scraped_comment("4"), LABEL),
+                ]
+            )
+            writer.close()
+
+        self.assertEqual(writer.count, 3)
+        self.assertEqual([fields["seq"] for fields in saved], [0, 1])
+        self.assertEqual([row[2] for row in saved[0]["rows"]], [1200, 2000])
+
+
+if __name__ == "__main__":
+    unittest.main()
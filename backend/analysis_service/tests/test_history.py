@@ -0,0 +1,127 @@
+import unittest
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from accounts.models import MongoUser, MongoUserPreference
+from analysis_service.models import AnalysisHistory, AnalysisJob
+from analysis_service.services.history import (
+    decode_cursor,
+    encode_cursor,
+    list_history,
+    record_analysis,
+)
+
+T0 = datetime(2024, 6, 1, 12, 0, 0)
+
+RESULT = {
+    "metadata": {"video_id": "v1", "title": "Test video", "channel": "Channel"},
+    "analysis": {
+        "sentiment_breakdown": {"positive": 3, "neutral": 1, "negative": 1},
+        "overall_summary": "Mostly positive.",
+        "debug_info": {"api_calls": 4},
+    },
+}
+
+
+class ListHistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.user = MongoUser(username="viewer", email="viewer@example.com").save()
+
+    def entry(self, name, created_at, user=None):
+        return AnalysisHistory(
+            user=user or self.user, job_id=name, title=name, created_at=created_at
+        ).save()
+
+    def walk(self, limit):
+        """Titles of every page, following next_cursor."""
+        pages, cursor = [], None
+        while True:
+            items, cursor = list_history(self.user, limit=limit, cursor=cursor)
+            pages.append([item["title"] for item in items])
+            if not cursor:
+                return pages
+
+    def test_pages_are_newest_first_without_gaps_or_repeats(self):
+        # e2..e4 share a timestamp and straddle page boundaries
+        self.entry("e0", T0)
+        self.entry("e1", T0 + timedelta(seconds=1))
+        for name in ("e2", "e3", "e4"):
+            self.entry(name, T0 + timedelta(seconds=2))
+        self.entry("e5", T0 + timedelta(seconds=3))
+
+        pages = self.walk(limit=2)
+
+        self.assertEqual(len(pages), 3)
+        titles = [title for page in pages for title in page]
+        self.assertEqual(titles[0], "e5")
+        self.assertEqual(sorted(titles[1:4]), ["e2", "e3", "e4"])
+        self.assertEqual(titles[4:], ["e1", "e0"])
+
+    def test_no_next_cursor_when_the_last_page_is_full(self):
+        for i in range(4):
+            self.entry(f"e{i}", T0 + timedelta(seconds=i))
+
+        items, cursor = list_history(self.user, limit=4)
+
+        self.assertEqual(len(items), 4)
+        self.assertIsNone(cursor)
+
+    def test_only_the_users_own_history_is_listed(self):
+        other = MongoUser(username="other", email="other@example.com").save()
+        self.entry("mine", T0)
+        self.entry("theirs", T0, user=other)
+
+        self.assertEqual(self.walk(limit=10), [["mine"]])
+
+    def test_list_rows_leave_the_report_out(self):
+        self.entry("e0", T0)
+
+        (item,), _ = list_history(self.user)
+
+        self.assertNotIn("analysis", item)
+        self.assertEqual(item["created_at"], T0.isoformat())
+
+    def test_cursor_round_trip_and_invalid_cursors(self):
+        history_id = ObjectId()
+
+        cursor = encode_cursor({"created_at": T0, "_id": history_id})
+
+        self.assertEqual(decode_cursor(cursor), (T0, history_id))
+        for bad in (
+            "garbage",
+            "bm90LWEtY3Vyc29y",
+            encode_cursor({"created_at": T0, "_id": "x"}),
+        ):
+            with self.assertRaises(ValueError):
+                list_history(self.user, cursor=bad)
+
+
+class RecordAnalysisTests(unittest.TestCase):
+    def setUp(self):
+        self.user = MongoUser(username="viewer", email="viewer@example.com").save()
+        self.job = AnalysisJob(
+            user=self.user, youtube_url="u", video_id="v1", comment_limit=150
+        ).save()
+        # The test database is dropped between tests, indexes included
+        AnalysisHistory.ensure_indexes()
+
+    def test_records_the_report_without_debug_info(self):
+        record_analysis(self.job, RESULT)
+        record_analysis(self.job, RESULT)
+
+        (entry,) = AnalysisHistory.objects(user=self.user)
+        self.assertEqual(entry.title, "Test video")
+        self.assertEqual(entry.total_comments_analyzed, 5)
+        self.assertNotIn("debug_info", entry.analysis)
+
+    def test_respects_the_history_preference(self):
+        MongoUserPreference(user=self.user, save_analysis_history=False).save()
+
+        record_analysis(self.job, RESULT)
+
+        self.assertEqual(AnalysisHistory.objects.count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
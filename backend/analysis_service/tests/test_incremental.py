@@ -0,0 +1,115 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from analysis_service.services import incremental
+from analysis_service.services.analyzer import AnalysisService
+from analysis_service.services.incremental import (
+    new_comments,
+    run_incremental_analysis_pipeline,
+)
+from analysis_service.services.llm_backends import OfflineBackend
+from analysis_service.services.reducer import StreamingAggregate
+from benchmarks.fakes import ReplayFetcher
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def comment(cid: str):
+    return {"cid": cid, "text": f"Comment {cid}: loved this video", "likes": "1"}
+
+
+def ids(comments):
+    return [c["cid"] for c in comments]
+
+
+class NewCommentsTests(unittest.TestCase):
+    def test_stops_at_a_run_of_known_ids(self):
+        stream = [comment(cid) for cid in ("pinned", "n1", "n2", "a", "b", "c", "x")]
+
+        found = new_comments(stream, {"pinned", "a", "b", "c"}, stop_after_known=3)
+
+        self.assertEqual(ids(found), ["n1", "n2"])
+
+    def test_resumes_after_a_backlog_cursor(self):
+        stream = [
+            comment(cid) for cid in ("n1", "a1", "a2", "a3", "b1", "b2", "o1", "o2")
+        ]
+        cursors = {"a3"}
+
+        found = new_comments(
+            stream, {"a1", "a2", "a3", "o1", "o2"}, 2, resume_after=cursors
+        )
+
+        self.assertEqual(ids(found), ["n1", "b1", "b2"])
+        self.assertEqual(cursors, set())
+
+
+class IncrementalBacklogTests(unittest.TestCase):
+    """More new comments than comment_limit: the rest is picked up later."""
+
+    def setUp(self):
+        self.saved = []
+        for patcher in (
+            mock.patch.object(incremental, "load_state", side_effect=self.load),
+            mock.patch.object(incremental, "save_state", side_effect=self.save),
+            mock.patch.object(incremental, "clear_backlog"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.state = SimpleNamespace(
+            id="state",
+            version=0,
+            seen_comment_ids=[f"old{i}" for i in range(5)],
+            backlog_cursors=[],
+            aggregate=StreamingAggregate().to_state(),
+            analyzed_count=5,
+            analysis={},
+            last_fetched_at=datetime(2026, 1, 1),
+        )
+
+    def load(self, video_id, model_name):
+        return self.state
+
+    def save(self, state, video_id, model_name, new_ids, aggregate, *rest):
+        result, fetched_at, backlog = rest
+        self.saved.append((new_ids, backlog))
+        state.seen_comment_ids = new_ids + state.seen_comment_ids
+        state.backlog_cursors = backlog
+        return True
+
+    def run_pipeline(self, cids, limit):
+        comments = [comment(cid) for cid in cids]
+        analyzer = AnalysisService(backend=OfflineBackend(), comment_cache=False)
+        return run_incremental_analysis_pipeline(
+            URL, limit, fetcher=ReplayFetcher({}, comments), analyzer=analyzer
+        )
+
+    def test_capped_run_leaves_a_cursor_and_the_next_run_resumes(self):
+        old = [f"old{i}" for i in range(5)]
+        new = [f"new{i}" for i in range(8)]
+
+        first = self.run_pipeline(new + old, limit=5)
+
+        self.assertEqual(self.saved[-1], (new[:5], ["new4"]))
+        self.assertTrue(first["analysis"]["incremental"]["truncated"])
+        self.assertTrue(first["analysis"]["incremental"]["backlog_pending"])
+
+        second = self.run_pipeline(["newer0", "newer1"] + new + old, limit=5)
+
+        self.assertEqual(self.saved[-1], (["newer0", "newer1"] + new[5:], []))
+        self.assertFalse(second["analysis"]["incremental"]["truncated"])
+        self.assertFalse(second["analysis"]["incremental"]["backlog_pending"])
+
+    def test_within_the_cap_nothing_is_left_behind(self):
+        new = [f"new{i}" for i in range(3)]
+
+        result = self.run_pipeline(new + [f"old{i}" for i in range(5)], limit=5)
+
+        self.assertEqual(self.saved[-1], (new, []))
+        self.assertFalse(result["analysis"]["incremental"]["truncated"])
+
+
+if __name__ == "__main__":
+    unittest.main()
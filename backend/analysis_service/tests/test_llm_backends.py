@@ -0,0 +1,192 @@
+import json
+import unittest
+
+from django.test import override_settings
+
+from analysis_service.services.analyzer import AnalysisService
+from analysis_service.services.llm_backends import (
+    GEMINI_MODEL,
+    OFFLINE_MODEL,
+    LLMBackend,
+    OfflineBackend,
+    OfflineBackendError,
+    configured_model_name,
+    estimate_cost,
+    get_llm_backend,
+    get_stage_backends,
+    stage_models,
+)
+from analysis_service.services.prompts import build_batch_prompt
+
+COMMENTS = [
+    {"text": "Amazing video, loved it"},
+    {"text": "Worst audio ever, terrible"},
+    {"text": "How did you film this?"},
+]
+
+
+class OfflineBackendTests(unittest.TestCase):
+    def test_same_prompt_gets_the_same_labels(self):
+        prompt = build_batch_prompt(COMMENTS)
+
+        first = json.loads(OfflineBackend().generate(prompt).text)
+        second = json.loads(OfflineBackend(seed=7).generate(prompt).text)
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            [label["sentiment"] for label in first["labels"]],
+            ["positive", "negative", "neutral"],
+        )
+        self.assertEqual(first["labels"][2]["intent"], "question")
+        self.assertEqual(
+            first["sentiment"], {"positive": 1, "neutral": 1, "negative": 1}
+        )
+
+    def test_tokens_are_estimated_from_utf8_bytes(self):
+        backend = OfflineBackend(bytes_per_token=4.0)
+
+        response = backend.generate("é" * 40, system_instruction="abcd" * 10)
+
+        # 80 bytes of prompt + 40 of system instruction
+        self.assertEqual(response.input_tokens, 30)
+        self.assertEqual(
+            response.output_tokens, len(response.text.encode("utf-8")) // 4
+        )
+
+    def test_injected_errors_repeat_for_a_seed(self):
+        def outcomes(seed):
+            backend = OfflineBackend(error_rate=0.5, seed=seed)
+            results = []
+            for _ in range(20):
+                try:
+                    backend.generate("[0] hello")
+                    results.append("ok")
+                except OfflineBackendError as e:
+                    self.assertEqual(e.code, 503)
+                    results.append("error")
+            return results
+
+        self.assertEqual(outcomes(3), outcomes(3))
+        self.assertIn("error", outcomes(3))
+        self.assertIn("ok", outcomes(3))
+
+    def test_bad_responses_are_unparseable(self):
+        backend = OfflineBackend(bad_response_rate=1.0)
+
+        with self.assertRaises(ValueError):
+            json.loads(backend.generate(build_batch_prompt(COMMENTS)).text)
+
+
+class BackendSelectionTests(unittest.TestCase):
+    @override_settings(ANALYSIS_LLM_BACKEND="offline", ANALYSIS_OFFLINE_LATENCY=0.5)
+    def test_offline_backend_is_configured_from_settings(self):
+        backend = get_llm_backend()
+
+        self.assertIsInstance(backend, OfflineBackend)
+        self.assertIsInstance(backend, LLMBackend)
+        self.assertEqual(backend.latency, 0.5)
+        self.assertFalse(backend.shared_quota)
+        self.assertEqual(configured_model_name(), OFFLINE_MODEL)
+
+    @override_settings(ANALYSIS_LLM_BACKEND="offline")
+    def test_offline_backend_serves_every_stage(self):
+        stages = get_stage_backends()
+
+        backends = {id(backend) for chain in stages.values() for backend in chain}
+        self.assertEqual(len(backends), 1)
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            get_llm_backend("carrier-pigeon")
+
+
+class NamedOfflineBackend(OfflineBackend):
+    """Offline backend posing as another model, optionally failing every call."""
+
+    def __init__(self, model_name, error=None):
+        super().__init__()
+        self.model_name = model_name
+        self.error = error
+        self.calls = 0
+
+    def generate(self, prompt, system_instruction=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return super().generate(prompt, system_instruction)
+
+
+class StageModelTests(unittest.TestCase):
+    @override_settings(
+        ANALYSIS_MAP_MODEL="gemini-2.0-flash-lite",
+        ANALYSIS_MAP_FALLBACK_MODELS=" gemini-2.0-flash, gemini-2.0-flash-lite,",
+        ANALYSIS_SUMMARY_MODEL="gemini-2.5-flash",
+        ANALYSIS_SUMMARY_FALLBACK_MODELS="",
+        ANALYSIS_LLM_BACKEND="gemini",
+    )
+    def test_models_per_stage_from_settings(self):
+        self.assertEqual(
+            stage_models("map"), ["gemini-2.0-flash-lite", "gemini-2.0-flash"]
+        )
+        self.assertEqual(stage_models("summary"), ["gemini-2.5-flash"])
+        # Cache keys change with either model
+        self.assertEqual(
+            configured_model_name(), "gemini-2.0-flash-lite+gemini-2.5-flash"
+        )
+
+    @override_settings(ANALYSIS_MAP_MODEL="", ANALYSIS_MAP_FALLBACK_MODELS="")
+    def test_stages_default_to_the_gemini_model(self):
+        self.assertEqual(stage_models("map"), [GEMINI_MODEL])
+
+    def test_cost_uses_the_models_own_prices(self):
+        self.assertAlmostEqual(
+            estimate_cost("gemini-2.5-flash", 1_000_000, 100_000), 0.30 + 0.25
+        )
+        self.assertEqual(estimate_cost(OFFLINE_MODEL, 10**6, 10**6), 0.0)
+        # Unknown models are priced like the default model
+        self.assertEqual(
+            estimate_cost("future-model", 1000, 1000),
+            estimate_cost(GEMINI_MODEL, 1000, 1000),
+        )
+
+
+class CascadeTests(unittest.TestCase):
+    def test_overloaded_primary_falls_back_within_the_attempt(self):
+        primary = NamedOfflineBackend(
+            "cascade-primary", OfflineBackendError("503 overloaded")
+        )
+        fallback = NamedOfflineBackend("cascade-fallback")
+        summary = NamedOfflineBackend("cascade-summary")
+        analyzer = AnalysisService(
+            stage_backends={"map": [primary, fallback], "summary": [summary]},
+            comment_cache=False,
+        )
+        analyzer.max_retries = 0
+        comments = [{"text": f"Comment {i}: loved it"} for i in range(20)]
+
+        result = analyzer.analyze({"title": "Test"}, comments)
+
+        stages = result["debug_info"]["stages"]
+        self.assertEqual(primary.calls, fallback.calls)
+        self.assertEqual(stages["map"]["cascade-primary"]["errors"], primary.calls)
+        self.assertEqual(stages["map"]["cascade-fallback"]["fallbacks"], fallback.calls)
+        self.assertEqual(stages["summary"]["cascade-summary"]["calls"], 1)
+        self.assertEqual(result["debug_info"]["coverage"]["analyzed"], 20)
+        self.assertEqual(analyzer.model_name, "cascade-primary+cascade-summary")
+
+    def test_other_errors_do_not_fall_back(self):
+        primary = NamedOfflineBackend("strict-primary", ValueError("bad request"))
+        fallback = NamedOfflineBackend("strict-fallback")
+        analyzer = AnalysisService(
+            stage_backends={"map": [primary, fallback], "summary": [fallback]},
+            comment_cache=False,
+        )
+
+        with self.assertRaises(ValueError):
+            analyzer._generate("[0] hello", stage="map")
+
+        self.assertEqual(fallback.calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+
+from analysis_service.services.analyzer import AnalysisService
+from analysis_service.services.llm_backends import OfflineBackend
+from benchmarks.fakes import synthetic_comments
+
+
+def service(max_concurrency: int) -> AnalysisService:
+    return AnalysisService(
+        backend=OfflineBackend(), comment_cache=False, max_concurrency=max_concurrency
+    )
+
+
+class MapBatchesTests(unittest.TestCase):
+    def test_results_keep_batch_order_when_batches_finish_out_of_order(self):
+        analyzer = service(4)
+        batches = [[{"text": str(i)}] for i in range(4)]
+
+        def analyze_batch(batch, usage=None):
+            # Later batches finish first
+            index = int(batch[0]["text"])
+            time.sleep(0.02 * (4 - index))
+            return {"index": index}
+
+        analyzer._analyze_batch = analyze_batch
+
+        results = analyzer._map_batches(batches)
+
+        self.assertEqual(results, [{"index": i} for i in range(4)])
+
+    def test_runs_up_to_max_concurrency_batches_at_once(self):
+        analyzer = service(3)
+        lock = threading.Lock()
+        running, peak = [0], [0]
+
+        def analyze_batch(batch, usage=None):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return {}
+
+        analyzer._analyze_batch = analyze_batch
+
+        analyzer._map_batches([[{"text": "x"}] for _ in range(9)])
+
+        self.assertEqual(peak[0], 3)
+
+    def test_failed_batch_becomes_empty_and_progress_counts_every_batch(self):
+        analyzer = service(2)
+        progress = []
+
+        def analyze_batch(batch, usage=None):
+            if batch[0]["text"] == "bad":
+                raise RuntimeError("boom")
+            return {"sentiment_breakdown": {"positive": 1}}
+
+        analyzer._analyze_batch = analyze_batch
+
+        results = analyzer._map_batches(
+            [[{"text": "ok"}], [{"text": "bad"}], [{"text": "ok"}]],
+            on_progress=lambda done, total, totals: progress.append((done, total)),
+        )
+
+        self.assertEqual(results[1], {})
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+
+
+class ConcurrentAnalyzeTests(unittest.TestCase):
+    def test_concurrency_does_not_change_the_result_or_counters(self):
+        comments = synthetic_comments(300)
+
+        serial = service(1).analyze({"title": "Test"}, comments)
+        concurrent = service(4).analyze({"title": "Test"}, comments)
+
+        for key in ("sentiment_breakdown", "intents", "toxic_count"):
+            self.assertEqual(concurrent[key], serial[key])
+        for key in ("api_calls", "input_tokens", "output_tokens", "coverage"):
+            self.assertEqual(concurrent["debug_info"][key], serial["debug_info"][key])
+        self.assertEqual(concurrent["debug_info"]["max_concurrency"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
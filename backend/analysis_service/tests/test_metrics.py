@@ -0,0 +1,82 @@
+import unittest
+
+from django.test import RequestFactory, override_settings
+from prometheus_client import REGISTRY
+
+from analysis_service import views
+from analysis_service.services import metrics
+from analysis_service.services.analyzer import AnalysisService
+from analysis_service.services.llm_backends import OfflineBackend
+from benchmarks.fakes import synthetic_comments
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TimedTests(unittest.TestCase):
+    def test_observes_the_stage_even_when_it_fails(self):
+        before = sample("getsentimate_stage_seconds_count", stage="test_stage")
+
+        with self.assertRaises(RuntimeError):
+            with metrics.timed("test_stage"):
+                raise RuntimeError("boom")
+
+        self.assertEqual(
+            sample("getsentimate_stage_seconds_count", stage="test_stage"), before + 1
+        )
+
+
+class AnalysisMetricsTests(unittest.TestCase):
+    def test_tokens_and_calls_are_counted_per_stage(self):
+        map_input = {"stage": "map", "direction": "input"}
+        tokens_before = sample("getsentimate_llm_tokens_total", **map_input)
+        calls_before = sample("getsentimate_llm_api_calls_total", stage="summary")
+        analyzer = AnalysisService(backend=OfflineBackend(), comment_cache=False)
+
+        result = analyzer.analyze({"title": "Test"}, synthetic_comments(200))
+
+        map_row = result["debug_info"]["stages"]["map"]["offline-v1"]
+        self.assertEqual(
+            sample("getsentimate_llm_tokens_total", **map_input) - tokens_before,
+            map_row["input_tokens"],
+        )
+        self.assertEqual(
+            sample("getsentimate_llm_api_calls_total", stage="summary") - calls_before,
+            1,
+        )
+
+    def test_stage_breakdown_adds_up_to_the_totals(self):
+        analyzer = AnalysisService(backend=OfflineBackend(), comment_cache=False)
+
+        result = analyzer.analyze({"title": "Test"}, synthetic_comments(200))
+
+        debug = result["debug_info"]
+        rows = [row for models in debug["stages"].values() for row in models.values()]
+        self.assertEqual(set(debug["stages"]), {"map", "summary"})
+        self.assertEqual(sum(row["calls"] for row in rows), debug["api_calls"])
+        self.assertEqual(
+            sum(row["input_tokens"] for row in rows), debug["input_tokens"]
+        )
+        self.assertEqual(
+            sum(row["output_tokens"] for row in rows), debug["output_tokens"]
+        )
+
+
+class MetricsEndpointTests(unittest.TestCase):
+    @override_settings(METRICS_TOKEN="secret")
+    def test_requires_the_bearer_token(self):
+        factory = RequestFactory()
+
+        denied = views.metrics(factory.get("/api/metrics"))
+        allowed = views.metrics(
+            factory.get("/api/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        )
+
+        self.assertEqual(denied.status_code, 401)
+        self.assertEqual(allowed.status_code, 200)
+        self.assertIn(b"getsentimate_stage_seconds", allowed.content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from analysis_service.services.analyzer import AnalysisService
+from analysis_service.services.llm_backends import OfflineBackend
+from analysis_service.services.pipeline import run_streaming_analysis_pipeline
+from benchmarks.fakes import ReplayFetcher, synthetic_comments
+
+METADATA = {"video_id": "test", "title": "Test video"}
+
+
+class StreamingProgressTests(unittest.TestCase):
+    def test_summarizing_is_reported_before_the_summary_call(self):
+        stages = []
+        analyzer = AnalysisService(backend=OfflineBackend(), comment_cache=False)
+        summarize = analyzer._generate_executive_summary
+
+        def recorded_summary(*args, **kwargs):
+            stages.append("summary call")
+            return summarize(*args, **kwargs)
+
+        analyzer._generate_executive_summary = recorded_summary
+        run_streaming_analysis_pipeline(
+            "https://www.youtube.com/watch?v=test",
+            200,
+            progress=lambda stage, percent, data=None: stages.append(stage),
+            fetcher=ReplayFetcher(METADATA, synthetic_comments(200)),
+            analyzer=analyzer,
+        )
+
+        self.assertEqual(stages[-2:], ["summarizing", "summary call"])
+        self.assertEqual(stages.count("summarizing"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from analysis_service.services.analyzer import AnalysisService
+from analysis_service.services.llm_backends import OfflineBackend
+from analysis_service.services.prefilter import LocalSentimentClassifier, tokenize
+
+
+def texts(pairs):
+    return [comment["text"] for comment, _ in pairs]
+
+
+class LocalSentimentClassifierTests(unittest.TestCase):
+    def setUp(self):
+        self.classifier = LocalSentimentClassifier(threshold=0.85)
+
+    def classify(self, *texts):
+        return self.classifier.classify([{"text": text} for text in texts])
+
+    def test_confident_comments_are_labelled_locally(self):
+        local, remaining = self.classify(
+            "Amazing video, loved it ❤️", "Worst clickbait ever, garbage"
+        )
+
+        self.assertEqual(remaining, [])
+        self.assertEqual(
+            [label["sentiment"] for _, label in local], ["positive", "negative"]
+        )
+        self.assertEqual(
+            [label["intent"] for _, label in local], ["praise", "complaint"]
+        )
+
+    def test_ambiguous_comments_go_to_the_llm(self):
+        local, remaining = self.classify(
+            "Not great tbh",
+            "Loved it but the audio was awful",
+            "Great video, how did you edit this?",
+            "Great video",
+            "You are stupid, amazing",
+        )
+
+        self.assertEqual(local, [])
+        self.assertEqual(len(remaining), 5)
+
+    def test_long_comments_are_never_labelled_locally(self):
+        long_text = "amazing " * 13
+
+        local, remaining = self.classify(long_text)
+
+        self.assertEqual((local, len(remaining)), ([], 1))
+
+    def test_engagement_noise_is_neutral(self):
+        local, remaining = self.classify("First!", "who's here")
+
+        self.assertEqual(remaining, [])
+        self.assertEqual({label["sentiment"] for _, label in local}, {"neutral"})
+
+    def test_threshold_controls_how_much_stays_local(self):
+        comments = [{"text": "Good video"}, {"text": "Amazing masterpiece, loved it"}]
+
+        strict, _ = LocalSentimentClassifier(threshold=0.85).classify(comments)
+        loose, _ = LocalSentimentClassifier(threshold=0.5).classify(comments)
+
+        self.assertEqual(texts(strict), ["Amazing masterpiece, loved it"])
+        self.assertEqual(texts(loose), ["Good video", "Amazing masterpiece, loved it"])
+
+    def test_emoji_variation_selectors_are_dropped(self):
+        self.assertEqual(tokenize("❤️🔥"), ["❤", "🔥"])
+
+
+class PrefilterRoutingTests(unittest.TestCase):
+    def test_locally_labelled_comments_skip_the_llm(self):
+        comments = [{"text": "Amazing video, loved it ❤️"}] * 30 + [
+            {"text": "Why is the audio so quiet in the second half?"}
+        ] * 5
+        analyzer = AnalysisService(
+            backend=OfflineBackend(),
+            comment_cache=False,
+            prefilter=LocalSentimentClassifier(threshold=0.85),
+        )
+
+        debug = analyzer.analyze({"title": "Test"}, comments)["debug_info"]
+
+        self.assertEqual(debug["routing"]["local"], 30)
+        self.assertEqual(debug["routing"]["llm"], 5)
+        self.assertEqual(debug["coverage"]["analyzed"], 35)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from analysis_service.models import LLMCallSlot
+from analysis_service.services import analyzer, rate_limiter
+from analysis_service.services.llm_backends import (
+    LLMBackend,
+    LLMResponse,
+    OfflineBackendError,
+)
+from analysis_service.services.rate_limiter import (
+    RateLimitTimeout,
+    SharedCallSlots,
+    SharedRateLimiter,
+)
+from analysis_service.services.resilience import CircuitBreaker, CircuitOpenError
+
+
+class QuotaBackend(LLMBackend):
+    """Shared-quota backend answering from a list, one entry per call."""
+
+    model_name = "quota-model"
+    shared_quota = True
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+
+    def generate(self, prompt, system_instruction=None):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return LLMResponse(outcome, input_tokens=10, output_tokens=5)
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.calls = []
+
+    def acquire(self, tokens):
+        self.calls.append(("acquire", tokens))
+        return 0.0
+
+    def settle(self, reserved, used):
+        self.calls.append(("settle", reserved, used))
+
+    def release(self, reserved):
+        self.calls.append(("release", reserved))
+
+
+class GenerateReservationTests(unittest.TestCase):
+    def setUp(self):
+        self.limiter = RecordingLimiter()
+        self.breaker = CircuitBreaker(failure_threshold=5, reset_timeout=60.0)
+        self.slots = SharedCallSlots(limit=1, lease_seconds=60, max_wait=0.0)
+        for name, value in (
+            ("get_rate_limiter", self.limiter),
+            ("get_circuit_breaker", self.breaker),
+            ("get_call_slots", self.slots),
+        ):
+            patcher = mock.patch.object(analyzer, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def service(self, outcomes):
+        service = analyzer.AnalysisService(
+            backend=QuotaBackend(outcomes), comment_cache=False
+        )
+        service.backoff_base = 0.0
+        return service
+
+    def test_open_circuit_releases_the_reservation(self):
+        self.breaker._state = CircuitBreaker.OPEN
+        self.breaker._opened_at = time.monotonic()
+        service = self.service([])
+        service.max_retries = 0
+
+        with self.assertRaises(CircuitOpenError):
+            service._generate("prompt")
+
+        (_, reserved), release = self.limiter.calls
+        self.assertEqual(release, ("release", reserved))
+
+    def test_failed_call_refunds_its_tokens_before_the_retry(self):
+        service = self.service([OfflineBackendError("overloaded"), "{}"])
+
+        service._generate("prompt")
+
+        (_, reserved) = self.limiter.calls[0]
+        self.assertEqual(
+            self.limiter.calls,
+            [
+                ("acquire", reserved),
+                ("settle", reserved, 0),
+                ("acquire", reserved),
+                ("settle", reserved, 15),
+            ],
+        )
+
+    def test_reservation_counts_utf8_bytes(self):
+        service = self.service(["{}"])
+        service.batch_planner.bytes_per_token = 4.0
+
+        service._generate("é" * 400, system_instruction="abcd" * 10)
+
+        # 800 bytes of prompt + 40 of instruction, not 440 characters
+        self.assertEqual(self.limiter.calls[0], ("acquire", 210))
+
+    def test_call_slot_is_released_after_the_call(self):
+        service = self.service([OfflineBackendError("overloaded"), "{}"])
+
+        service._generate("prompt")
+
+        self.assertEqual(LLMCallSlot.objects.count(), 0)
+
+    def test_busy_call_slots_release_the_reservation(self):
+        held = self.slots.acquire()
+        service = self.service(["{}"])
+        service.max_retries = 0
+
+        with self.assertRaises(RateLimitTimeout):
+            service._generate("prompt")
+
+        (_, reserved), release = self.limiter.calls
+        self.assertEqual(release, ("release", reserved))
+        self.slots.release(held)
+
+
+class SharedCallSlotsTests(unittest.TestCase):
+    def test_caps_calls_across_holders(self):
+        slots = SharedCallSlots(limit=2, lease_seconds=60, max_wait=0.0)
+        # Another worker process: same collection, own object
+        other = SharedCallSlots(limit=2, lease_seconds=60, max_wait=0.0)
+        first, second = slots.acquire(), other.acquire()
+
+        self.assertNotEqual(first[0], second[0])
+        with self.assertRaises(RateLimitTimeout):
+            slots.acquire()
+
+        other.release(second)
+        self.assertEqual(slots.acquire()[0], second[0])
+
+    def test_waits_for_a_slot_to_free_up(self):
+        slots = SharedCallSlots(limit=1, lease_seconds=60, max_wait=5.0)
+        held = slots.acquire()
+
+        with mock.patch.object(
+            rate_limiter.time, "sleep", side_effect=lambda _: slots.release(held)
+        ):
+            self.assertIsNotNone(slots.acquire())
+
+    def test_expired_slot_is_taken_over(self):
+        slots = SharedCallSlots(limit=1, lease_seconds=60, max_wait=0.0)
+        dead = slots.acquire()
+        LLMCallSlot.objects(key=dead[0]).update_one(
+            set__expires_at=datetime.utcnow() - timedelta(seconds=1)
+        )
+
+        taken = slots.acquire()
+        # The dead call's late release must not free the new holder's slot
+        slots.release(dead)
+
+        self.assertEqual(LLMCallSlot.objects(key=taken[0]).first().holder, taken[1])
+
+    def test_calls_go_through_when_mongo_is_down(self):
+        slots = SharedCallSlots(limit=1, lease_seconds=60, max_wait=0.0)
+        with mock.patch.object(rate_limiter, "LLMCallSlot") as model:
+            model.objects.side_effect = RuntimeError("no server")
+            self.assertIsNone(slots.acquire())
+
+
+class ReleaseTests(unittest.TestCase):
+    def test_release_gives_back_one_request_and_the_tokens(self):
+        limiter = SharedRateLimiter("model", rpm=60, tpm=1000, max_wait=1.0)
+        with mock.patch.object(rate_limiter, "LLMRateBucket") as bucket:
+            limiter.release(2500)
+
+        bucket.objects.return_value.update_one.assert_called_once_with(
+            inc__requests=1, inc__tokens=1000, inc__version=1
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
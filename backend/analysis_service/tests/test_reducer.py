@@ -0,0 +1,88 @@
+import unittest
+
+from analysis_service.services.reducer import (
+    build_summary_digest,
+    canonicalize_topic,
+    cluster_points,
+    top_topics,
+)
+
+
+class CanonicalizeTopicTests(unittest.TestCase):
+    def test_case_punctuation_articles_and_plurals_share_a_key(self):
+        self.assertEqual(
+            {canonicalize_topic(t) for t in ("The Edits!", "edits", "an edit")},
+            {"edit"},
+        )
+
+    def test_double_s_words_are_not_singularized(self):
+        self.assertEqual(canonicalize_topic("Boss Fights"), "boss fight")
+
+
+class TopTopicsTests(unittest.TestCase):
+    def test_ranks_canonical_topics_by_count(self):
+        topics = ["Editing", "editing", "The editing", "Music", "music", "Intro"]
+
+        self.assertEqual(
+            top_topics(topics, 2),
+            [{"topic": "Editing", "count": 3}, {"topic": "Music", "count": 2}],
+        )
+
+    def test_reports_the_most_common_spelling(self):
+        topics = ["Audio Quality", "audio quality", "Audio Quality", "", None]
+
+        self.assertEqual(
+            top_topics(topics, 5), [{"topic": "Audio Quality", "count": 3}]
+        )
+
+
+class ClusterPointsTests(unittest.TestCase):
+    def test_similar_points_are_counted_together(self):
+        points = [
+            "The audio is too quiet",
+            "audio too quiet",
+            "Audio is way too quiet",
+            "Loved the ending",
+            "The ending was loved",
+        ]
+
+        clusters = cluster_points(points, k=5)
+
+        self.assertEqual(
+            clusters,
+            [
+                {"point": "The audio is too quiet", "count": 3},
+                {"point": "Loved the ending", "count": 2},
+            ],
+        )
+
+    def test_keeps_only_the_k_largest_clusters(self):
+        points = ["great music"] * 3 + ["bad lighting"] * 2 + ["short intro"]
+
+        self.assertEqual(
+            [c["point"] for c in cluster_points(points, k=2)],
+            ["great music", "bad lighting"],
+        )
+
+
+class SummaryDigestTests(unittest.TestCase):
+    def test_digest_size_does_not_grow_with_the_aggregate(self):
+        agg = {
+            "sentiment": {"positive": 600, "neutral": 300, "negative": 100},
+            "intents": {"praise": 500, "complaint": 80, "question": 20},
+            "toxic_count": 4,
+            "topics": [f"topic {i % 40}" for i in range(1000)],
+            "notable_points": [f"point number {i}" for i in range(1000)],
+        }
+
+        digest = build_summary_digest(agg, top_k_topics=15, top_k_points=10)
+
+        self.assertEqual(digest["total_comments"], 1000)
+        self.assertEqual(digest["toxic_count"], 4)
+        self.assertEqual(len(digest["top_topics"]), 15)
+        self.assertLessEqual(len(digest["notable_points"]), 10)
+        self.assertEqual(digest["top_topics"][0]["count"], 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
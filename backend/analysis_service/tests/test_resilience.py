@@ -0,0 +1,83 @@
+import unittest
+from unittest import mock
+
+from analysis_service.services import analyzer
+from analysis_service.services.llm_backends import LLMBackend, LLMResponse
+from analysis_service.services.resilience import CircuitBreaker, CircuitOpenError
+
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    return breaker
+
+
+class ScriptedBackend(LLMBackend):
+    """Raises or answers from a list, one entry per call."""
+
+    model_name = "test-model"
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+
+    def generate(self, prompt, system_instruction=None):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return LLMResponse(outcome, input_tokens=10, output_tokens=5)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_half_open_allows_a_single_trial(self):
+        breaker = half_open_breaker()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+        breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_released_trial_lets_the_next_call_in(self):
+        breaker = half_open_breaker()
+        breaker.before_call()
+
+        breaker.release_trial()
+
+        breaker.before_call()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+        breaker._state = CircuitBreaker.HALF_OPEN
+        breaker.before_call()
+
+        breaker.record_failure()
+        breaker.release_trial()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+
+class GenerateTrialTests(unittest.TestCase):
+    def setUp(self):
+        self.breaker = half_open_breaker()
+        patcher = mock.patch.object(
+            analyzer, "get_circuit_breaker", return_value=self.breaker
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_non_transient_error_releases_the_trial(self):
+        backend = ScriptedBackend([ValueError("bad request"), '{"ok": true}'])
+        service = analyzer.AnalysisService(backend=backend, comment_cache=False)
+
+        with self.assertRaises(ValueError):
+            service._generate("prompt")
+        response, _, _ = service._generate("prompt")
+
+        self.assertEqual(response.text, '{"ok": true}')
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import override_settings
+
+from accounts.models import MongoUser
+from analysis_service.models import AnalysisJob, CachedAnalysisResult
+from analysis_service.services import jobs, result_cache
+from analysis_service.services.result_cache import get_cached_result, store_result
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+VIDEO_ID = "dQw4w9WgXcQ"
+RESULT = {
+    "metadata": {"video_id": VIDEO_ID, "title": "Test video"},
+    "analysis": {"total_comments_analyzed": 150},
+    "sample_comments": [{"text": "Great video"}],
+}
+
+
+class ResultCacheTests(unittest.TestCase):
+    def test_miss_then_hit(self):
+        self.assertIsNone(get_cached_result(VIDEO_ID, 150))
+
+        store_result(VIDEO_ID, 150, RESULT)
+        cached, age = get_cached_result(VIDEO_ID, 150)
+
+        self.assertEqual(cached, RESULT)
+        self.assertEqual(age, 0)
+
+    def test_key_includes_the_comment_limit_and_model(self):
+        store_result(VIDEO_ID, 150, RESULT)
+
+        self.assertIsNone(get_cached_result(VIDEO_ID, 300))
+        with mock.patch.object(
+            result_cache, "configured_model_name", return_value="other-model"
+        ):
+            self.assertIsNone(get_cached_result(VIDEO_ID, 150))
+
+    @override_settings(ANALYSIS_RESULT_CACHE_TTL=60)
+    def test_entries_older_than_the_ttl_are_misses(self):
+        store_result(VIDEO_ID, 150, RESULT)
+        CachedAnalysisResult.objects.update(
+            set__created_at=datetime.utcnow() - timedelta(seconds=61)
+        )
+
+        self.assertIsNone(get_cached_result(VIDEO_ID, 150))
+
+    @override_settings(ANALYSIS_RESULT_CACHE_ENABLED=False)
+    def test_disabled_cache_neither_stores_nor_serves(self):
+        store_result(VIDEO_ID, 150, RESULT)
+
+        self.assertEqual(CachedAnalysisResult.objects.count(), 0)
+        self.assertIsNone(get_cached_result(VIDEO_ID, 150))
+
+
+class SubmitFromCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.user = MongoUser(username="viewer", email="viewer@example.com").save()
+        patches = [
+            mock.patch.object(jobs, "consume_credits", return_value=9),
+            mock.patch.object(jobs, "reserve_credits", return_value=9),
+            mock.patch.object(jobs, "record_analysis"),
+            mock.patch.object(jobs, "_get_scheduler"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_cache_hit_completes_the_job_immediately(self):
+        store_result(VIDEO_ID, 150, RESULT)
+
+        job = jobs.submit_analysis_job(self.user, URL, 150)
+
+        self.assertEqual(job.status, AnalysisJob.STATUS_COMPLETED)
+        self.assertEqual(job.result["cache"], {"status": "hit", "age_seconds": 0})
+        # Still charged
+        jobs.consume_credits.assert_called_once()
+        jobs._get_scheduler.return_value.wake.assert_not_called()
+
+    def test_force_refresh_queues_a_new_analysis(self):
+        store_result(VIDEO_ID, 150, RESULT)
+
+        job = jobs.submit_analysis_job(self.user, URL, 150, force_refresh=True)
+
+        self.assertEqual(job.status, AnalysisJob.STATUS_QUEUED)
+        jobs._get_scheduler.return_value.wake.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from datetime import datetime, timezone
+
+from analysis_service.services.sampling import (
+    StratifiedSampler,
+    _estimate_total,
+    comment_age_days,
+    parse_like_count,
+    scale_up,
+    stratum_of,
+)
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def label(sentiment="positive", intent="praise", toxic=False):
+    return {"sentiment": sentiment, "intent": intent, "toxic": toxic}
+
+
+class ParsingTests(unittest.TestCase):
+    def test_like_counts(self):
+        for value, expected in (
+            (7, 7),
+            ("17", 17),
+            ("1.2K", 1200),
+            ("3M", 3_000_000),
+            ("1,024", 1024),
+            ("", 0),
+            (None, 0),
+        ):
+            self.assertEqual(parse_like_count(value), expected, value)
+
+    def test_comment_ages(self):
+        self.assertEqual(comment_age_days("3 weeks ago (edited)"), 21)
+        self.assertAlmostEqual(comment_age_days("12 hours ago"), 0.5)
+        self.assertEqual(comment_age_days("2024-05-30T00:00:00Z", NOW), 2)
+        self.assertIsNone(comment_age_days("yesterday-ish"))
+
+    def test_strata_combine_likes_and_age(self):
+        self.assertEqual(stratum_of({"likes": "0", "time": "2 hours ago"}), "l0a0")
+        self.assertEqual(stratum_of({"likes": "1.2K", "time": "2 years ago"}), "l3a3")
+        # Unknown ages count as the oldest bucket
+        self.assertEqual(stratum_of({"likes": 12}), "l2a3")
+
+
+class StratifiedSamplerTests(unittest.TestCase):
+    def stream(self):
+        # 900 old unliked comments, 100 fresh popular ones
+        old = [{"cid": f"o{i}", "likes": 0, "time": "2 years ago"} for i in range(900)]
+        new = [{"cid": f"n{i}", "likes": 500, "time": "1 hour ago"} for i in range(100)]
+        return old + new
+
+    def test_reservoirs_are_bounded_but_population_is_exact(self):
+        sampler = StratifiedSampler(budget=50, seed=1).consume(self.stream())
+
+        self.assertEqual(sampler.population, {"l0a3": 900, "l3a0": 100})
+        self.assertEqual(sampler.scanned, 1000)
+        self.assertTrue(all(len(r) <= 50 for r in sampler._reservoirs.values()))
+
+    def test_budget_is_allocated_proportionally(self):
+        sampler = StratifiedSampler(budget=50, seed=1).consume(self.stream())
+
+        self.assertEqual(sampler.allocation(), {"l0a3": 45, "l3a0": 5})
+        picked = sampler.sample()
+        self.assertEqual(len(picked), 50)
+        self.assertEqual(sum(1 for stratum, _ in picked if stratum == "l3a0"), 5)
+
+    def test_small_strata_get_at_least_two(self):
+        stream = self.stream()[:900] + [{"likes": 500, "time": "1 hour ago"}] * 3
+        sampler = StratifiedSampler(budget=50, seed=1).consume(stream)
+
+        self.assertEqual(sampler.allocation()["l3a0"], 2)
+
+    def test_everything_is_kept_below_the_budget(self):
+        sampler = StratifiedSampler(budget=5000, seed=1).consume(self.stream())
+
+        self.assertEqual(sampler.allocation(), sampler.population)
+        self.assertEqual(len(sampler.sample()), 1000)
+
+
+class EstimateTests(unittest.TestCase):
+    def test_interval_of_a_single_stratum(self):
+        # 30 of 100 sampled from 1000: 300 +- 1.96 * sqrt(1000^2 * 0.9 * .21 / 99)
+        estimate = _estimate_total({"s": 1000}, {"s": 30}, {"s": 100})
+
+        self.assertEqual(estimate, {"estimate": 300, "ci_low": 214, "ci_high": 386})
+
+    def test_a_census_has_no_uncertainty(self):
+        estimate = _estimate_total({"s": 40}, {"s": 10}, {"s": 40})
+
+        self.assertEqual(estimate, {"estimate": 10, "ci_low": 10, "ci_high": 10})
+
+    def test_strata_are_weighted_by_population(self):
+        estimate = _estimate_total(
+            {"big": 900, "small": 100},
+            {"big": 9, "small": 10},
+            {"big": 45, "small": 10},
+        )
+
+        # 900 * 9/45 + 100 * 10/10
+        self.assertEqual(estimate["estimate"], 280)
+
+    def test_scale_up_skips_unlabelled_comments_and_empty_strata(self):
+        labelled = [("a", label())] * 3 + [("a", label("negative", "complaint", True))]
+        labelled += [("a", None), ("b", None)]
+
+        estimates = scale_up({"a": 400, "b": 600}, labelled)
+
+        self.assertEqual(estimates["population_covered"], 400)
+        self.assertEqual(estimates["sentiment"]["positive"]["estimate"], 300)
+        self.assertEqual(estimates["sentiment"]["negative"]["estimate"], 100)
+        self.assertEqual(estimates["toxic_count"]["estimate"], 100)
+        self.assertEqual(estimates["intents"]["question"]["estimate"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
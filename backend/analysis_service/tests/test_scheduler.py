@@ -0,0 +1,127 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from accounts.models import MongoUser
+from analysis_service.models import AnalysisJob
+from analysis_service.services.scheduler import (
+    PRIORITY_FREE,
+    PRIORITY_PAID,
+    JobScheduler,
+    claim_job,
+    fair_order,
+)
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+def row(job_id, user, priority=PRIORITY_FREE, age_seconds=0):
+    return {
+        "_id": job_id,
+        "user": user,
+        "priority": priority,
+        "created_at": NOW - timedelta(seconds=age_seconds),
+    }
+
+
+def ids(rows):
+    return [r["_id"] for r in rows]
+
+
+class FairOrderTests(unittest.TestCase):
+    def order(self, queued, running=None, cap=2, slots=10, aging=300):
+        return ids(fair_order(queued, running or {}, cap, slots, aging, now=NOW))
+
+    def test_round_robin_across_users_oldest_first(self):
+        queued = [
+            row("a1", "alice", age_seconds=50),
+            row("a2", "alice", age_seconds=40),
+            row("a3", "alice", age_seconds=30),
+            row("b1", "bob", age_seconds=20),
+            row("c1", "carol", age_seconds=10),
+        ]
+
+        self.assertEqual(self.order(queued, cap=5), ["a1", "b1", "c1", "a2", "a3"])
+
+    def test_paid_jobs_go_first(self):
+        queued = [
+            row("free", "alice", age_seconds=60),
+            row("paid", "bob", PRIORITY_PAID, age_seconds=10),
+        ]
+
+        self.assertEqual(self.order(queued), ["paid", "free"])
+
+    def test_per_user_cap_counts_running_jobs(self):
+        queued = [row(f"a{i}", "alice", age_seconds=10 - i) for i in range(3)]
+        queued.append(row("b1", "bob"))
+
+        self.assertEqual(self.order(queued, running={"alice": 1}), ["a0", "b1"])
+
+    def test_slots_limit_the_pick(self):
+        queued = [row(f"u{i}", f"user{i}", age_seconds=10 - i) for i in range(5)]
+
+        self.assertEqual(self.order(queued, slots=2), ["u0", "u1"])
+
+    def test_aged_free_jobs_catch_up_with_paid_ones(self):
+        queued = [
+            row("paid", "bob", PRIORITY_PAID, age_seconds=10),
+            row("starved", "alice", age_seconds=301),
+        ]
+
+        # Same effective level: oldest first
+        self.assertEqual(self.order(queued, slots=1), ["starved"])
+
+
+class DispatchTests(unittest.TestCase):
+    def setUp(self):
+        self.users = [
+            MongoUser(username=name, email=f"{name}@example.com").save()
+            for name in ("alice", "bob")
+        ]
+        self.executor = mock.Mock()
+        self.scheduler = JobScheduler(self.executor, capacity=3, run_job=mock.Mock())
+        self.scheduler.per_user_cap = 2
+
+    def job(self, user, status=AnalysisJob.STATUS_QUEUED):
+        return AnalysisJob(
+            user=user, youtube_url="u", video_id="v", status=status
+        ).save()
+
+    def test_claims_fairly_within_capacity_and_per_user_cap(self):
+        alice, bob = self.users
+        self.job(alice, AnalysisJob.STATUS_RUNNING)
+        for _ in range(3):
+            self.job(alice)
+        bob_job = self.job(bob)
+
+        started = self.scheduler.dispatch()
+
+        self.assertEqual(started, 2)
+        claimed = [call.args[1] for call in self.executor.submit.call_args_list]
+        self.assertEqual({job.user.id for job in claimed}, {alice.id, bob.id})
+        self.assertIn(bob_job.id, [job.id for job in claimed])
+        self.assertEqual(self.scheduler.free_slots(), 1)
+        self.assertEqual(
+            AnalysisJob.objects(user=alice, status=AnalysisJob.STATUS_RUNNING).count(),
+            2,
+        )
+
+    def test_finished_job_frees_its_slot(self):
+        self.job(self.users[0])
+        self.scheduler.dispatch()
+        ((run, job),) = [call.args for call in self.executor.submit.call_args_list]
+
+        run(job)
+
+        self.assertEqual(self.scheduler.free_slots(), 3)
+        self.scheduler.run_job.assert_called_once_with(job)
+
+    def test_a_job_is_claimed_once(self):
+        job = self.job(self.users[0])
+
+        self.assertIsNotNone(claim_job(job.id))
+        self.assertIsNone(claim_job(job.id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, RequestFactory
+
+from analysis_service import views
+from analysis_service.services import exports
+from analysis_service.services.exports import compact_row
+
+ROW = compact_row(
+    {"cid": "c1", "author": "a", "likes": 3, "text": "great video"},
+    {"sentiment": "positive", "intent": "praise", "toxic": False, "topics": []},
+)
+
+
+class JobEventsServerModeTests(unittest.TestCase):
+    def test_wsgi_answers_not_implemented(self):
+        request = RequestFactory().get("/api/analyze/job-1/events")
+
+        response = async_to_sync(views.analysis_job_events)(request, "job-1")
+
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(json.loads(response.content)["poll"], "/api/analyze/job-1")
+
+    def test_asgi_requires_authentication(self):
+        request = AsyncRequestFactory().get("/api/analyze/job-1/events")
+        with mock.patch.object(views, "_stream_user", return_value=None):
+            response = async_to_sync(views.analysis_job_events)(request, "job-1")
+
+        self.assertEqual(response.status_code, 401)
+
+
+class LabelExportStreamingTests(unittest.TestCase):
+    """Each chunk reaches the client before the next one is queried."""
+
+    def setUp(self):
+        self.events = []
+        job = SimpleNamespace(
+            status="completed", result={"labels": {"job_id": "job-1"}}, video_id="v1"
+        )
+        for patcher in (
+            mock.patch.object(views, "_stream_user", return_value=object()),
+            mock.patch.object(views, "_load_export_job", return_value=job),
+            mock.patch.object(exports, "_load_chunk", side_effect=self.load_chunk),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def load_chunk(self, job_id, after_seq):
+        self.events.append(f"query after {after_seq}")
+        if after_seq >= 1:
+            return None
+        return {"seq": after_seq + 1, "rows": [ROW]}
+
+    def assertStreamed(self):
+        self.assertEqual(
+            self.events,
+            ["query after -1", "sent", "query after 0", "sent", "query after 1"],
+        )
+
+    def test_wsgi_streams_a_sync_iterator(self):
+        request = RequestFactory().get("/api/analyze/job-1/export")
+
+        response = async_to_sync(views.analysis_job_export)(request, "job-1")
+
+        self.assertFalse(response.is_async)
+        for part in response.streaming_content:
+            self.assertIn(b"great video", part)
+            self.events.append("sent")
+        self.assertStreamed()
+
+    def test_asgi_streams_an_async_iterator(self):
+        request = AsyncRequestFactory().get("/api/analyze/job-1/export")
+
+        async def consume():
+            response = await views.analysis_job_export(request, "job-1")
+            self.assertTrue(response.is_async)
+            async for part in response.streaming_content:
+                self.assertIn(b"great video", part)
+                self.events.append("sent")
+
+        async_to_sync(consume)()
+        self.assertStreamed()
@@ -3,4 +3,34 @@ from . import views
 
 urlpatterns = [
     path("analyze", views.analyze_video, name="analyze_video"),
+    path("analyze/batch", views.analyze_batch, name="analyze_batch"),
+    path(
+        "analyze/batch/<str:batch_id>",
+        views.analysis_batch_status,
+        name="analysis_batch_status",
+    ),
+    path("analyze/<str:job_id>", views.analysis_job_status, name="analysis_job_status"),
+    path(
+        "analyze/<str:job_id>/events",
+        views.analysis_job_events,
+        name="analysis_job_events",
+    ),
+    path(
+        "analyze/<str:job_id>/export",
+        views.analysis_job_export,
+        name="analysis_job_export",
+    ),
+    path("channel/analyze", views.analyze_channel, name="analyze_channel"),
+    path(
+        "channel/analyze/<str:analysis_id>",
+        views.channel_analysis_status,
+        name="channel_analysis_status",
+    ),
+    path("history", views.analysis_history, name="analysis_history"),
+    path(
+        "history/<str:history_id>",
+        views.analysis_history_detail,
+        name="analysis_history_detail",
+    ),
+    path("metrics", views.metrics, name="metrics"),
 ]
@@ -1,13 +1,48 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 import logging
-from .services.youtube import YouTubeFetchService
-from .services.cleaner import CommentCleaner
-from .services.analyzer import AnalysisService
+from typing import Optional
+from datetime import datetime, timezone
+from mongoengine.errors import ValidationError
+from .models import AnalysisBatch, AnalysisHistory, AnalysisJob, ChannelAnalysis
+from .services.pipeline import (
+    DEFAULT_SAMPLE_SIZE,
+    parse_comment_limit,
+    parse_scan_limit,
+    parse_stream_limit,
+)
+from .services.jobs import (
+    JOB_CREDIT_COST,
+    submit_analysis_job,
+    submit_batch_analysis,
+    expire_stale_job,
+    serialize_batch,
+    serialize_job,
+    job_credit_cost,
+)
+from .services.channel import (
+    CHANNEL_CREDIT_COST,
+    refresh_channel_analysis,
+    serialize_channel_analysis,
+    submit_channel_analysis,
+)
+from .services.events import job_event_stream
+from .services.exports import EXPORT_FORMATS, iter_label_export, label_export_stream
+from .services.history import (
+    DEFAULT_PAGE_SIZE,
+    list_history,
+    serialize_history_entry,
+)
+from .services.metrics import render_metrics
 from credits.models import MongoCreditAccount
-from credits.utils import consume_credits
+from credits.utils import InsufficientCreditsError
+from accounts.drf_auth import MongoJWTAuthentication
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +51,20 @@ logger = logging.getLogger(__name__)
 @permission_classes([IsAuthenticated])
 def analyze_video(request):
     """
-    Single endpoint to analyze a video from URL.
-    Input: { "youtube_url": "..." }
+    Submit a video analysis job.
+    Input: { "youtube_url": "...", "comment_limit": 150, "force_refresh": false }
+    Sampled mode for very large comment sections:
+           { "youtube_url": "...", "mode": "sampled", "sample_size": 500,
+             "scan_limit": 20000 }
+    Streaming mode (every comment, background job only, costs more credits):
+           { "youtube_url": "...", "mode": "stream", "comment_limit": 20000 }
+    Incremental mode (only comments since the last incremental run; the
+    summary covers all of them):
+           { "youtube_url": "...", "mode": "incremental", "comment_limit": 500 }
+    "include_labels": true (not in incremental mode) stores per-comment labels
+    for GET /api/analyze/<job_id>/export.
+    Returns 202 with a job id; poll GET /api/analyze/<job_id> for the result.
+    A cached analysis of the same video is returned right away (200).
     """
     try:
         user = request.user
@@ -31,73 +78,493 @@ def analyze_video(request):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if credit_account.balance < 1:
+        url = request.data.get("youtube_url")
+        mode = request.data.get("mode") or AnalysisJob.MODE_STANDARD
+        scan_limit = None
+        if mode == AnalysisJob.MODE_SAMPLED:
+            if not getattr(settings, "ANALYSIS_SAMPLING_ENABLED", True):
+                return Response(
+                    {"error": "Sampled analysis is not available"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            # Sample size shares the [50, 500] bounds of comment_limit
+            comment_limit = parse_comment_limit(
+                request.data.get("sample_size", DEFAULT_SAMPLE_SIZE)
+            )
+            max_scan = getattr(settings, "ANALYSIS_SAMPLING_MAX_SCAN", 20000)
+            scan_limit = parse_scan_limit(
+                request.data.get("scan_limit", max_scan), max_scan
+            )
+        elif mode == AnalysisJob.MODE_STREAM:
+            if not getattr(settings, "ANALYSIS_STREAM_ENABLED", True):
+                return Response(
+                    {"error": "Streaming analysis is not available"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            max_comments = getattr(settings, "ANALYSIS_STREAM_MAX_COMMENTS", 100000)
+            comment_limit = parse_stream_limit(
+                request.data.get("comment_limit", max_comments), max_comments
+            )
+        elif mode in (AnalysisJob.MODE_STANDARD, AnalysisJob.MODE_INCREMENTAL):
+            # Ensure comment_limit is within bounds [50, 500]
+            comment_limit = parse_comment_limit(request.data.get("comment_limit", 150))
+        else:
+            return Response(
+                {"error": f"Unknown mode: {mode}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        force_refresh = str(request.data.get("force_refresh", "")).lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        include_labels = str(request.data.get("include_labels", "")).lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        if include_labels and mode == AnalysisJob.MODE_INCREMENTAL:
+            return Response(
+                {"error": "include_labels is not available in incremental mode"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not url:
+            return Response(
+                {"error": "youtube_url is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if credit_account.balance < job_credit_cost(mode, comment_limit):
             return Response(
                 {"error": "Insufficient credits. Please top up your account."},
                 status=status.HTTP_402_PAYMENT_REQUIRED,
             )
 
-        url = request.data.get("youtube_url")
-        comment_limit = request.data.get("comment_limit", 150)
+        # 1. Reserve credit + enqueue (refunded if the job fails)
+        job = submit_analysis_job(
+            user,
+            url,
+            comment_limit,
+            force_refresh,
+            mode=mode,
+            scan_limit=scan_limit,
+            include_labels=include_labels,
+        )
+
+        if job.status == AnalysisJob.STATUS_COMPLETED:
+            # Result cache hit
+            return Response(serialize_job(job))
+
+        logger.info(f"Queued analysis job {job.id} for: {url} (limit: {comment_limit})")
+        return Response(
+            {
+                "job_id": str(job.id),
+                "status": job.status,
+                "credits_remaining": job.credits_remaining,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    except InsufficientCreditsError:
+        return Response(
+            {"error": "Insufficient credits. Please top up your account."},
+            status=status.HTTP_402_PAYMENT_REQUIRED,
+        )
+    except Exception as e:
+        logger.error(f"Analysis submission failed: {e}")
+        import traceback
+
+        logger.error(traceback.format_exc())
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analysis_job_status(request, job_id):
+    """
+    Poll an analysis job.
+    Returns status, stage, progress and (once completed) the result payload.
+    """
+    try:
+        job = AnalysisJob.objects(id=job_id, user=request.user).first()
+    except ValidationError:
+        job = None
+
+    if not job:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        job = expire_stale_job(job)
+        return Response(serialize_job(job))
+    except Exception as e:
+        logger.error(f"Failed to load analysis job {job_id}: {e}")
+        return Response(
+            {"error": "Failed to load analysis job"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def analyze_batch(request):
+    """
+    Submit several videos at once.
+    Input: { "youtube_urls": ["...", "..."], "comment_limit": 150 }
+    Duplicate videos are analyzed once; credits for the whole set are reserved
+    up front (each failed video is refunded). Returns 202 with a batch id;
+    poll GET /api/analyze/batch/<batch_id>, results appear as each video
+    finishes.
+    """
+    try:
+        user = request.user
+
+        credit_account = MongoCreditAccount.objects(user=user).first()
+        if not credit_account:
+            return Response(
+                {"error": "Credit account not found. Please contact support."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        urls = request.data.get("youtube_urls")
+        if not isinstance(urls, list) or not urls:
+            return Response(
+                {"error": "youtube_urls must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_videos = getattr(settings, "ANALYSIS_BATCH_MAX_VIDEOS", 50)
+        if len(urls) > max_videos:
+            return Response(
+                {"error": f"At most {max_videos} videos per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        comment_limit = parse_comment_limit(request.data.get("comment_limit", 150))
+
+        if credit_account.balance < JOB_CREDIT_COST:
+            return Response(
+                {"error": "Insufficient credits. Please top up your account."},
+                status=status.HTTP_402_PAYMENT_REQUIRED,
+            )
 
-        # Ensure comment_limit is within bounds [50, 500]
         try:
-            comment_limit = min(max(int(comment_limit), 50), 500)
-        except (TypeError, ValueError):
-            comment_limit = 150
+            batch, jobs = submit_batch_analysis(user, urls, comment_limit)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not url:
+        logger.info(
+            f"Queued analysis batch {batch.id}: {len(jobs)} videos "
+            f"(limit: {comment_limit})"
+        )
+        return Response(
+            {
+                "batch_id": str(batch.id),
+                "videos": [
+                    {
+                        "video_id": job.video_id,
+                        "job_id": str(job.id),
+                        "status": job.status,
+                    }
+                    for job in jobs
+                ],
+                "invalid_urls": batch.invalid_urls,
+                "credits_reserved": batch.credits_reserved,
+                "credits_remaining": batch.credits_remaining,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    except InsufficientCreditsError:
+        return Response(
+            {"error": "Insufficient credits for every video in the batch."},
+            status=status.HTTP_402_PAYMENT_REQUIRED,
+        )
+    except Exception as e:
+        logger.error(f"Batch submission failed: {e}")
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analysis_batch_status(request, batch_id):
+    """
+    Poll a batch: per-video status, progress and results of finished videos.
+    ?finished_after=<ISO time> omits results of videos finished before then.
+    """
+    try:
+        batch = AnalysisBatch.objects(id=batch_id, user=request.user).first()
+    except ValidationError:
+        batch = None
+
+    if not batch:
+        return Response({"error": "Batch not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    finished_after = None
+    if request.query_params.get("finished_after"):
+        try:
+            finished_after = datetime.fromisoformat(
+                request.query_params["finished_after"].replace("Z", "+00:00")
+            )
+        except ValueError:
             return Response(
-                {"error": "youtube_url is required"}, status=status.HTTP_400_BAD_REQUEST
+                {"error": "finished_after must be an ISO timestamp"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # 1. Fetch
-        fetcher = YouTubeFetchService()
-        logger.info(f"Fetching data for: {url} (limit: {comment_limit})")
-        data = fetcher.fetch_video_data(url, max_comments=comment_limit)
+    if finished_after and finished_after.tzinfo:
+        # Stored times are naive UTC
+        finished_after = finished_after.astimezone(timezone.utc).replace(tzinfo=None)
+
+    try:
+        return Response(serialize_batch(batch, finished_after))
+    except Exception as e:
+        logger.error(f"Failed to load analysis batch {batch_id}: {e}")
+        return Response(
+            {"error": "Failed to load analysis batch"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
 
-        raw_comments = data["comments"]
-        metadata = data["metadata"]
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def analyze_channel(request):
+    """
+    Channel-wide insight from the stored per-video analyses.
+    Input: { "channel_id": "UC...", "max_videos": 200, "comment_limit": 150,
+             "analyze_missing": true }
+    Videos without a recent analysis are analyzed first (one credit each);
+    the rollup itself is one summary call (one credit). Returns 202;
+    poll GET /api/channel/analyze/<id>.
+    """
+    try:
+        user = request.user
 
-        if not raw_comments:
+        credit_account = MongoCreditAccount.objects(user=user).first()
+        if not credit_account:
             return Response(
-                {"error": "No comments found or comments are disabled."},
+                {"error": "Credit account not found. Please contact support."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # 2. Clean
-        cleaner = CommentCleaner()
-        cleaned_comments = cleaner.clean_comments(raw_comments)
-        # Ensure we only analyze up to the requested limit
-        cleaned_comments = cleaned_comments[:comment_limit]
-        logger.info(f"Cleaned {len(raw_comments)} -> {len(cleaned_comments)} comments")
+        channel_id = request.data.get("channel_id") or user.is_active_channel
+        if not channel_id:
+            return Response(
+                {"error": "channel_id is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        max_allowed = getattr(settings, "ANALYSIS_CHANNEL_MAX_VIDEOS", 200)
+        try:
+            max_videos = int(request.data.get("max_videos", max_allowed))
+        except (TypeError, ValueError):
+            max_videos = max_allowed
+        max_videos = max(1, min(max_videos, max_allowed))
+        comment_limit = parse_comment_limit(request.data.get("comment_limit", 150))
+        analyze_missing = str(request.data.get("analyze_missing", "true")).lower() in (
+            "1",
+            "true",
+            "yes",
+        )
 
-        # 3. Analyze
-        analyzer = AnalysisService()
-        logger.info("Starting analysis...")
-        analysis_result = analyzer.analyze(metadata, cleaned_comments)
+        if credit_account.balance < CHANNEL_CREDIT_COST:
+            return Response(
+                {"error": "Insufficient credits. Please top up your account."},
+                status=status.HTTP_402_PAYMENT_REQUIRED,
+            )
+
+        try:
+            analysis = submit_channel_analysis(
+                user, channel_id, max_videos, comment_limit, analyze_missing
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 4. Deduct Credit (only if analysis succeeded)
-        new_balance = consume_credits(
-            user=user,
-            amount=1,
-            transaction_type="CONSUME",
-            reference=metadata.get("video_id", "unknown"),
+        return Response(
+            serialize_channel_analysis(analysis), status=status.HTTP_202_ACCEPTED
         )
 
-        # 5. Construct Final Response
-        response_data = {
-            "metadata": metadata,
-            "analysis": analysis_result,
-            "sample_comments": raw_comments[:5],
-            "credits_remaining": new_balance,
-        }
+    except InsufficientCreditsError:
+        return Response(
+            {"error": "Insufficient credits to analyze the missing videos."},
+            status=status.HTTP_402_PAYMENT_REQUIRED,
+        )
+    except Exception as e:
+        logger.error(f"Channel analysis submission failed: {e}")
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 
-        return Response(response_data)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def channel_analysis_status(request, analysis_id):
+    """Poll a channel rollup; the result is included once completed."""
+    try:
+        analysis = ChannelAnalysis.objects(id=analysis_id, user=request.user).first()
+    except ValidationError:
+        analysis = None
 
+    if not analysis:
+        return Response(
+            {"error": "Channel analysis not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    try:
+        analysis = refresh_channel_analysis(analysis)
+        return Response(serialize_channel_analysis(analysis))
     except Exception as e:
-        logger.error(f"Analysis Failed: {e}")
-        import traceback
+        logger.error(f"Failed to load channel analysis {analysis_id}: {e}")
+        return Response(
+            {"error": "Failed to load channel analysis"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
-        logger.error(traceback.format_exc())
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analysis_history(request):
+    """
+    The user's past analyses, newest first (no result bodies).
+    ?limit=20 (max 100), ?cursor=<next_cursor of the previous page>.
+    """
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return Response(
+            {"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        items, next_cursor = list_history(
+            request.user, limit, request.query_params.get("cursor")
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Failed to load analysis history: {e}")
+        return Response(
+            {"error": "Failed to load analysis history"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    return Response({"items": items, "next_cursor": next_cursor})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analysis_history_detail(request, history_id):
+    """A stored report (metadata, aggregate and summary); no credits charged."""
+    try:
+        entry = AnalysisHistory.objects(id=history_id, user=request.user).first()
+    except ValidationError:
+        entry = None
+
+    if not entry:
+        return Response(
+            {"error": "History entry not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(serialize_history_entry(entry))
+
+
+def _stream_user(request):
+    """Session user (set by MongoAuthMiddleware) or a Bearer JWT."""
+    user = getattr(request, "user", None)
+    if user is not None and getattr(user, "is_authenticated", False):
+        return user
+
+    auth = MongoJWTAuthentication().authenticate(request)
+    return auth[0] if auth else None
+
+
+async def analysis_job_events(request, job_id):
+    """
+    Server-sent events stream for an analysis job.
+    Emits progress, metadata, comments, batch (running totals), summary / error.
+    Requires ASGI (core/asgi.py, start.sh's default): WSGI would buffer the
+    whole stream until the job ends, so it answers 501 and clients poll
+    GET /api/analyze/<job_id> instead.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {
+                "error": "Event streams need the ASGI server (SERVER_MODE=asgi)",
+                "poll": f"/api/analyze/{job_id}",
+            },
+            status=501,
+        )
+
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+
+    response = StreamingHttpResponse(
+        job_event_stream(job_id, user), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # disable proxy buffering
+    return response
+
+
+def _load_export_job(job_id: str, user) -> Optional[AnalysisJob]:
+    try:
+        return (
+            AnalysisJob.objects(id=job_id, user=user)
+            .only("status", "video_id", "result.labels")
+            .first()
+        )
+    except ValidationError:
+        return None
+
+
+async def analysis_job_export(request, job_id):
+    """
+    Per-comment labels of a completed job (submitted with include_labels),
+    joined to the comment text: ?format=ndjson (default) or ?format=csv.
+    Streamed chunk by chunk; memory is flat however large the analysis.
+    The stream matches the server (async under ASGI, sync under WSGI), which
+    would otherwise buffer the whole export.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse(
+            {"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=400,
+        )
+
+    job = await sync_to_async(_load_export_job)(job_id, user)
+    if not job:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    if job.status != AnalysisJob.STATUS_COMPLETED:
+        return JsonResponse({"error": "The analysis is not completed"}, status=409)
+    labels = (job.result or {}).get("labels")
+    if not labels:
+        return JsonResponse(
+            {"error": "No labels stored; submit the analysis with include_labels"},
+            status=404,
+        )
+
+    stream = (
+        label_export_stream if isinstance(request, ASGIRequest) else iter_label_export
+    )
+    response = StreamingHttpResponse(
+        stream(labels["job_id"], export_format),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    filename = f"{job.video_id or job_id}-labels.{export_format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint (merged across gunicorn workers).
+    If METRICS_TOKEN is set, requires "Authorization: Bearer <token>".
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,105 @@
+"""
+Microbenchmark for CommentCleaner on synthetic comments with every kind of
+noise mixed in (repeats, empty, short, URL-only, over-long).
+
+Measures the streaming API (iter_clean, consumed one comment at a time) and
+the list wrapper (clean_comments): p50/p95 over --repeat runs, throughput and
+peak traced memory, plus the per-rule drop counts. Also checks that the
+input comments are left untouched.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cleaner --comments 100000 --repeat 5
+"""
+
+import argparse
+import time
+import tracemalloc
+from collections import deque
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from analysis_service.services.cleaner import CommentCleaner  # noqa: E402
+
+from .bench_pipeline import percentile  # noqa: E402
+from .fakes import noisy_comments  # noqa: E402
+
+
+def consume_stream(comments):
+    cleaner = CommentCleaner()
+    # maxlen=0: drain without keeping anything (what a streaming consumer does)
+    deque(cleaner.iter_clean(iter(comments)), maxlen=0)
+    return cleaner
+
+
+def consume_list(comments):
+    cleaner = CommentCleaner()
+    cleaner.clean_comments(comments)
+    return cleaner
+
+
+APIS = {"iter_clean": consume_stream, "clean_comments": consume_list}
+
+
+def run(num_comments: int, repeat: int) -> dict:
+    comments = noisy_comments(num_comments)
+    before = [(id(c), c["text"]) for c in comments]
+
+    rows = {}
+    for name, fn in APIS.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cleaner = fn(comments)
+            samples.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            fn(comments)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        p50 = percentile(samples, 50)
+        rows[name] = {
+            "p50_ms": p50 * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "comments_per_s": num_comments / p50 if p50 else None,
+            "peak_mib": peak / 2**20,
+            "stats": cleaner.stats(),
+        }
+
+    # The cleaner must not modify the caller's comments
+    assert [(id(c), c["text"]) for c in comments] == before
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = run(args.comments, args.repeat)
+
+    print(f"\n{args.comments} synthetic comments, {args.repeat} runs")
+    print(f"{'api':>15} {'p50_ms':>9} {'p95_ms':>9} {'comments/s':>12} {'peak_mib':>9}")
+    for name, r in rows.items():
+        print(
+            f"{name:>15} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+            f"{r['comments_per_s']:>12,.0f} {r['peak_mib']:>9.2f}"
+        )
+
+    stats = rows["iter_clean"]["stats"]
+    print(f"\nkept {stats['kept']}, truncated {stats['truncated']}")
+    for rule, count in stats["dropped"].items():
+        print(f"  dropped {rule:<10} {count:>7}")
+
+    # Both APIs apply the same rules
+    assert len({str(r["stats"]) for r in rows.values()}) == 1
+
+
+if __name__ == "__main__":
+    main()
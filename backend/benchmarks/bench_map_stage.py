@@ -0,0 +1,66 @@
+"""
+Benchmark the AnalysisService map stage against the offline LLM backend
+(fixed latency per call, no network).
+
+Usage (from backend/):
+    python -m benchmarks.bench_map_stage --comments 500 --latency 0.2
+"""
+
+import argparse
+import time
+
+from django.conf import settings
+
+if not settings.configured:
+    # Measure the map stage itself, not the comment cache
+    settings.configure(ANALYSIS_COMMENT_CACHE_ENABLED=False)
+
+from analysis_service.services.analyzer import AnalysisService  # noqa: E402
+from analysis_service.services.llm_backends import OfflineBackend  # noqa: E402
+
+from .fakes import synthetic_comments  # noqa: E402
+
+
+def run(num_comments: int, latency: float, concurrency: int) -> dict:
+    service = AnalysisService(
+        backend=OfflineBackend(latency=latency), max_concurrency=concurrency
+    )
+    comments = synthetic_comments(num_comments)
+
+    start = time.perf_counter()
+    result = service.analyze({"title": "Benchmark"}, comments)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "api_calls": result["debug_info"]["api_calls"],
+        "input_tokens": result["debug_info"]["input_tokens"],
+        "analyzed": result["total_comments_analyzed"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rows = [run(args.comments, args.latency, c) for c in args.concurrency]
+    baseline = rows[0]["seconds"]
+
+    print(f"\n{args.comments} comments, {args.latency:.2f}s simulated latency per call")
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'calls':>6} {'in_tok':>8}")
+    for r in rows:
+        print(
+            f"{r['concurrency']:>8} {r['seconds']:>9.2f} "
+            f"{baseline / r['seconds']:>7.2f}x {r['api_calls']:>6} {r['input_tokens']:>8}"
+        )
+
+    # Token accounting must not depend on concurrency
+    assert len({(r["api_calls"], r["input_tokens"], r["analyzed"]) for r in rows}) == 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+End-to-end pipeline benchmark over recorded comment sets.
+
+Replays comments shaped like response.json / mock-response.json (recorded
+texts, scaled to 150 / 500 / 5k / 50k) through:
+    clean     CommentCleaner.clean_comments
+    map       AnalysisService batches (OfflineBackend, no network)
+    summarize aggregation + executive summary call
+    pipeline  run_analysis_pipeline with a replaying fetcher (the body of the
+              analyze job behind POST /api/analyze)
+
+For each stage and size it reports throughput (comments/s at p50), p50/p95
+latency over --repeat runs and peak traced memory (one extra tracemalloc
+run). Results are written as a JSON baseline; pass --compare to flag
+regressions against an older baseline.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pipeline --sizes 150 500 5000 --repeat 5
+    python -m benchmarks.bench_pipeline --compare benchmarks/baselines/pipeline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+if not settings.configured:
+    # Measure the pipeline itself, not the caches
+    settings.configure(
+        ANALYSIS_COMMENT_CACHE_ENABLED=False, ANALYSIS_RESULT_CACHE_ENABLED=False
+    )
+
+from analysis_service.services.analyzer import AnalysisService  # noqa: E402
+from analysis_service.services.cleaner import CommentCleaner  # noqa: E402
+from analysis_service.services.llm_backends import OfflineBackend  # noqa: E402
+from analysis_service.services.pipeline import run_analysis_pipeline  # noqa: E402
+
+from .fakes import ReplayFetcher, recorded_video, replay_comments  # noqa: E402
+
+STAGES = ("clean", "map", "summarize", "pipeline")
+DEFAULT_SIZES = [150, 500, 5000, 50000]
+DEFAULT_OUTPUT = Path(__file__).parent / "baselines" / "pipeline.json"
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_once(metadata, comments, latency: float, concurrency: int) -> dict:
+    """One pass over every stage; returns {stage: seconds}."""
+    timings = {}
+
+    start = time.perf_counter()
+    cleaned = CommentCleaner().clean_comments(comments)
+    timings["clean"] = time.perf_counter() - start
+
+    # The last progress callback marks the end of the map stage
+    map_done = {}
+
+    def on_progress(done, total, totals):
+        if done == total:
+            map_done["at"] = time.perf_counter()
+
+    service = AnalysisService(
+        backend=OfflineBackend(latency=latency), max_concurrency=concurrency
+    )
+    start = time.perf_counter()
+    service.analyze(metadata, cleaned, on_progress=on_progress)
+    end = time.perf_counter()
+    timings["map"] = map_done.get("at", end) - start
+    timings["summarize"] = end - map_done.get("at", end)
+
+    start = time.perf_counter()
+    run_analysis_pipeline(
+        "https://www.youtube.com/watch?v=benchmark",
+        len(comments),
+        fetcher=ReplayFetcher(metadata, comments),
+        analyzer=AnalysisService(
+            backend=OfflineBackend(latency=latency), max_concurrency=concurrency
+        ),
+    )
+    timings["pipeline"] = time.perf_counter() - start
+    return timings
+
+
+def peak_memory(metadata, comments, latency: float, concurrency: int) -> dict:
+    """
+    Peak traced allocations per stage, in MiB (separate, slower run).
+    Map and summary share one analyze() call, so "summarize" has no entry.
+    """
+
+    def analyzer():
+        return AnalysisService(
+            backend=OfflineBackend(latency=latency), max_concurrency=concurrency
+        )
+
+    cleaned = CommentCleaner().clean_comments(comments)
+    stages = {
+        "clean": lambda: CommentCleaner().clean_comments(comments),
+        "map": lambda: analyzer().analyze(metadata, cleaned),
+        "pipeline": lambda: run_analysis_pipeline(
+            "https://www.youtube.com/watch?v=benchmark",
+            len(comments),
+            fetcher=ReplayFetcher(metadata, comments),
+            analyzer=analyzer(),
+        ),
+    }
+
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for stage, fn in stages.items():
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            fn()
+            peaks[stage] = (tracemalloc.get_traced_memory()[1] - baseline) / 2**20
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def bench_size(size: int, repeat: int, latency: float, concurrency: int) -> dict:
+    metadata, _ = recorded_video()
+    comments = replay_comments(size)
+
+    runs = []
+    with contextlib.redirect_stdout(io.StringIO()):  # analyzer debug prints
+        for _ in range(repeat):
+            runs.append(run_once(metadata, comments, latency, concurrency))
+        peaks = peak_memory(metadata, comments, latency, concurrency)
+
+    stages = {}
+    for stage in STAGES:
+        samples = [r[stage] for r in runs]
+        p50 = percentile(samples, 50)
+        stages[stage] = {
+            "p50_ms": round(p50 * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "comments_per_s": round(size / p50, 1) if p50 else None,
+            "peak_mib": round(peaks[stage], 2) if stage in peaks else None,
+        }
+    return stages
+
+
+def compare(
+    current: dict, baseline: dict, tolerance: float, min_delta_ms: float
+) -> list:
+    """
+    Stages whose p50 grew by more than `tolerance` (fraction) and by at least
+    `min_delta_ms` vs the baseline (sub-millisecond stages are mostly noise).
+    """
+    regressions = []
+    for size, stages in current["results"].items():
+        for stage, row in stages.items():
+            old = baseline.get("results", {}).get(size, {}).get(stage)
+            if not old or not old.get("p50_ms"):
+                continue
+            change = row["p50_ms"] / old["p50_ms"] - 1
+            if change > tolerance and row["p50_ms"] - old["p50_ms"] >= min_delta_ms:
+                regressions.append((size, stage, old["p50_ms"], row["p50_ms"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    # Read before writing: --compare may point at the --output file
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "params": {
+            "repeat": args.repeat,
+            "latency": args.latency,
+            "concurrency": args.concurrency,
+        },
+        "results": {},
+    }
+
+    print(
+        f"\n{'size':>7} {'stage':>10} {'p50 ms':>10} {'p95 ms':>10} "
+        f"{'comments/s':>11} {'peak MiB':>9}"
+    )
+    for size in args.sizes:
+        stages = bench_size(size, args.repeat, args.latency, args.concurrency)
+        report["results"][str(size)] = stages
+        for stage, row in stages.items():
+            peak = "-" if row["peak_mib"] is None else f"{row['peak_mib']:.2f}"
+            print(
+                f"{size:>7} {stage:>10} {row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} "
+                f"{row['comments_per_s'] or 0:>11.0f} {peak:>9}"
+            )
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nBaseline written to {args.output}")
+
+    if previous:
+        regressions = compare(report, previous, args.tolerance, args.min_delta_ms)
+        for size, stage, old, new, change in regressions:
+            print(
+                f"REGRESSION {size:>7} {stage:>10}: "
+                f"{old:.1f} -> {new:.1f} ms (+{change:.0%})"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
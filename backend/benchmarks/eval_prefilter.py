@@ -0,0 +1,47 @@
+"""
+Check the local pre-classifier against hand-labelled fixture comments.
+
+Reports how many comments the local path takes, its accuracy on those, and
+the estimated LLM input tokens it saves.
+
+Usage (from backend/):
+    python -m benchmarks.eval_prefilter --threshold 0.85
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from analysis_service.services.batching import estimate_comment_tokens
+from analysis_service.services.prefilter import LocalSentimentClassifier
+
+FIXTURE = Path(__file__).parent / "fixtures" / "labelled_comments.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, nargs="+", default=[0.7, 0.85, 0.95])
+    args = parser.parse_args()
+
+    comments = json.loads(FIXTURE.read_text())
+    total_tokens = sum(estimate_comment_tokens(c["text"]) for c in comments)
+
+    print(f"\n{len(comments)} labelled comments, ~{total_tokens} LLM input tokens")
+    print(f"{'threshold':>9} {'local':>6} {'correct':>8} {'tokens_saved':>13}")
+    for threshold in args.threshold:
+        local, _ = LocalSentimentClassifier(threshold).classify(comments)
+        correct = sum(1 for c, label in local if label["sentiment"] == c["sentiment"])
+        saved = sum(estimate_comment_tokens(c["text"]) for c, _ in local)
+        print(
+            f"{threshold:>9.2f} {len(local):>6} {correct:>4}/{len(local):<3} {saved:>13}"
+        )
+
+        for c, label in local:
+            if label["sentiment"] != c["sentiment"]:
+                print(
+                    f"    miss: {c['text']!r} -> {label['sentiment']} (want {c['sentiment']})"
+                )
+
+
+if __name__ == "__main__":
+    main()
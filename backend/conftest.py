@@ -0,0 +1,20 @@
+import os
+
+import django
+import mongoengine
+import mongomock
+import pytest
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+TEST_DB = "getsentimate_test"
+
+# Documents run against an in-memory Mongo (see requirements-dev.txt)
+mongoengine.connect(TEST_DB, mongo_client_class=mongomock.MongoClient)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    yield
+    mongoengine.get_connection().drop_database(TEST_DB)
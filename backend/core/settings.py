@@ -258,6 +258,184 @@ GOOGLE_API_KEY = config(
     "GOOGLE_API_KEY", default=config("GEMINI_API_KEY", default=None)
 )
 
+# --------------------
+# ANALYSIS PIPELINE
+# --------------------
+# LLM backend: "gemini" (real API) or "offline" (deterministic, no network;
+# for load tests/benchmarks). The offline backend simulates latency and errors.
+ANALYSIS_LLM_BACKEND = config("ANALYSIS_LLM_BACKEND", default="gemini")
+# Gemini model per stage (map = per-batch labelling, summary = final pass) and
+# comma-separated fallbacks used when the primary hits quota / overload errors
+ANALYSIS_MAP_MODEL = config("ANALYSIS_MAP_MODEL", default="gemini-2.0-flash")
+ANALYSIS_MAP_FALLBACK_MODELS = config("ANALYSIS_MAP_FALLBACK_MODELS", default="")
+ANALYSIS_SUMMARY_MODEL = config("ANALYSIS_SUMMARY_MODEL", default="gemini-2.0-flash")
+ANALYSIS_SUMMARY_FALLBACK_MODELS = config(
+    "ANALYSIS_SUMMARY_FALLBACK_MODELS", default=""
+)
+ANALYSIS_OFFLINE_LATENCY = config("ANALYSIS_OFFLINE_LATENCY", default=0.0, cast=float)
+ANALYSIS_OFFLINE_LATENCY_PER_1K_TOKENS = config(
+    "ANALYSIS_OFFLINE_LATENCY_PER_1K_TOKENS", default=0.0, cast=float
+)
+ANALYSIS_OFFLINE_ERROR_RATE = config(
+    "ANALYSIS_OFFLINE_ERROR_RATE", default=0.0, cast=float
+)
+ANALYSIS_OFFLINE_BAD_RESPONSE_RATE = config(
+    "ANALYSIS_OFFLINE_BAD_RESPONSE_RATE", default=0.0, cast=float
+)
+ANALYSIS_OFFLINE_SEED = config("ANALYSIS_OFFLINE_SEED", default=0, cast=int)
+# Max number of comment batches sent to the LLM concurrently per analysis
+ANALYSIS_MAX_CONCURRENCY = config("ANALYSIS_MAX_CONCURRENCY", default=4, cast=int)
+# Batches are packed up to this many input tokens / comments per LLM call
+ANALYSIS_BATCH_TOKEN_BUDGET = config(
+    "ANALYSIS_BATCH_TOKEN_BUDGET", default=4000, cast=int
+)
+ANALYSIS_BATCH_MAX_COMMENTS = config(
+    "ANALYSIS_BATCH_MAX_COMMENTS", default=100, cast=int
+)
+# Token estimator calibration (see debug_info.batch_stats)
+ANALYSIS_BATCH_BYTES_PER_TOKEN = config(
+    "ANALYSIS_BATCH_BYTES_PER_TOKEN", default=4.0, cast=float
+)
+# Background analysis jobs (per web process)
+ANALYSIS_JOB_WORKERS = config("ANALYSIS_JOB_WORKERS", default=2, cast=int)
+# Fair-share scheduler: running jobs per user (all processes), dispatcher poll
+# interval, queue wait after which a job is bumped one priority level, and
+# queue wait after which it is failed + refunded
+ANALYSIS_USER_MAX_IN_FLIGHT = config("ANALYSIS_USER_MAX_IN_FLIGHT", default=2, cast=int)
+ANALYSIS_SCHEDULER_POLL_SECONDS = config(
+    "ANALYSIS_SCHEDULER_POLL_SECONDS", default=2.0, cast=float
+)
+ANALYSIS_SCHEDULER_AGING_SECONDS = config(
+    "ANALYSIS_SCHEDULER_AGING_SECONDS", default=300, cast=int
+)
+ANALYSIS_JOB_MAX_QUEUE_SECONDS = config(
+    "ANALYSIS_JOB_MAX_QUEUE_SECONDS", default=3600, cast=int
+)
+# Queued jobs looked at per dispatch pass (oldest / highest priority first)
+ANALYSIS_SCHEDULER_SCAN_LIMIT = config(
+    "ANALYSIS_SCHEDULER_SCAN_LIMIT", default=500, cast=int
+)
+# Running jobs that stop reporting progress for this long are failed + refunded
+ANALYSIS_JOB_STALE_SECONDS = config("ANALYSIS_JOB_STALE_SECONDS", default=900, cast=int)
+# Sampled mode (mode=sampled): stream up to this many comments, analyze a
+# stratified sample and scale the counts back up
+ANALYSIS_SAMPLING_ENABLED = config("ANALYSIS_SAMPLING_ENABLED", default=True, cast=bool)
+ANALYSIS_SAMPLING_MAX_SCAN = config(
+    "ANALYSIS_SAMPLING_MAX_SCAN", default=20000, cast=int
+)
+# Streaming mode (mode=stream): every comment up to the limit, bounded memory.
+# Charged max(MIN_CREDITS, CREDITS_PER_1K per started 1k comments).
+ANALYSIS_STREAM_ENABLED = config("ANALYSIS_STREAM_ENABLED", default=True, cast=bool)
+ANALYSIS_STREAM_MAX_COMMENTS = config(
+    "ANALYSIS_STREAM_MAX_COMMENTS", default=100000, cast=int
+)
+ANALYSIS_STREAM_CREDITS_PER_1K = config(
+    "ANALYSIS_STREAM_CREDITS_PER_1K", default=1, cast=int
+)
+ANALYSIS_STREAM_MIN_CREDITS = config("ANALYSIS_STREAM_MIN_CREDITS", default=2, cast=int)
+# Incremental mode (mode=incremental): ids remembered per video, and how many
+# consecutive known comments end the newest-first scan (pinned comments)
+ANALYSIS_INCREMENTAL_MAX_SEEN_IDS = config(
+    "ANALYSIS_INCREMENTAL_MAX_SEEN_IDS", default=20000, cast=int
+)
+ANALYSIS_INCREMENTAL_STOP_AFTER_KNOWN = config(
+    "ANALYSIS_INCREMENTAL_STOP_AFTER_KNOWN", default=3, cast=int
+)
+# Batch analysis (POST /api/analyze/batch): videos per request, and the cap on
+# concurrent Gemini calls across all analyses and worker processes (Mongo slots,
+# 0 = no cap; a slot left by a dead worker frees up after the lease)
+ANALYSIS_BATCH_MAX_VIDEOS = config("ANALYSIS_BATCH_MAX_VIDEOS", default=50, cast=int)
+ANALYSIS_LLM_GLOBAL_CONCURRENCY = config(
+    "ANALYSIS_LLM_GLOBAL_CONCURRENCY", default=8, cast=int
+)
+ANALYSIS_LLM_SLOT_LEASE_SECONDS = config(
+    "ANALYSIS_LLM_SLOT_LEASE_SECONDS", default=300, cast=int
+)
+# Channel rollups (POST /api/channel/analyze): latest uploads included, and how
+# old a stored video analysis may be before the video is analyzed again
+ANALYSIS_CHANNEL_MAX_VIDEOS = config(
+    "ANALYSIS_CHANNEL_MAX_VIDEOS", default=200, cast=int
+)
+ANALYSIS_CHANNEL_MAX_AGE_DAYS = config(
+    "ANALYSIS_CHANNEL_MAX_AGE_DAYS", default=30, cast=int
+)
+# Single-flight: concurrent jobs for the same video + parameters share one
+# computation (Mongo lease renewed by a heartbeat; waiting jobs hold no worker
+# and are finished by the leader)
+ANALYSIS_COALESCE_ENABLED = config("ANALYSIS_COALESCE_ENABLED", default=True, cast=bool)
+ANALYSIS_COALESCE_LEASE_SECONDS = config(
+    "ANALYSIS_COALESCE_LEASE_SECONDS", default=120, cast=int
+)
+# Per-comment labels stored for export (include_labels jobs) are kept this long
+ANALYSIS_LABELS_RETENTION_DAYS = config(
+    "ANALYSIS_LABELS_RETENTION_DAYS", default=30, cast=int
+)
+# Streaming / sampled modes: comment texts remembered for duplicate detection
+ANALYSIS_CLEAN_DEDUP_WINDOW = config(
+    "ANALYSIS_CLEAN_DEDUP_WINDOW", default=100000, cast=int
+)
+# Gemini quota per model, shared by all worker processes (Mongo token bucket):
+# requests and tokens per minute (0 = no limit), and how long a call may wait
+# for quota (or a global concurrency slot) before it is treated as a 429
+ANALYSIS_LLM_RPM = config("ANALYSIS_LLM_RPM", default=2000, cast=int)
+ANALYSIS_LLM_TPM = config("ANALYSIS_LLM_TPM", default=4000000, cast=int)
+ANALYSIS_LLM_RATE_LIMIT_MAX_WAIT = config(
+    "ANALYSIS_LLM_RATE_LIMIT_MAX_WAIT", default=30.0, cast=float
+)
+# Optional bearer token protecting the Prometheus /api/metrics endpoint
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+# How often the SSE endpoint re-reads a job document
+ANALYSIS_EVENTS_POLL_SECONDS = config(
+    "ANALYSIS_EVENTS_POLL_SECONDS", default=0.5, cast=float
+)
+# Size of the topic / notable-point digest sent to the summary prompt
+ANALYSIS_SUMMARY_TOP_TOPICS = config(
+    "ANALYSIS_SUMMARY_TOP_TOPICS", default=15, cast=int
+)
+ANALYSIS_SUMMARY_TOP_POINTS = config(
+    "ANALYSIS_SUMMARY_TOP_POINTS", default=10, cast=int
+)
+# LLM resilience: retries with backoff on 429/5xx, batch bisection on bad
+# responses, per-process circuit breaker, minimum share of comments analyzed
+ANALYSIS_LLM_MAX_RETRIES = config("ANALYSIS_LLM_MAX_RETRIES", default=3, cast=int)
+ANALYSIS_LLM_BACKOFF_BASE = config("ANALYSIS_LLM_BACKOFF_BASE", default=1.0, cast=float)
+ANALYSIS_LLM_BACKOFF_MAX = config("ANALYSIS_LLM_BACKOFF_MAX", default=20.0, cast=float)
+ANALYSIS_BISECT_MAX_DEPTH = config("ANALYSIS_BISECT_MAX_DEPTH", default=6, cast=int)
+ANALYSIS_CIRCUIT_FAILURE_THRESHOLD = config(
+    "ANALYSIS_CIRCUIT_FAILURE_THRESHOLD", default=5, cast=int
+)
+ANALYSIS_CIRCUIT_RESET_SECONDS = config(
+    "ANALYSIS_CIRCUIT_RESET_SECONDS", default=30, cast=int
+)
+ANALYSIS_MIN_COVERAGE = config("ANALYSIS_MIN_COVERAGE", default=0.5, cast=float)
+# Local lexicon pre-classifier: confident comments skip the LLM
+ANALYSIS_PREFILTER_ENABLED = config(
+    "ANALYSIS_PREFILTER_ENABLED", default=False, cast=bool
+)
+ANALYSIS_PREFILTER_THRESHOLD = config(
+    "ANALYSIS_PREFILTER_THRESHOLD", default=0.85, cast=float
+)
+# Per-comment LLM label cache (in-process LRU + Mongo TTL collection)
+ANALYSIS_COMMENT_CACHE_ENABLED = config(
+    "ANALYSIS_COMMENT_CACHE_ENABLED", default=True, cast=bool
+)
+ANALYSIS_COMMENT_CACHE_MONGO = config(
+    "ANALYSIS_COMMENT_CACHE_MONGO", default=True, cast=bool
+)
+ANALYSIS_COMMENT_CACHE_TTL = config(
+    "ANALYSIS_COMMENT_CACHE_TTL", default=30 * 24 * 3600, cast=int
+)
+ANALYSIS_COMMENT_CACHE_LRU_SIZE = config(
+    "ANALYSIS_COMMENT_CACHE_LRU_SIZE", default=20000, cast=int
+)
+# Whole-analysis result cache (same video + comment_limit within the TTL)
+ANALYSIS_RESULT_CACHE_ENABLED = config(
+    "ANALYSIS_RESULT_CACHE_ENABLED", default=True, cast=bool
+)
+ANALYSIS_RESULT_CACHE_TTL = config(
+    "ANALYSIS_RESULT_CACHE_TTL", default=6 * 3600, cast=int
+)
+
 # --------------------
 # RAZORPAY SETTINGS
 # --------------------
@@ -0,0 +1,11 @@
+# Loaded automatically by gunicorn from the working directory (see start.sh).
+
+
+def child_exit(server, worker):
+    # Drop live-gauge files of dead workers in prometheus multiprocess mode
+    import os
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -4,12 +4,30 @@ echo "🌐 Starting GetSentimate Backend on Render..."
 PORT=${PORT:-8000}
 WORKERS=${GUNICORN_WORKERS:-3}
 
+# Prometheus multiprocess mode: every worker writes metrics here and
+# /api/metrics merges them (must be empty on start)
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/getsentimate-metrics}
+rm -rf "${PROMETHEUS_MULTIPROC_DIR}"
+mkdir -p "${PROMETHEUS_MULTIPROC_DIR}"
+
+# core.asgi with uvicorn workers (the default) is required for streaming:
+# under WSGI the async /api/analyze/<job_id>/events view answers 501 (clients
+# poll GET /api/analyze/<job_id> instead) and label exports hold a sync
+# worker for their whole download. SERVER_MODE=wsgi is a fallback only.
+if [ "${SERVER_MODE:-asgi}" = "asgi" ]; then
+  APP=core.asgi:application
+  WORKER_CLASS=uvicorn.workers.UvicornWorker
+else
+  APP=core.wsgi:application
+  WORKER_CLASS=sync
+fi
+
 # Use python -m gunicorn to avoid PATH issues
 # Increased timeout to 600s because 500-comment analysis can take a while
-exec python3 -m gunicorn core.wsgi:application \
+exec python3 -m gunicorn ${APP} \
   --bind 0.0.0.0:${PORT} \
   --workers ${WORKERS} \
-  --worker-class sync \
+  --worker-class ${WORKER_CLASS} \
   --timeout 600 \
   --log-level info \
   --access-logfile '-' \
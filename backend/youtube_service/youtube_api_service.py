@@ -10,6 +10,9 @@ from django.conf import settings
 
 YOUTUBE_API_KEY = getattr(settings, "GOOGLE_API_KEY", os.getenv("YOUTUBE_API_KEY"))
 
+# videos.list accepts at most 50 ids per call
+VIDEOS_LIST_MAX_IDS = 50
+
 
 def get_video_id_from_url(url: str) -> Optional[str]:
     """Extract YouTube video ID from various URL formats."""
@@ -127,7 +130,17 @@ class YouTubeAPIService:
                 return True, oembed_message, oembed_meta
             return False, "INVALID_VIDEO: Video not found or not accessible", None
 
-        item = items[0]
+        video_details = self._video_details(items[0], video_id)
+
+        return (
+            True,
+            "Successfully fetched video metadata via YouTube Data API",
+            video_details,
+        )
+
+    @staticmethod
+    def _video_details(item: Dict, video_id: str) -> Dict:
+        """videos.list item -> our metadata dict."""
         snippet = item.get("snippet", {})
         statistics = item.get("statistics", {})
         content_details = item.get("contentDetails", {})
@@ -173,12 +186,103 @@ class YouTubeAPIService:
             if snippet.get("channelId")
             else "",
         }
+        return video_details
+
+    def fetch_youtube_metadata_batch(
+        self, video_ids: List[str]
+    ) -> Tuple[bool, str, Dict[str, Dict]]:
+        """
+        Metadata for many videos: one videos.list call per 50 ids (the API
+        maximum, 1 quota unit per call). Returns {video_id: details}; ids the
+        API did not return are simply missing.
+        """
+        api_key = self._get_api_key()
+        if not api_key:
+            return False, "CONFIG_ERROR: YOUTUBE_API_KEY is not configured", {}
+
+        details: Dict[str, Dict] = {}
+        for start in range(0, len(video_ids), VIDEOS_LIST_MAX_IDS):
+            chunk = video_ids[start : start + VIDEOS_LIST_MAX_IDS]
+            params = {
+                "part": "snippet,statistics,contentDetails",
+                "id": ",".join(chunk),
+                "key": api_key,
+                "maxResults": VIDEOS_LIST_MAX_IDS,
+            }
+            resp = requests.get(
+                "https://www.googleapis.com/youtube/v3/videos",
+                params=params,
+                timeout=10,
+            )
+            if resp.status_code != 200:
+                return (
+                    False,
+                    f"YOUTUBE_API_ERROR: status {resp.status_code}",
+                    details,
+                )
+            for item in resp.json().get("items", []):
+                video_id = item.get("id")
+                details[video_id] = self._video_details(item, video_id)
+
+        return True, f"Fetched metadata for {len(details)} videos", details
+
+    def fetch_channel_video_ids(
+        self, channel_id: str, max_videos: int = 200
+    ) -> Tuple[bool, str, Dict]:
+        """
+        Most recent uploads of a channel, newest first: channels.list for the
+        uploads playlist, then playlistItems.list, 50 ids per page.
+        Returns {"title": channel title, "video_ids": [...]}.
+        """
+        api_key = self._get_api_key()
+        if not api_key:
+            return False, "CONFIG_ERROR: YOUTUBE_API_KEY is not configured", {}
 
-        return (
-            True,
-            "Successfully fetched video metadata via YouTube Data API",
-            video_details,
+        resp = requests.get(
+            "https://www.googleapis.com/youtube/v3/channels",
+            params={"part": "snippet,contentDetails", "id": channel_id, "key": api_key},
+            timeout=10,
         )
+        if resp.status_code != 200:
+            return False, f"YOUTUBE_API_ERROR: status {resp.status_code}", {}
+        items = resp.json().get("items", [])
+        if not items:
+            return False, "NOT_FOUND: Channel not found", {}
+
+        channel = items[0]
+        uploads = (
+            channel.get("contentDetails", {})
+            .get("relatedPlaylists", {})
+            .get("uploads")
+        )
+        result = {"title": channel.get("snippet", {}).get("title", ""), "video_ids": []}
+        page_token = None
+        while uploads and len(result["video_ids"]) < max_videos:
+            params = {
+                "part": "contentDetails",
+                "playlistId": uploads,
+                "maxResults": VIDEOS_LIST_MAX_IDS,
+                "key": api_key,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            resp = requests.get(
+                "https://www.googleapis.com/youtube/v3/playlistItems",
+                params=params,
+                timeout=10,
+            )
+            if resp.status_code != 200:
+                return False, f"YOUTUBE_API_ERROR: status {resp.status_code}", result
+            data = resp.json()
+            for item in data.get("items", []):
+                video_id = item.get("contentDetails", {}).get("videoId")
+                if video_id and len(result["video_ids"]) < max_videos:
+                    result["video_ids"].append(video_id)
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                break
+
+        return True, f"Found {len(result['video_ids'])} videos", result
 
     def fetch_youtube_comments(
         self, video_id: str, max_comments: int = 100
@@ -39,13 +39,35 @@ async function fetchWithAuth(endpoint: string, options: RequestInit = {}) {
     return response.json();
 }
 
+const JOB_POLL_INTERVAL_MS = 1500;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
 export const api = {
-    analyze: (youtubeUrl: string, commentLimit: number = 150) =>
-        fetchWithAuth('/analyze', {
+    // Submits an analysis job, then polls it until it finishes.
+    analyze: async (youtubeUrl: string, commentLimit: number = 150) => {
+        const job = await fetchWithAuth('/analyze', {
             method: 'POST',
             body: JSON.stringify({
                 youtube_url: youtubeUrl,
                 comment_limit: commentLimit
             }),
-        }),
+        });
+
+        // Cached analyses come back already completed
+        if (job.status === 'completed') {
+            return job.result;
+        }
+
+        while (true) {
+            await sleep(JOB_POLL_INTERVAL_MS);
+            const status = await fetchWithAuth(`/analyze/${job.job_id}`);
+            if (status.status === 'completed') {
+                return status.result;
+            }
+            if (status.status === 'failed') {
+                throw new Error(status.error || 'Analysis failed.');
+            }
+        }
+    },
 };